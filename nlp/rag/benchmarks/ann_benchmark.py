@@ -0,0 +1,128 @@
+"""
+Recall@k vs. query latency for the IVF index against exact search.
+
+Builds an `IVFVectorStore` (from a saved store, or from synthetic clustered
+vectors), measures exact search as the baseline, then sweeps `nprobe` and
+reports recall@k and mean latency per query for each operating point.
+Results are printed, optionally written to CSV and plotted if matplotlib
+is installed.
+
+    python nlp/rag/benchmarks/ann_benchmark.py --n 1000000 --dim 768 --plot ann.png
+    python nlp/rag/benchmarks/ann_benchmark.py --store path/to/saved/index --nlist 2048
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from typing import Callable, List
+
+import numpy as np
+
+# Add the project root to the Python path to allow for absolute imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from langchain_core.embeddings import FakeEmbeddings
+
+from nlp.rag.core.ivf_index import IVFVectorStore
+from nlp.rag.core.vector_store import NumpyVectorStore
+
+
+def synthetic_vectors(n: int, dim: int, n_topics: int = 1000, seed: int = 0) -> np.ndarray:
+    """Clustered random vectors, which behave more like text embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    topics = rng.normal(size=(n_topics, dim)).astype(np.float32)
+    labels = rng.integers(0, n_topics, size=n)
+    return topics[labels] + 0.5 * rng.normal(size=(n, dim)).astype(np.float32)
+
+
+def time_queries(search: Callable, queries: np.ndarray, k: int):
+    """Runs `search(query, k)` for every query; returns (result rows per query, mean latency in ms)."""
+    results = []
+    start = time.perf_counter()
+    for query in queries:
+        rows, _ = search(query, k)
+        results.append(rows)
+    return results, (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def recall_at_k(approximate: List[np.ndarray], exact: List[np.ndarray], k: int) -> float:
+    hits = sum(len(np.intersect1d(a, e)) for a, e in zip(approximate, exact))
+    return hits / (k * len(exact))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", help="Directory of a saved vector store to benchmark instead of synthetic data.")
+    parser.add_argument("--n", type=int, default=200_000, help="Synthetic corpus size.")
+    parser.add_argument("--dim", type=int, default=768, help="Synthetic embedding dimension.")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--nprobe", default="1,2,4,8,16,32,64", help="Comma-separated nprobe values to sweep.")
+    parser.add_argument("--train-iterations", type=int, default=10)
+    parser.add_argument("--csv", help="Write the results table to this CSV file.")
+    parser.add_argument("--plot", help="Save a recall-vs-latency plot to this image file.")
+    args = parser.parse_args()
+
+    embedding = FakeEmbeddings(size=args.dim)
+    if args.store:
+        store = IVFVectorStore.load(args.store, embedding, mmap=False, nlist=args.nlist,
+                                    train_iterations=args.train_iterations, min_train_size=0)
+    else:
+        store = IVFVectorStore(embedding, nlist=args.nlist, train_iterations=args.train_iterations, min_train_size=0)
+        vectors = synthetic_vectors(args.n, args.dim)
+        store.add_vectors(vectors, [""] * len(vectors))
+
+    rng = np.random.default_rng(1)
+    # Perturbed corpus vectors as queries, so every query has true neighbours
+    sample = store.vectors[rng.choice(len(store), size=args.queries, replace=False)]
+    queries = sample + 0.1 * rng.normal(size=sample.shape).astype(np.float32)
+
+    if not store.is_trained:
+        start = time.perf_counter()
+        store.train()
+        print(f"Trained {len(store.centroids)} lists over {len(store)} vectors in {time.perf_counter() - start:.1f}s")
+
+    # Exact baseline: the parent class's brute-force search over the same matrix
+    exact, exact_ms = time_queries(
+        lambda query, k: NumpyVectorStore._top_k(store, query, k), queries, args.k
+    )
+    rows = [{"nprobe": "exact", "recall": 1.0, "latency_ms": exact_ms}]
+    for nprobe in (int(p) for p in args.nprobe.split(",")):
+        store.nprobe = nprobe
+        approximate, latency_ms = time_queries(store._top_k, queries, args.k)
+        rows.append({"nprobe": nprobe, "recall": recall_at_k(approximate, exact, args.k), "latency_ms": latency_ms})
+
+    print(f"{'nprobe':>8} {'recall@' + str(args.k):>10} {'ms/query':>10} {'speedup':>8}")
+    for row in rows:
+        print(f"{row['nprobe']:>8} {row['recall']:>10.3f} {row['latency_ms']:>10.3f} {exact_ms / row['latency_ms']:>7.1f}x")
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["nprobe", "recall", "latency_ms"])
+            writer.writeheader()
+            writer.writerows(rows)
+
+    if args.plot:
+        try:
+            import matplotlib
+            matplotlib.use("Agg")
+            import matplotlib.pyplot as plt
+        except ImportError:
+            print("matplotlib is not installed; skipping the plot.")
+            return
+        ann = rows[1:]
+        plt.plot([r["latency_ms"] for r in ann], [r["recall"] for r in ann], marker="o", label="IVF")
+        for r in ann:
+            plt.annotate(f"nprobe={r['nprobe']}", (r["latency_ms"], r["recall"]), fontsize=8)
+        plt.axvline(exact_ms, color="grey", linestyle="--", label="exact")
+        plt.xlabel("mean latency per query (ms)")
+        plt.ylabel(f"recall@{args.k}")
+        plt.legend()
+        plt.savefig(args.plot, dpi=150, bbox_inches="tight")
+        print(f"Saved plot to {args.plot}")
+
+
+if __name__ == "__main__":
+    main()
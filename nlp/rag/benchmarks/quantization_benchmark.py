@@ -0,0 +1,97 @@
+"""
+Memory and recall@k of quantized candidate generation against exact search.
+
+Saves a float32 corpus (from a saved store, or synthetic clustered vectors)
+to a scratch directory, reloads it as a `QuantizedVectorStore` for each
+quantization mode and rescore factor, and reports the RAM held for
+candidate generation, the reduction vs. float32, recall@k and latency.
+The full-precision vectors stay memory-mapped throughout, as in serving.
+
+    python nlp/rag/benchmarks/quantization_benchmark.py --n 500000 --dim 768
+    python nlp/rag/benchmarks/quantization_benchmark.py --store path/to/saved/index --csv quant.csv
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+# Add the project root to the Python path to allow for absolute imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from langchain_core.embeddings import FakeEmbeddings
+
+from nlp.rag.benchmarks.ann_benchmark import recall_at_k, synthetic_vectors, time_queries
+from nlp.rag.core.quantized_store import QuantizedVectorStore
+from nlp.rag.core.vector_store import NumpyVectorStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", help="Directory of a saved vector store to benchmark instead of synthetic data.")
+    parser.add_argument("--n", type=int, default=200_000, help="Synthetic corpus size.")
+    parser.add_argument("--dim", type=int, default=768, help="Synthetic embedding dimension.")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rescore-factor", default="1,2,4,10", help="Comma-separated rescore factors to sweep.")
+    parser.add_argument("--csv", help="Write the results table to this CSV file.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        path = args.store
+        if not path:
+            embedding = FakeEmbeddings(size=args.dim)
+            store = NumpyVectorStore(embedding)
+            vectors = synthetic_vectors(args.n, args.dim)
+            store.add_vectors(vectors, [""] * len(vectors))
+            store.save(scratch)
+            path = scratch
+            del store, vectors
+
+        exact_store = NumpyVectorStore.load(path, FakeEmbeddings(size=args.dim))
+        embedding = FakeEmbeddings(size=exact_store.vectors.shape[1])
+
+        rng = np.random.default_rng(1)
+        # Perturbed corpus vectors as queries, so every query has true neighbours
+        sample = np.asarray(exact_store.vectors[rng.choice(len(exact_store), size=args.queries, replace=False)])
+        queries = sample + 0.1 * rng.normal(size=sample.shape).astype(np.float32)
+
+        exact, exact_ms = time_queries(exact_store._top_k, queries, args.k)
+        full_bytes = exact_store.vectors.nbytes
+        rows = [{"mode": "float32", "rescore_factor": "-", "ram_mb": full_bytes / 2**20,
+                 "reduction": 1.0, "recall": 1.0, "latency_ms": exact_ms}]
+
+        for mode in ("int8", "binary"):
+            # Quantize once and save the codes, then reload for serving
+            quantized = QuantizedVectorStore(embedding, quantization=mode)
+            quantized.add_vectors(np.asarray(exact_store.vectors), [""] * len(exact_store))
+            mode_path = os.path.join(scratch, mode)
+            quantized.save(mode_path)
+            del quantized
+            quantized = QuantizedVectorStore.load(mode_path, embedding)
+            report = quantized.memory_report()
+            for factor in (int(f) for f in args.rescore_factor.split(",")):
+                quantized.rescore_factor = factor
+                approximate, latency_ms = time_queries(quantized._top_k, queries, args.k)
+                rows.append({
+                    "mode": mode, "rescore_factor": factor, "ram_mb": report["code_bytes"] / 2**20,
+                    "reduction": report["reduction"], "recall": recall_at_k(approximate, exact, args.k),
+                    "latency_ms": latency_ms,
+                })
+
+    print(f"{'mode':>8} {'rescore':>8} {'RAM MB':>10} {'reduction':>10} {'recall@' + str(args.k):>10} {'ms/query':>10}")
+    for row in rows:
+        print(f"{row['mode']:>8} {row['rescore_factor']:>8} {row['ram_mb']:>10.1f} {row['reduction']:>9.1f}x "
+              f"{row['recall']:>10.3f} {row['latency_ms']:>10.3f}")
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Build and query latency of `NumpyVectorStore` against Chroma.
+
+Both stores index the same precomputed vectors (synthetic clustered ones
+by default), so only the stores' own costs are measured: add/build time,
+save and load time for the NumPy store, mean similarity search latency
+and mean MMR latency. Recall@k of Chroma's HNSW results against the exact
+NumPy results is reported too.
+
+    python nlp/rag/benchmarks/vector_store_benchmark.py --n 200000 --dim 768
+    python nlp/rag/benchmarks/vector_store_benchmark.py --n 50000 --csv stores.csv
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Add the project root to the Python path to allow for absolute imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+import chromadb
+from langchain_chroma import Chroma
+from langchain_core.embeddings import FakeEmbeddings
+
+from nlp.rag.benchmarks.ann_benchmark import recall_at_k, synthetic_vectors
+from nlp.rag.core.vector_store import NumpyVectorStore
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def build_chroma(vectors: np.ndarray, ids, batch_size: int = 5000) -> Chroma:
+    client = chromadb.EphemeralClient()
+    store = Chroma(
+        collection_name=f"benchmark_{time.time_ns()}",
+        embedding_function=FakeEmbeddings(size=vectors.shape[1]),
+        client=client,
+        collection_metadata={"hnsw:space": "cosine"},
+    )
+    for start in range(0, len(vectors), batch_size):
+        store._collection.add(
+            ids=ids[start:start + batch_size],
+            embeddings=vectors[start:start + batch_size],
+            documents=[""] * len(ids[start:start + batch_size]),
+        )
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=50_000, help="Synthetic corpus size.")
+    parser.add_argument("--dim", type=int, default=768, help="Synthetic embedding dimension.")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--fetch-k", type=int, default=50, help="Candidates fetched for MMR.")
+    parser.add_argument("--csv", help="Write the results table to this CSV file.")
+    args = parser.parse_args()
+
+    vectors = synthetic_vectors(args.n, args.dim)
+    ids = [str(i) for i in range(args.n)]
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(args.n, size=args.queries, replace=False)]
+    queries = (queries + 0.1 * rng.normal(size=queries.shape).astype(np.float32)).tolist()
+    embedding = FakeEmbeddings(size=args.dim)
+
+    numpy_store = NumpyVectorStore(embedding)
+    _, numpy_build_ms = timed(lambda: numpy_store.add_vectors(vectors, [""] * args.n, ids=ids))
+    with tempfile.TemporaryDirectory() as directory:
+        _, save_ms = timed(lambda: numpy_store.save(directory))
+        numpy_store, load_ms = timed(lambda: NumpyVectorStore.load(directory, embedding))
+        exact, numpy_search_ms = timed(lambda: [
+            [doc.id for doc in numpy_store.similarity_search_by_vector(q, k=args.k)] for q in queries
+        ])
+        _, numpy_mmr_ms = timed(lambda: [
+            numpy_store.max_marginal_relevance_search_by_vector(q, k=args.k, fetch_k=args.fetch_k) for q in queries
+        ])
+
+    chroma_store, chroma_build_ms = timed(lambda: build_chroma(vectors, ids))
+    approximate, chroma_search_ms = timed(lambda: [
+        [doc.id for doc in chroma_store.similarity_search_by_vector(q, k=args.k)] for q in queries
+    ])
+    _, chroma_mmr_ms = timed(lambda: [
+        chroma_store.max_marginal_relevance_search_by_vector(q, k=args.k, fetch_k=args.fetch_k) for q in queries
+    ])
+
+    rows = [
+        {"store": "numpy", "build_ms": numpy_build_ms, "search_ms": numpy_search_ms / args.queries,
+         "mmr_ms": numpy_mmr_ms / args.queries, "recall": 1.0},
+        {"store": "chroma", "build_ms": chroma_build_ms, "search_ms": chroma_search_ms / args.queries,
+         "mmr_ms": chroma_mmr_ms / args.queries,
+         "recall": recall_at_k([np.array(a) for a in approximate], [np.array(e) for e in exact], args.k)},
+    ]
+    print(f"NumPy store: saved in {save_ms:.0f} ms, loaded (memory-mapped) in {load_ms:.1f} ms")
+    print(f"{'store':>8} {'build ms':>10} {'ms/search':>10} {'ms/mmr':>8} {'recall@' + str(args.k):>10}")
+    for row in rows:
+        print(f"{row['store']:>8} {row['build_ms']:>10.0f} {row['search_ms']:>10.3f} "
+              f"{row['mmr_ms']:>8.3f} {row['recall']:>10.3f}")
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,13 @@ class BaseRAG(ABC):
     """
     Abstract base class for a RAG (Retrieval-Augmented Generation) pipeline.
     Defines the standard interface for all RAG implementations.
+
+    `stateful` is True for implementations whose answers depend on state
+    kept between queries (e.g. their own conversation history), so callers
+    must not replay a stored answer instead of calling `query`.
     """
+    stateful = False
+
     @abstractmethod
     def __init__(self, config: Dict = {}):
         """
@@ -23,6 +29,24 @@ class BaseRAG(ABC):
         """
         pass
 
+    def upsert(self, documents: List[Dict[str, str]]):
+        """
+        Adds documents, replacing any already indexed under the same 'id'.
+        Implementations that index chunks override this to re-embed only
+        chunks whose text changed; this default re-ingests every document
+        received through `upsert`.
+        """
+        corpus = self.__dict__.setdefault("_upserted_documents", {})
+        corpus.update((doc["id"], doc) for doc in documents)
+        self.ingest(list(corpus.values()))
+
+    def delete(self, doc_ids: List[str]):
+        """Removes documents, and everything derived from them, by 'id'."""
+        corpus = self.__dict__.setdefault("_upserted_documents", {})
+        for doc_id in doc_ids:
+            corpus.pop(doc_id, None)
+        self.ingest(list(corpus.values()))
+
     @abstractmethod
     def query(self, prompt: str, chat_history: List[Dict]) -> Dict:
         """
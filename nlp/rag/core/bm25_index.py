@@ -0,0 +1,122 @@
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from nlp.rag.core.vector_store import atomic_write
+
+BM25_FILE = "bm25.npz"
+BM25_VOCAB_FILE = "bm25_vocab.json"
+
+# Keeps codes such as "X-200" or "v1.2" together as single tokens
+TOKEN_PATTERN = re.compile(r"\w+(?:[-.]\w+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    A compact in-memory inverted index with Okapi BM25 scoring.
+
+    Postings are stored CSR-style: one int32 array of document rows and one
+    float32 array of *precomputed* BM25 term weights, sliced per term by an
+    offsets array. Scoring a query is therefore just gathering the postings
+    of its terms and summing weights per document, with no per-query length
+    normalization work.
+    """
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids: List[str] = []
+        self.vocab: Dict[str, int] = {}
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.postings = np.empty(0, dtype=np.int32)
+        self.weights = np.empty(0, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def build(self, ids: List[str], texts: List[str]):
+        """Builds the index from scratch over `texts`, identified by `ids`."""
+        self.ids = list(ids)
+        term_freqs = [Counter(tokenize(text)) for text in texts]
+        lengths = np.array([sum(tf.values()) for tf in term_freqs], dtype=np.float32)
+        avg_length = float(lengths.mean()) if len(lengths) and lengths.mean() > 0 else 1.0
+
+        postings_by_term: Dict[str, List[Tuple[int, int]]] = {}
+        for row, tf in enumerate(term_freqs):
+            for term, count in tf.items():
+                postings_by_term.setdefault(term, []).append((row, count))
+
+        n_docs = len(texts)
+        self.vocab = {}
+        offsets = [0]
+        all_rows: List[int] = []
+        all_weights: List[float] = []
+        for term_id, (term, postings) in enumerate(sorted(postings_by_term.items())):
+            self.vocab[term] = term_id
+            df = len(postings)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for row, count in postings:
+                norm = self.k1 * (1 - self.b + self.b * lengths[row] / avg_length)
+                all_rows.append(row)
+                all_weights.append(idf * count * (self.k1 + 1) / (count + norm))
+            offsets.append(len(all_rows))
+
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.postings = np.array(all_rows, dtype=np.int32)
+        self.weights = np.array(all_weights, dtype=np.float32)
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Returns up to k (id, score) pairs, best first."""
+        term_ids = [self.vocab[t] for t in set(tokenize(query)) if t in self.vocab]
+        if not term_ids or k <= 0:
+            return []
+        rows = np.concatenate([self.postings[self.offsets[t]:self.offsets[t + 1]] for t in term_ids])
+        weights = np.concatenate([self.weights[self.offsets[t]:self.offsets[t + 1]] for t in term_ids])
+        unique_rows, inverse = np.unique(rows, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights)
+
+        k = min(k, len(unique_rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self.ids[int(unique_rows[i])], float(scores[i])) for i in top]
+
+    def save(self, path: str):
+        """Writes the index arrays and vocabulary to the `path` directory."""
+        os.makedirs(path, exist_ok=True)
+        with atomic_write(os.path.join(path, BM25_FILE)) as f:
+            np.savez(f, offsets=self.offsets, postings=self.postings, weights=self.weights)
+        with atomic_write(os.path.join(path, BM25_VOCAB_FILE), "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "ids": self.ids, "vocab": self.vocab}, f)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(os.path.join(path, BM25_VOCAB_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        index = cls(k1=meta["k1"], b=meta["b"])
+        index.ids = meta["ids"]
+        index.vocab = meta["vocab"]
+        with np.load(os.path.join(path, BM25_FILE)) as arrays:
+            index.offsets = arrays["offsets"]
+            index.postings = arrays["postings"]
+            index.weights = arrays["weights"]
+        return index
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Fuses several ranked id lists: each id scores sum(1 / (k + rank)) over the
+    lists it appears in (rank starting at 1). Returns (id, score), best first.
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
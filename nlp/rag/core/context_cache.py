@@ -0,0 +1,140 @@
+import hashlib
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List
+
+from langchain_core.messages import BaseMessage, SystemMessage
+
+
+class ContextCache(ABC):
+    """
+    Registers a large, static prompt prefix (e.g. a whole document) once and
+    hands out a key that later LLM calls use to reference it, instead of
+    re-sending the prefix on every turn.
+    """
+    @abstractmethod
+    def register(self, content: str) -> str:
+        """Registers the prefix and returns a key that references it."""
+        pass
+
+    @abstractmethod
+    def prefix_messages(self, key: str) -> List[BaseMessage]:
+        """Messages that must be sent in front of the conversation for `key`."""
+        pass
+
+    @abstractmethod
+    def llm_kwargs(self, key: str) -> Dict:
+        """Keyword arguments to bind onto the LLM so it uses the cached prefix."""
+        pass
+
+    def renew(self, key: str) -> bool:
+        """
+        Keeps the prefix alive before a call that references it. Returns
+        False if it has expired and must be registered again. Backends
+        without server state never expire.
+        """
+        return True
+
+    def release(self, key: str):
+        """Frees the cached prefix. Optional for backends without server state."""
+        pass
+
+
+class LocalContextCache(ContextCache):
+    """
+    In-process stand-in for a server-side context cache. The prefix is kept
+    locally and sent as a SystemMessage, so it behaves like the uncached path
+    while exercising the same register/reference flow. Intended for tests and
+    for documents too small for the provider's cache.
+    """
+    def __init__(self):
+        self._contents: Dict[str, str] = {}
+        self.registrations = 0
+
+    def register(self, content: str) -> str:
+        key = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        if key not in self._contents:
+            self._contents[key] = content
+            self.registrations += 1
+        return key
+
+    def prefix_messages(self, key: str) -> List[BaseMessage]:
+        return [SystemMessage(content=self._contents[key])]
+
+    def llm_kwargs(self, key: str) -> Dict:
+        return {}
+
+    def release(self, key: str):
+        self._contents.pop(key, None)
+
+
+class GeminiContextCache(ContextCache):
+    """
+    Uses Gemini explicit context caching: the prefix is uploaded once as the
+    cached system instruction and later calls pass only `cached_content`.
+
+    The server deletes a cache `ttl_seconds` after its last update, so
+    `renew` extends the TTL once less than half of it is left.
+    """
+    def __init__(self, api_key: str, model: str, ttl_seconds: int = 3600, clock: Callable[[], float] = time.monotonic):
+        from google import genai
+        from google.genai import types
+
+        self._types = types
+        self.client = genai.Client(api_key=api_key)
+        self.model = model
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._names: Dict[str, str] = {}
+        self._expires: Dict[str, float] = {}
+
+    def register(self, content: str) -> str:
+        digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        if digest not in self._names:
+            cache = self.client.caches.create(
+                model=self.model,
+                config=self._types.CreateCachedContentConfig(
+                    display_name=f"rag-context-{digest[:12]}",
+                    system_instruction=content,
+                    ttl=f"{self.ttl_seconds}s",
+                ),
+            )
+            self._names[digest] = cache.name
+            self._expires[cache.name] = self.clock() + self.ttl_seconds
+        return self._names[digest]
+
+    def renew(self, key: str) -> bool:
+        if key not in self._expires:
+            return False
+        if self._expires[key] - self.clock() > self.ttl_seconds / 2:
+            return True
+        try:
+            self.client.caches.update(
+                name=key, config=self._types.UpdateCachedContentConfig(ttl=f"{self.ttl_seconds}s")
+            )
+        except Exception as e:
+            # Already expired (or deleted) server-side: it has to be created again
+            print(f"Warning: Could not renew context cache {key}. Error: {e}")
+            self._forget(key)
+            return False
+        self._expires[key] = self.clock() + self.ttl_seconds
+        return True
+
+    def prefix_messages(self, key: str) -> List[BaseMessage]:
+        # The prefix lives server-side; Gemini rejects a system instruction
+        # alongside cached content, so nothing is sent in front.
+        return []
+
+    def llm_kwargs(self, key: str) -> Dict:
+        return {"cached_content": key}
+
+    def release(self, key: str):
+        try:
+            self.client.caches.delete(name=key)
+        except Exception as e:
+            print(f"Warning: Could not delete context cache {key}. Error: {e}")
+        self._forget(key)
+
+    def _forget(self, key: str):
+        self._names = {d: n for d, n in self._names.items() if n != key}
+        self._expires.pop(key, None)
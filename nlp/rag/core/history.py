@@ -0,0 +1,78 @@
+from collections import deque
+from typing import List
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for budgeting."""
+    return len(text) // 4 + 1
+
+
+class HistoryWindow:
+    """
+    Token-budgeted conversation history.
+
+    Recent turns are kept verbatim while they fit in `max_tokens`, and the
+    kept window always starts on a human turn. Older turns are not
+    summarized by a model: each is compacted to one "Role: text" line,
+    truncated to `compact_chars` (200 by default) characters, and the
+    oldest lines are dropped once they exceed `summary_max_tokens`. The
+    total size sent per turn therefore stays roughly constant no matter how
+    long the conversation runs.
+    """
+    def __init__(self, max_tokens: int = 2000, summary_max_tokens: int = 500, compact_chars: int = 200):
+        self.max_tokens = max_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.compact_chars = compact_chars
+        self.recent: deque = deque()
+        self.summary_lines: deque = deque()
+        self._recent_tokens = 0
+        self._summary_tokens = 0
+
+    def __len__(self) -> int:
+        return len(self.recent)
+
+    def clear(self):
+        self.recent.clear()
+        self.summary_lines.clear()
+        self._recent_tokens = 0
+        self._summary_tokens = 0
+
+    def append(self, message: BaseMessage):
+        """Adds a message and compacts the oldest turns if over budget."""
+        self.recent.append(message)
+        self._recent_tokens += estimate_tokens(message.content)
+        # Always keep the newest message verbatim, even if it alone is over budget.
+        while self._recent_tokens > self.max_tokens and len(self.recent) > 1:
+            self._compact(self.recent.popleft())
+        # Don't let the window open on a reply whose question was compacted
+        if self.summary_lines:
+            while not isinstance(self.recent[0], HumanMessage) and len(self.recent) > 1:
+                self._compact(self.recent.popleft())
+
+    def messages(self) -> List[BaseMessage]:
+        """
+        Returns the recent turns, with the compacted lines (if any) prepended
+        to the first human turn as context rather than sent as a turn of
+        their own, so roles still alternate starting from the user.
+        """
+        if not self.summary_lines:
+            return list(self.recent)
+        summary = "Summary of the earlier conversation:\n" + "\n".join(self.summary_lines)
+        if not self.recent or not isinstance(self.recent[0], HumanMessage):
+            return [HumanMessage(content=summary), *self.recent]
+        first, *rest = self.recent
+        return [HumanMessage(content=f"{summary}\n\n{first.content}"), *rest]
+
+    def _compact(self, message: BaseMessage):
+        self._recent_tokens -= estimate_tokens(message.content)
+        role = "AI" if isinstance(message, AIMessage) else "Human"
+        text = " ".join(message.content.split())
+        if len(text) > self.compact_chars:
+            text = text[:self.compact_chars] + "..."
+        line = f"{role}: {text}"
+        self.summary_lines.append(line)
+        self._summary_tokens += estimate_tokens(line)
+        while self._summary_tokens > self.summary_max_tokens and len(self.summary_lines) > 1:
+            self._summary_tokens -= estimate_tokens(self.summary_lines.popleft())
@@ -0,0 +1,205 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from nlp.rag.core.vector_store import atomic_write
+from nlp.tools.langchain_file_processor.app.chunking import SpanChunker
+from nlp.tools.langchain_file_processor.app.ingestion import IngestionPipeline, index_embedded, print_progress
+
+MANIFEST_FILE = "manifest.json"
+
+
+def fingerprint(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def has_changes(stats: Dict[str, int]) -> bool:
+    """False if the `IncrementalIndexer` call that returned `stats` left the index untouched."""
+    return any(stats.get(key) for key in ("documents_updated", "documents_removed", "chunks_added", "chunks_removed"))
+
+
+class ChunkPlan(NamedTuple):
+    """How one document's chunks differ from what is indexed."""
+    doc_id: str
+    fingerprint: str
+    # (chunk id, start offset, text) for every chunk of the new version
+    chunks: List[Tuple[str, int, str]]
+    # Chunk ids indexed for the old version that no longer exist
+    removed: List[str]
+
+
+class IngestManifest:
+    """
+    Records what is indexed: for each document id, the fingerprint of its
+    text and the ids and fingerprints of its chunks. Chunk ids are derived
+    from the chunk text, so a chunk that survives an edit keeps its id (and
+    its embedding) even if it moved within the document.
+    """
+    def __init__(self, documents: Optional[Dict[str, Dict]] = None):
+        self.documents: Dict[str, Dict] = documents or {}
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.documents
+
+    def is_unchanged(self, doc_id: str, doc_fingerprint: str) -> bool:
+        return self.documents.get(doc_id, {}).get("fingerprint") == doc_fingerprint
+
+    def plan(self, doc_id: str, doc_fingerprint: str, chunks: Iterable[Tuple[int, str]]) -> ChunkPlan:
+        indexed = self.documents.get(doc_id, {}).get("chunks", {})
+        planned, seen = [], {}
+        for start, text in chunks:
+            chunk_fingerprint = fingerprint(text)
+            # Repeated chunks within a document get distinct ids
+            occurrence = seen.get(chunk_fingerprint, 0)
+            seen[chunk_fingerprint] = occurrence + 1
+            chunk_id = f"{doc_id}#{chunk_fingerprint[:16]}" + (f"-{occurrence}" if occurrence else "")
+            planned.append((chunk_id, start, text))
+        current = {chunk_id for chunk_id, _, _ in planned}
+        removed = [chunk_id for chunk_id in indexed if chunk_id not in current]
+        return ChunkPlan(doc_id, doc_fingerprint, planned, removed)
+
+    def record(self, plan: ChunkPlan):
+        self.documents[plan.doc_id] = {
+            "fingerprint": plan.fingerprint,
+            "chunks": {chunk_id: fingerprint(text) for chunk_id, _, text in plan.chunks},
+        }
+
+    def mark_incomplete(self, plan: ChunkPlan):
+        """
+        Records that an update of `plan`'s document did not finish: the
+        document will be re-planned next time, and both its old and new
+        chunk ids stay tracked so none can be orphaned in the store.
+        """
+        chunks = dict(self.documents.get(plan.doc_id, {}).get("chunks", {}))
+        chunks.update((chunk_id, fingerprint(text)) for chunk_id, _, text in plan.chunks)
+        self.documents[plan.doc_id] = {"fingerprint": None, "chunks": chunks}
+
+    def forget(self, doc_id: str) -> List[str]:
+        """Drops a document; returns the ids of its indexed chunks."""
+        return list(self.documents.pop(doc_id, {}).get("chunks", {}))
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        with atomic_write(os.path.join(path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(self.documents, f)
+
+    @classmethod
+    def load(cls, path: str) -> "IngestManifest":
+        manifest_path = os.path.join(path, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return cls()
+        with open(manifest_path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+
+class IncrementalIndexer:
+    """
+    Keeps a vector store in step with a corpus of {'id', 'text'} documents
+    by document id. Unchanged documents are skipped on their fingerprint;
+    for changed ones only chunks with new text are (optionally enriched
+    and) embedded, chunks that disappeared are deleted, and chunks that
+    merely moved get their `start_index` updated in place.
+
+    `enrich(chunks)` may rewrite a document's new chunk Documents before
+    they are embedded (their ids must be kept). The store must expose `ids`
+    and support `delete(ids)` and `update_metadata(ids, metadatas)`, as
+    `NumpyVectorStore` and its subclasses do.
+    """
+    def __init__(
+        self,
+        store: VectorStore,
+        chunker: SpanChunker,
+        manifest: Optional[IngestManifest] = None,
+        enrich: Optional[Callable[[List[Document]], List[Document]]] = None,
+    ):
+        self.store = store
+        self.chunker = chunker
+        self.manifest = manifest or IngestManifest()
+        self.enrich = enrich
+
+    def upsert(self, documents: Iterable[Dict[str, str]]) -> Dict[str, int]:
+        """
+        Adds or replaces documents; returns counts of the work done. Runs
+        through the ingestion pipeline, so planning and enriching a document
+        overlaps with embedding and indexing the chunks of earlier ones.
+        """
+        stats = {
+            "documents_unchanged": 0, "documents_updated": 0, "chunks_added": 0, "chunks_kept": 0, "chunks_removed": 0,
+        }
+        # What is actually in the store decides what must be embedded, so a
+        # previously interrupted update is completed rather than trusted
+        present = set(self.store.ids)
+        plans: List[ChunkPlan] = []
+        moved: Dict[str, Dict] = {}
+        lock = threading.Lock()
+
+        def split(doc: Dict[str, str]) -> List[Document]:
+            doc_fingerprint = fingerprint(doc["text"])
+            if self.manifest.is_unchanged(doc["id"], doc_fingerprint):
+                with lock:
+                    stats["documents_unchanged"] += 1
+                return []
+            plan = self.manifest.plan(
+                doc["id"], doc_fingerprint,
+                ((start, doc["text"][start:end]) for start, end in self.chunker.split_spans(doc["text"])),
+            )
+            new_chunks = []
+            for chunk_id, start, text in plan.chunks:
+                metadata = {"source": plan.doc_id, "start_index": start}
+                if chunk_id in present:
+                    with lock:
+                        moved[chunk_id] = metadata
+                else:
+                    new_chunks.append(Document(id=chunk_id, page_content=text, metadata=metadata))
+            with lock:
+                plans.append(plan)
+                stats["chunks_added"] += len(new_chunks)
+            if new_chunks and self.enrich:
+                new_chunks = self.enrich(new_chunks)
+            return new_chunks
+
+        try:
+            IngestionPipeline(
+                split, self.store.embeddings, index_embedded(self.store), progress=print_progress
+            ).run(documents)
+            removed = [chunk_id for plan in plans for chunk_id in plan.removed]
+            if removed:
+                self.store.delete(removed)
+            if moved:
+                self.store.update_metadata(list(moved), list(moved.values()))
+        except BaseException:
+            for plan in plans:
+                self.manifest.mark_incomplete(plan)
+            raise
+        for plan in plans:
+            self.manifest.record(plan)
+
+        stats["documents_updated"] = len(plans)
+        stats["chunks_kept"] = len(moved)
+        stats["chunks_removed"] = len(removed)
+        return stats
+
+    def delete(self, doc_ids: List[str]) -> Dict[str, int]:
+        """Removes documents and all their chunks."""
+        known = [doc_id for doc_id in doc_ids if doc_id in self.manifest.documents]
+        removed = [chunk_id for doc_id in known for chunk_id in self.manifest.forget(doc_id)]
+        if removed:
+            self.store.delete(removed)
+        return {"documents_removed": len(known), "chunks_removed": len(removed)}
+
+    def sync(self, documents: List[Dict[str, str]]) -> Dict[str, int]:
+        """
+        Makes the index reflect exactly `documents` (replace-everything
+        semantics), at a cost proportional to what changed.
+        """
+        current = {doc["id"] for doc in documents}
+        stale = [doc_id for doc_id in self.manifest.documents if doc_id not in current]
+        stats = self.upsert(documents)
+        stats["chunks_removed"] += self.delete(stale)["chunks_removed"]
+        stats["documents_removed"] = len(stale)
+        return stats
@@ -0,0 +1,184 @@
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from nlp.rag.core.vector_store import NumpyVectorStore, _normalize, atomic_write
+
+IVF_FILE = "ivf.npz"
+
+# Largest temporary (rows x centroids) float32 score matrix, in bytes
+SCORE_BATCH_BYTES = 64 * 2**20
+
+
+def nearest_centroids(vectors: np.ndarray, centroids: np.ndarray, max_bytes: int = SCORE_BATCH_BYTES) -> np.ndarray:
+    """
+    Index of the most similar centroid for every row. Rows are scored in
+    batches sized so each score matrix stays within `max_bytes`, e.g. ~4k
+    rows at a time against 4000 centroids instead of all 100k at once.
+    """
+    batch_size = max(1, max_bytes // (4 * max(1, len(centroids))))
+    out = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), batch_size):
+        out[start:start + batch_size] = np.argmax(np.asarray(vectors[start:start + batch_size]) @ centroids.T, axis=1)
+    return out
+
+
+def spherical_kmeans(
+    vectors: np.ndarray, n_clusters: int, iterations: int = 10, seed: int = 0, max_bytes: int = SCORE_BATCH_BYTES
+) -> np.ndarray:
+    """
+    K-means on normalized vectors using cosine similarity. Returns the
+    (n_clusters, d) matrix of normalized centroids. Assignment steps score
+    in batches bounded by `max_bytes` (see `nearest_centroids`).
+    """
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = nearest_centroids(vectors, centroids, max_bytes)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        counts = np.bincount(assignments, minlength=n_clusters)
+        # Re-seed empty clusters from random points so every list is usable
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = vectors[rng.choice(len(vectors), size=int(empty.sum()))]
+        centroids = _normalize(sums)
+    return centroids.astype(np.float32)
+
+
+class IVFVectorStore(NumpyVectorStore):
+    """
+    A `NumpyVectorStore` with an inverted-file (IVF) approximate nearest
+    neighbour index, for corpora where exact search over every row becomes
+    the latency bottleneck.
+
+    Vectors are clustered with spherical k-means into `nlist` lists. A query
+    is compared to the centroids first and only the rows in the `nprobe`
+    closest lists are scored exactly. Raising `nprobe` trades latency for
+    recall; `nprobe == nlist` is exact search. Until `train` has been called
+    (or while the corpus is smaller than `min_train_size`) search is exact.
+    Training and list assignment score rows against the centroids in
+    batches whose score matrix stays within `score_batch_bytes`.
+    """
+    def __init__(
+        self,
+        embedding: Embeddings,
+        nlist: Optional[int] = None,
+        nprobe: int = 8,
+        train_iterations: int = 10,
+        train_sample_size: int = 100_000,
+        min_train_size: int = 10_000,
+        score_batch_bytes: int = SCORE_BATCH_BYTES,
+        dimension: Optional[int] = None,
+    ):
+        super().__init__(embedding, dimension=dimension)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_iterations = train_iterations
+        self.train_sample_size = train_sample_size
+        self.min_train_size = min_train_size
+        self.score_batch_bytes = score_batch_bytes
+        self.centroids: Optional[np.ndarray] = None
+        self._assignments = np.empty(0, dtype=np.int32)
+        self._list_offsets: Optional[np.ndarray] = None
+        self._list_rows: Optional[np.ndarray] = None
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def train(self, seed: int = 0):
+        """Clusters the current vectors and assigns every row to a list."""
+        if self._size < self.min_train_size:
+            return
+        nlist = self.nlist or max(1, int(4 * np.sqrt(self._size)))
+        rng = np.random.default_rng(seed)
+        sample_size = min(self._size, self.train_sample_size)
+        sample = self.vectors[np.sort(rng.choice(self._size, size=sample_size, replace=False))]
+        self.centroids = spherical_kmeans(
+            np.asarray(sample), min(nlist, sample_size), self.train_iterations, seed, self.score_batch_bytes
+        )
+        self._assignments = self._assign(self.vectors)
+        self._list_offsets = None
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        """Nearest centroid per row, batched to bound the temporary score matrix."""
+        return nearest_centroids(vectors, self.centroids, self.score_batch_bytes)
+
+    def _build_lists(self):
+        """Groups rows by list (CSR layout) so a probe is one contiguous slice."""
+        order = np.argsort(self._assignments, kind="stable").astype(np.int64)
+        counts = np.bincount(self._assignments, minlength=len(self.centroids))
+        self._list_rows = order
+        self._list_offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def add_vectors(self, vectors, texts: List[str], metadatas=None, ids=None) -> List[str]:
+        added = super().add_vectors(vectors, texts, metadatas, ids)
+        if self.is_trained:
+            new_rows = self.vectors[self._size - len(added):]
+            self._assignments = np.concatenate([self._assignments, self._assign(new_rows)])
+            self._list_offsets = None
+        return added
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        if self.is_trained and ids:
+            mask = np.ones(self._size, dtype=bool)
+            mask[[self._id_to_row[i] for i in ids if i in self._id_to_row]] = False
+            self._assignments = self._assignments[mask]
+            self._list_offsets = None
+        return super().delete(ids, **kwargs)
+
+    def _top_k(self, query_vector, k: int, filter: Optional[Dict] = None) -> Tuple[np.ndarray, np.ndarray]:
+        if not self.is_trained or self._size == 0 or k <= 0:
+            return super()._top_k(query_vector, k, filter)
+        if self._list_offsets is None:
+            self._build_lists()
+
+        query = _normalize(np.asarray(query_vector, dtype=np.float32))
+        nprobe = min(self.nprobe, len(self.centroids))
+        probes = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        rows = np.concatenate([
+            self._list_rows[self._list_offsets[p]:self._list_offsets[p + 1]] for p in probes
+        ])
+        allowed = self._filter_rows(filter)
+        if allowed is not None:
+            rows = np.intersect1d(rows, allowed, assume_unique=True)
+        if len(rows) < k:
+            # Too few candidates in the probed lists; fall back to exact search
+            return super()._top_k(query_vector, k, filter)
+
+        scores = self.vectors[rows] @ query
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return rows[top], scores[top]
+
+    def save(self, path: str):
+        super().save(path)
+        if self.is_trained:
+            with atomic_write(os.path.join(path, IVF_FILE)) as f:
+                np.savez(f, centroids=self.centroids, assignments=self._assignments)
+
+    @classmethod
+    def load(cls, path: str, embedding: Embeddings, mmap: bool = True, **params: Any) -> "IVFVectorStore":
+        """Loads a store written by `save`; `params` override the search parameters."""
+        base = NumpyVectorStore.load(path, embedding, mmap=mmap)
+        store = cls(embedding, **params)
+        store.__dict__.update({
+            key: value for key, value in base.__dict__.items()
+            if key in ("_vectors", "_size", "texts", "metadatas", "ids", "_id_to_row")
+        })
+        ivf_path = os.path.join(path, IVF_FILE)
+        if os.path.exists(ivf_path):
+            with np.load(ivf_path) as arrays:
+                store.centroids = arrays["centroids"]
+                store._assignments = arrays["assignments"]
+        return store
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, **kwargs: Any) -> "IVFVectorStore":
+        store = cls(embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        store.train()
+        return store
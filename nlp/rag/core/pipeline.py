@@ -0,0 +1,259 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Sequence
+
+from langchain_core.documents import Document
+from langchain_core.output_parsers import StrOutputParser
+
+from nlp.tools.langchain_file_processor.app.langchain_logic import CITATION_PROMPT, format_citation_context
+
+# Stages run in this order; a strategy provides any subset of them
+STAGES = ("rewrite", "retrieve", "rerank", "compress", "generate")
+
+# The context field each stage's function returns a new value for
+STAGE_OUTPUTS = {
+    "rewrite": "query",
+    "retrieve": "documents",
+    "rerank": "documents",
+    "compress": "documents",
+    "generate": "answer",
+}
+
+
+class QueryContext:
+    """
+    The state every stage reads from. `query` starts as the prompt and is
+    what retrieval runs on; `documents` are the chunks passed on to the
+    next stage and, after the last one, to the generator.
+    """
+    def __init__(self, prompt: str, chat_history: List[Dict]):
+        self.prompt = prompt
+        self.chat_history = chat_history
+        self.query = prompt
+        self.documents: List[Document] = []
+        self.answer: Optional[str] = None
+        self.latency_ms = 0.0
+        self.timings_ms: Dict[str, float] = {}
+        self.cached: List[str] = []
+
+    def result(self) -> Dict:
+        """The BaseRAG.query() result, plus where the time went."""
+        return {
+            "answer": self.answer,
+            "sources": self.documents,
+            "latency_ms": self.latency_ms,
+            "stage_timings_ms": dict(self.timings_ms),
+            "cached_stages": list(self.cached),
+        }
+
+
+def _documents_key(documents: List[Document]) -> str:
+    digest = hashlib.sha256()
+    for doc in documents:
+        digest.update((doc.id or "").encode("utf-8") + b"\0" + doc.page_content.encode("utf-8") + b"\0")
+    return digest.hexdigest()
+
+
+def history_digest(chat_history: Sequence) -> str:
+    """Hash of a conversation (LangChain messages or role/content dicts); '' for none."""
+    if not chat_history:
+        return ""
+    turns = [
+        [message.get("role"), message.get("content")] if isinstance(message, dict)
+        else [getattr(message, "type", type(message).__name__), getattr(message, "content", str(message))]
+        for message in chat_history
+    ]
+    return hashlib.sha256(json.dumps(turns, default=str).encode("utf-8")).hexdigest()
+
+
+def default_cache_key(stage: str, context: QueryContext) -> Hashable:
+    """Keys a stage on the context fields it depends on by default."""
+    if stage == "rewrite":
+        return context.prompt, history_digest(context.chat_history)
+    if stage == "retrieve":
+        return context.query
+    if stage == "generate":
+        return context.prompt, _documents_key(context.documents)
+    return context.query, _documents_key(context.documents)
+
+
+class StageCache:
+    """A thread-safe LRU map from a stage's cache key to its output."""
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        """Returns the cached output, or None on a miss."""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class Stage:
+    """
+    One named step of a pipeline. `fn(context)` returns the new value of
+    the stage's output field (see STAGE_OUTPUTS). With a `cache`, outputs
+    are memoized on `key(context)`, which defaults to `default_cache_key`.
+    """
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[QueryContext], Any],
+        cache: Optional[StageCache] = None,
+        key: Optional[Callable[[QueryContext], Hashable]] = None,
+    ):
+        if name not in STAGES:
+            raise ValueError(f"Unknown stage '{name}'. Expected one of {STAGES}.")
+        self.name = name
+        self.fn = fn
+        self.cache = cache
+        self.key = key or (lambda context: default_cache_key(name, context))
+        self.calls = 0
+        self.total_ms = 0.0
+
+    def run(self, context: QueryContext):
+        start = time.perf_counter()
+        key = self.key(context) if self.cache is not None else None
+        output = self.cache.get(key) if self.cache is not None else None
+        if output is None:
+            output = self.fn(context)
+            if self.cache is not None:
+                self.cache.put(key, output)
+        else:
+            context.cached.append(self.name)
+        # Copy lists so a later stage can't mutate a cached value
+        setattr(context, STAGE_OUTPUTS[self.name], list(output) if isinstance(output, list) else output)
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        context.timings_ms[self.name] = elapsed_ms
+        self.calls += 1
+        self.total_ms += elapsed_ms
+
+
+class RetrievalPipeline:
+    """
+    A query path expressed as ordered stages (rewrite, retrieve, rerank,
+    compress, generate) over a shared QueryContext, so each stage can be
+    timed, memoized or replaced on its own.
+
+    If the retrieval stages leave no documents, generation is skipped and
+    the answer is `empty_answer`. Stages named in `stateful` change state
+    outside the context (e.g. append to a conversation), so they always run
+    and cannot be memoized.
+    """
+    def __init__(
+        self,
+        stages: Dict[str, Callable[[QueryContext], Any]],
+        memoize: Iterable[str] = (),
+        cache_entries: int = 256,
+        empty_answer: str = "Could not find relevant information.",
+        stateful: Iterable[str] = (),
+    ):
+        self.stages: Dict[str, Stage] = {}
+        self.cache_entries = cache_entries
+        self.empty_answer = empty_answer
+        self.stateful = set(stateful)
+        for name in STAGES:
+            if name in stages:
+                self.stages[name] = Stage(name, stages[name])
+        unknown = set(stages) - set(STAGES)
+        if unknown:
+            raise ValueError(f"Unknown stages {sorted(unknown)}. Expected any of {STAGES}.")
+        for name in memoize:
+            self.memoize(name)
+
+    def replace(self, name: str, fn: Callable[[QueryContext], Any]):
+        """Swaps (or adds) one stage's function, keeping memoization but not cached outputs."""
+        previous = self.stages.get(name)
+        stage = Stage(name, fn)
+        if previous is not None and previous.cache is not None:
+            stage.cache = StageCache(previous.cache.max_entries)
+            stage.key = previous.key
+        stages = {**self.stages, name: stage}
+        self.stages = {n: stages[n] for n in STAGES if n in stages}
+
+    def memoize(self, name: str, key: Optional[Callable[[QueryContext], Hashable]] = None, max_entries: Optional[int] = None):
+        """Caches a stage's output on `key(context)`; unchanged inputs skip the stage."""
+        if name not in self.stages:
+            raise ValueError(f"This pipeline has no '{name}' stage.")
+        if name in self.stateful:
+            raise ValueError(f"The '{name}' stage is stateful; replaying a cached output would skip its side effects.")
+        stage = self.stages[name]
+        stage.cache = StageCache(max_entries or self.cache_entries)
+        if key is not None:
+            stage.key = key
+
+    def clear_cache(self):
+        """Drops every memoized output, e.g. because the index changed."""
+        for stage in self.stages.values():
+            if stage.cache is not None:
+                stage.cache.clear()
+
+    def run(self, prompt: str, chat_history: List[Dict]) -> QueryContext:
+        start = time.perf_counter()
+        context = QueryContext(prompt, chat_history)
+        for name, stage in self.stages.items():
+            if name == "generate" and not context.documents and "retrieve" in self.stages:
+                context.answer = self.empty_answer
+                break
+            stage.run(context)
+        context.latency_ms = (time.perf_counter() - start) * 1000
+        return context
+
+    def profile(self) -> Dict[str, Dict]:
+        """Per-stage call counts, mean latency and cache hit counts since creation."""
+        return {
+            name: {
+                "calls": stage.calls,
+                "mean_ms": stage.total_ms / stage.calls if stage.calls else 0.0,
+                "cache_hits": stage.cache.hits if stage.cache is not None else 0,
+            }
+            for name, stage in self.stages.items()
+        }
+
+
+class CitationPipelineMixin:
+    """
+    Query path shared by the BaseRAG strategies built on a RetrievalPipeline.
+    The strategy sets `self.llm` and builds `self.pipeline` with
+    `_build_pipeline`; unless it passes its own, the "generate" stage
+    answers from the documents, in order, with the citation prompt, so
+    [source_N] matches the N-th returned source.
+
+    Config keys:
+    - 'memoize_stages': query stages whose outputs are cached, e.g.
+      ["retrieve"]. The "generate" stage of a `stateful` strategy cannot be
+      memoized.
+    """
+    def _build_pipeline(self, stages: Dict[str, Callable[[QueryContext], Any]], config: Dict) -> RetrievalPipeline:
+        return RetrievalPipeline(
+            {"generate": self._generate, **stages},
+            memoize=config.get("memoize_stages", ()),
+            stateful=("generate",) if getattr(self, "stateful", False) else (),
+        )
+
+    def _generate(self, context: QueryContext) -> str:
+        chain = CITATION_PROMPT | self.llm | StrOutputParser()
+        return chain.invoke({"context": format_citation_context(context.documents), "question": context.prompt})
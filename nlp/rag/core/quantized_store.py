@@ -0,0 +1,187 @@
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from nlp.rag.core.vector_store import NumpyVectorStore, _normalize, atomic_write
+
+CODES_FILE = "codes.npz"
+
+# Number of set bits for every byte value, for Hamming distances on packed codes
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+class QuantizedVectorStore(NumpyVectorStore):
+    """
+    A `NumpyVectorStore` that keeps only quantized codes in RAM.
+
+    - 'int8': each dimension is scaled by a per-dimension factor fitted to
+      the largest magnitude seen so far and rounded to int8 (4x smaller).
+      A batch that exceeds the fitted range refits the factors and
+      requantizes every stored vector, so nothing is ever clipped.
+    - 'binary': only the sign of each dimension is kept, packed 8 per byte
+      (32x smaller); candidates are ranked by Hamming distance.
+
+    A search scores the codes (in row batches, to bound temporaries), takes
+    the best `k * rescore_factor` candidates and rescores those against the
+    full-precision vectors. Once a store has been `save`d and `load`ed, the
+    full-precision matrix is memory-mapped, so only the rescored rows are
+    paged in from disk.
+    """
+    def __init__(
+        self,
+        embedding: Embeddings,
+        quantization: str = "int8",
+        rescore_factor: int = 4,
+        batch_size: int = 8192,
+        dimension: Optional[int] = None,
+    ):
+        if quantization not in ("int8", "binary"):
+            raise ValueError(f"Unknown quantization '{quantization}', expected 'int8' or 'binary'.")
+        super().__init__(embedding, dimension=dimension)
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+        self.batch_size = batch_size
+        self.scale: Optional[np.ndarray] = None
+        self.codes = np.empty((0, 0), dtype=np.int8 if quantization == "int8" else np.uint8)
+
+    def _quantize(self, vectors: np.ndarray) -> np.ndarray:
+        if self.quantization == "binary":
+            return np.packbits(vectors > 0, axis=1)
+        return np.clip(np.rint(vectors * self.scale), -127, 127).astype(np.int8)
+
+    def _fit_scale(self, vectors: np.ndarray) -> bool:
+        """Widens the int8 range to cover `vectors`; returns True if it changed."""
+        max_abs = np.abs(vectors).max(axis=0)
+        if self.scale is not None:
+            fitted = 127.0 / self.scale
+            if (max_abs <= fitted).all():
+                return False
+            max_abs = np.maximum(max_abs, fitted)
+        max_abs[max_abs == 0] = 1.0
+        self.scale = (127.0 / max_abs).astype(np.float32)
+        return True
+
+    def _batches(self):
+        for start in range(0, self._size, self.batch_size):
+            yield np.asarray(self.vectors[start:start + self.batch_size])
+
+    def _requantize(self):
+        """Fits the int8 range on every stored vector and rebuilds all codes, in row batches."""
+        if self.quantization == "int8":
+            for batch in self._batches():
+                self._fit_scale(batch)
+        self.codes = np.concatenate([self._quantize(batch) for batch in self._batches()])
+
+    def add_vectors(self, vectors, texts: List[str], metadatas=None, ids=None) -> List[str]:
+        added = super().add_vectors(vectors, texts, metadatas, ids)
+        new_vectors = np.asarray(self.vectors[self._size - len(added):])
+        if self.quantization == "int8" and self._fit_scale(new_vectors) and len(self.codes):
+            # Earlier codes were scaled for a narrower range
+            self._requantize()
+            return added
+        new_codes = self._quantize(new_vectors)
+        self.codes = new_codes if len(self.codes) == 0 else np.concatenate([self.codes, new_codes])
+        return added
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        rows = [self._id_to_row[i] for i in (ids or []) if i in self._id_to_row]
+        if rows:
+            mask = np.ones(self._size, dtype=bool)
+            mask[rows] = False
+            self.codes = self.codes[mask]
+        return super().delete(ids, **kwargs)
+
+    def _approximate_scores(self, query: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        """Scores every code (higher is better) without materializing a float matrix."""
+        codes = self.codes if rows is None else self.codes[rows]
+        scores = np.empty(len(codes), dtype=np.float32)
+        if self.quantization == "binary":
+            query_bits = np.packbits(query > 0)
+            for start in range(0, len(codes), self.batch_size):
+                batch = codes[start:start + self.batch_size]
+                distances = _POPCOUNT[np.bitwise_xor(batch, query_bits)].sum(axis=1, dtype=np.int32)
+                scores[start:start + self.batch_size] = -distances
+        else:
+            # (codes / scale) @ query == codes @ (query / scale)
+            scaled_query = query / self.scale
+            for start in range(0, len(codes), self.batch_size):
+                batch = codes[start:start + self.batch_size].astype(np.float32)
+                scores[start:start + self.batch_size] = batch @ scaled_query
+        return scores
+
+    def _top_k(self, query_vector, k: int, filter: Optional[Dict] = None) -> Tuple[np.ndarray, np.ndarray]:
+        if self._size == 0 or k <= 0:
+            return super()._top_k(query_vector, k, filter)
+        query = _normalize(np.asarray(query_vector, dtype=np.float32))
+        rows = self._filter_rows(filter)
+        scores = self._approximate_scores(query, rows)
+        n_candidates = min(max(k * self.rescore_factor, k), len(scores))
+        if n_candidates == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        candidates = np.argpartition(-scores, n_candidates - 1)[:n_candidates]
+        if rows is not None:
+            candidates = rows[candidates]
+        candidates = np.sort(candidates)  # sequential reads from the memory-mapped matrix
+
+        exact = self.vectors[candidates] @ query
+        k = min(k, len(candidates))
+        top = np.argpartition(-exact, k - 1)[:k]
+        top = top[np.argsort(-exact[top], kind="stable")]
+        return candidates[top], exact[top]
+
+    def memory_report(self) -> Dict:
+        """Bytes held in RAM for candidate generation vs. a float32 matrix."""
+        full_bytes = self._size * self.vectors.shape[1] * 4 if self._size else 0
+        code_bytes = self.codes.nbytes
+        return {
+            "quantization": self.quantization,
+            "vectors": self._size,
+            "float32_bytes": full_bytes,
+            "code_bytes": code_bytes,
+            "reduction": full_bytes / code_bytes if code_bytes else 0.0,
+            "full_precision_memory_mapped": isinstance(self._vectors, np.memmap),
+        }
+
+    def save(self, path: str):
+        super().save(path)
+        with atomic_write(os.path.join(path, CODES_FILE)) as f:
+            np.savez(
+                f,
+                codes=self.codes,
+                scale=self.scale if self.scale is not None else np.empty(0, dtype=np.float32),
+                quantization=np.array(self.quantization),
+            )
+
+    @classmethod
+    def load(cls, path: str, embedding: Embeddings, mmap: bool = True, **params: Any) -> "QuantizedVectorStore":
+        """
+        Loads codes into RAM and memory-maps the full-precision vectors. A
+        plain `NumpyVectorStore` directory (no codes file), or one saved
+        with a different `quantization` than requested, is quantized on load.
+        """
+        base = NumpyVectorStore.load(path, embedding, mmap=mmap)
+        codes_path = os.path.join(path, CODES_FILE)
+        arrays = None
+        if os.path.exists(codes_path):
+            with np.load(codes_path) as f:
+                arrays = dict(f)
+            params.setdefault("quantization", str(arrays["quantization"]))
+        store = cls(embedding, **params)
+        store.__dict__.update({
+            key: value for key, value in base.__dict__.items()
+            if key in ("_vectors", "_size", "texts", "metadatas", "ids", "_id_to_row")
+        })
+        if arrays is not None and str(arrays["quantization"]) == store.quantization:
+            store.codes = arrays["codes"]
+            store.scale = arrays["scale"] if arrays["scale"].size else None
+        elif store._size:
+            store._requantize()
+        return store
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, **kwargs: Any) -> "QuantizedVectorStore":
+        store = cls(embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
@@ -0,0 +1,62 @@
+import ast
+import importlib
+import os
+from typing import Dict, NamedTuple, Optional, Type
+
+from nlp.rag.core.base import BaseRAG
+
+
+class StrategyInfo(NamedTuple):
+    """Metadata about a RAG strategy, read without importing its module."""
+    name: str
+    class_name: str
+    module: str
+    description: str
+
+
+def friendly_name(class_name: str) -> str:
+    """'HybridBM25RAG' -> 'HybridBM25 RAG', as shown in the strategy dropdown."""
+    return class_name.replace("RAG", " RAG").replace("_", " ")
+
+
+def _summary(docstring: Optional[str]) -> str:
+    """The first paragraph of a docstring, on one line."""
+    if not docstring:
+        return ""
+    return " ".join(docstring.strip().split("\n\n")[0].split())
+
+
+def discover_strategies(directory: str, package: str) -> Dict[str, StrategyInfo]:
+    """
+    Finds the BaseRAG subclasses defined in the modules of `directory` by
+    parsing their source, so nothing (and none of their heavy dependencies)
+    is imported. A class is picked up when `BaseRAG` is one of its direct
+    bases, which is how every strategy in `implementations` is written.
+    """
+    strategies = {}
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".py") or filename.startswith("__"):
+            continue
+        with open(os.path.join(directory, filename), encoding="utf-8") as f:
+            tree = ast.parse(f.read(), filename=filename)
+        for node in tree.body:
+            if not isinstance(node, ast.ClassDef):
+                continue
+            bases = {base.id if isinstance(base, ast.Name) else getattr(base, "attr", None) for base in node.bases}
+            if BaseRAG.__name__ in bases:
+                info = StrategyInfo(
+                    name=friendly_name(node.name),
+                    class_name=node.name,
+                    module=f"{package}.{filename[:-3]}",
+                    description=_summary(ast.get_docstring(node)),
+                )
+                strategies[info.name] = info
+    return strategies
+
+
+def load_strategy(info: StrategyInfo) -> Type[BaseRAG]:
+    """Imports the strategy's module (only now) and returns its class."""
+    rag_class = getattr(importlib.import_module(info.module), info.class_name)
+    if not (isinstance(rag_class, type) and issubclass(rag_class, BaseRAG)):
+        raise TypeError(f"{info.module}.{info.class_name} is not a BaseRAG subclass.")
+    return rag_class
@@ -0,0 +1,169 @@
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from nlp.rag.core.base import BaseRAG
+from nlp.rag.core.pipeline import history_digest
+
+
+class SemanticCache:
+    """
+    Maps prompts to previously generated results by embedding similarity.
+
+    Prompt embeddings are kept L2-normalized in one float32 matrix, so a
+    lookup is a single matrix-vector product. An entry is a hit when its
+    cosine similarity to the incoming prompt is at least `threshold`, it was
+    stored under the same `context` (e.g. a `history_digest`) and it is
+    younger than `ttl_seconds`. Expired entries are dropped on every lookup
+    and store; when `max_entries` is reached the least recently used entry
+    is replaced.
+    """
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        threshold: float = 0.95,
+        ttl_seconds: Optional[float] = 3600,
+        max_entries: int = 1000,
+    ):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """Drops every entry, e.g. because the underlying corpus changed."""
+        with self._lock:
+            self._vectors: Optional[np.ndarray] = None
+            self._entries: List[Dict] = []
+            self._contexts: List[str] = []
+            self._created = np.empty(0, dtype=np.float64)
+            self._last_used = np.empty(0, dtype=np.float64)
+
+    def embed(self, prompt: str) -> np.ndarray:
+        """Normalized prompt embedding, reusable across `lookup` and `store`."""
+        vector = np.asarray(self.embeddings.embed_query(prompt), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _drop_expired(self, now: float):
+        """Removes entries older than the TTL; call with the lock held."""
+        if self.ttl_seconds is None or not self._entries:
+            return
+        live = now - self._created <= self.ttl_seconds
+        if live.all():
+            return
+        keep = np.flatnonzero(live)
+        self._vectors = self._vectors[keep]
+        self._entries = [self._entries[i] for i in keep]
+        self._contexts = [self._contexts[i] for i in keep]
+        self._created = self._created[keep]
+        self._last_used = self._last_used[keep]
+
+    def lookup(self, prompt: str, vector: Optional[np.ndarray] = None, context: str = "") -> Optional[Dict]:
+        """Returns the cached result for the most similar live prompt stored under `context`, or None."""
+        vector = self.embed(prompt) if vector is None else vector
+        now = time.time()
+        with self._lock:
+            self._drop_expired(now)
+            if self._vectors is None or not self._entries:
+                self.misses += 1
+                return None
+            scores = self._vectors @ vector
+            scores[np.array([c != context for c in self._contexts])] = -np.inf
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._last_used[best] = now
+            return self._entries[best]
+
+    def store(self, prompt: str, result: Dict, vector: Optional[np.ndarray] = None, context: str = ""):
+        vector = self.embed(prompt) if vector is None else vector
+        now = time.time()
+        with self._lock:
+            self._drop_expired(now)
+            if self._vectors is None:
+                self._vectors = np.empty((0, vector.shape[0]), dtype=np.float32)
+            if len(self._entries) < self.max_entries:
+                self._vectors = np.vstack([self._vectors, vector[None, :]])
+                self._entries.append(result)
+                self._contexts.append(context)
+                self._created = np.append(self._created, now)
+                self._last_used = np.append(self._last_used, now)
+                return
+            # Full: overwrite the least recently used slot in place
+            slot = int(np.argmin(self._last_used))
+            self._vectors[slot] = vector
+            self._entries[slot] = result
+            self._contexts[slot] = context
+            self._created[slot] = now
+            self._last_used[slot] = now
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class SemanticCachedRAG(BaseRAG):
+    """
+    Opt-in wrapper that puts a `SemanticCache` in front of any BaseRAG.
+
+    A prompt similar enough to a previous one returns the stored answer and
+    sources without running retrieval or generation. Answers are only
+    reused for the same conversation so far (entries are keyed by a digest
+    of `chat_history`), and the cache is bypassed for RAGs that keep their
+    own conversation state (`stateful`), since a hit would skip recording
+    the turn. `ingest`, `upsert` and `delete` forward to the wrapped RAG
+    and invalidate the cache, since answers may change with the corpus.
+    Results carry a 'cache_hit' flag.
+    """
+    def __init__(self, rag: BaseRAG, embeddings: Embeddings, config: Dict = {}):
+        self.rag = rag
+        self.cache = SemanticCache(
+            embeddings,
+            threshold=config.get("semantic_cache_threshold", 0.95),
+            ttl_seconds=config.get("semantic_cache_ttl_s", 3600),
+            max_entries=config.get("semantic_cache_max_entries", 1000),
+        )
+
+    def ingest(self, documents: List[Dict[str, str]]):
+        self.rag.ingest(documents)
+        self.cache.clear()
+
+    def upsert(self, documents: List[Dict[str, str]]):
+        self.rag.upsert(documents)
+        self.cache.clear()
+
+    def delete(self, doc_ids: List[str]):
+        self.rag.delete(doc_ids)
+        self.cache.clear()
+
+    def query(self, prompt: str, chat_history: List[Dict]) -> Dict:
+        if self.rag.stateful:
+            return {**self.rag.query(prompt, chat_history), "cache_hit": False}
+
+        start_time = time.perf_counter()
+        vector = self.cache.embed(prompt)
+        context = history_digest(chat_history)
+        cached = self.cache.lookup(prompt, vector, context)
+        if cached is not None:
+            return {**cached, "cache_hit": True, "latency_ms": (time.perf_counter() - start_time) * 1000}
+
+        result = self.rag.query(prompt, chat_history)
+        # Don't cache "please ingest first"-style responses that have no sources
+        if result.get("sources"):
+            self.cache.store(prompt, {"answer": result["answer"], "sources": result["sources"]}, vector, context)
+        return {**result, "cache_hit": False}
@@ -0,0 +1,335 @@
+import json
+import os
+import tempfile
+import uuid
+from contextlib import contextmanager
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+VECTORS_FILE = "vectors.npy"
+DOCSTORE_FILE = "docstore.json"
+
+
+@contextmanager
+def atomic_write(path: str, mode: str = "wb", **kwargs: Any) -> Iterator[IO]:
+    """
+    Opens a temporary file next to `path` and, once the block completes,
+    renames it over `path`. Readers (including processes that memory-map
+    the old file) keep seeing the previous version until the rename, and a
+    crash mid-write leaves the previous version intact.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, **kwargs) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def remove_saved(path: str, filenames: Iterable[str]):
+    """Deletes files written by `save` from `path`, ignoring ones that don't exist."""
+    for filename in filenames:
+        try:
+            os.remove(os.path.join(path, filename))
+        except FileNotFoundError:
+            pass
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalizes rows so that a dot product is the cosine similarity."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def mmr_select(
+    query_vector: np.ndarray,
+    candidates: np.ndarray,
+    k: int,
+    lambda_mult: float = 0.5,
+) -> List[int]:
+    """
+    Maximal Marginal Relevance over normalized candidate vectors.
+
+    The query and pairwise similarities are computed once as matrix products;
+    each of the k selection steps is then a single vectorized update of the
+    running "max similarity to anything already selected" array.
+    Returns indices into `candidates` in selection order.
+    """
+    n = candidates.shape[0]
+    if n == 0 or k <= 0:
+        return []
+    k = min(k, n)
+    query_sims = candidates @ query_vector
+    pairwise = candidates @ candidates.T
+
+    selected = [int(np.argmax(query_sims))]
+    max_redundancy = pairwise[selected[0]].copy()
+    available = np.ones(n, dtype=bool)
+    available[selected[0]] = False
+
+    for _ in range(k - 1):
+        scores = lambda_mult * query_sims - (1 - lambda_mult) * max_redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_redundancy, pairwise[best], out=max_redundancy)
+    return selected
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    A lightweight in-process vector store backed by one contiguous float32
+    matrix of L2-normalized embeddings.
+
+    Search is a single matrix-vector product plus `argpartition`, and MMR is
+    vectorized over the fetched candidates. `save` writes the matrix as a
+    `.npy` file next to a JSON docstore; `load` memory-maps the matrix so
+    large indexes open instantly and share pages between processes.
+    """
+    def __init__(self, embedding: Embeddings, dimension: Optional[int] = None):
+        self.embedding = embedding
+        self._vectors = np.empty((0, dimension or 0), dtype=np.float32)
+        self._size = 0
+        self.texts: List[str] = []
+        self.metadatas: List[Dict] = []
+        self.ids: List[str] = []
+        self._id_to_row: Dict[str, int] = {}
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """The (n, d) float32 matrix of normalized embeddings currently indexed."""
+        return self._vectors[:self._size]
+
+    def __len__(self) -> int:
+        return self._size
+
+    # --- Writes ---
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[Dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        vectors = self.embedding.embed_documents(texts)
+        return self.add_vectors(vectors, texts, metadatas, ids)
+
+    def add_vectors(
+        self,
+        vectors,
+        texts: List[str],
+        metadatas: Optional[List[Dict]] = None,
+        ids: Optional[List[str]] = None,
+    ) -> List[str]:
+        """Adds precomputed embeddings without calling the embedding model."""
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        # Re-adding an existing id replaces it
+        existing = [i for i in ids if i in self._id_to_row]
+        if existing:
+            self.delete(existing)
+
+        self._reserve(self._size + len(texts), vectors.shape[1])
+        self._vectors[self._size:self._size + len(texts)] = vectors
+        for offset, doc_id in enumerate(ids):
+            self._id_to_row[doc_id] = self._size + offset
+        self._size += len(texts)
+        self.texts.extend(texts)
+        self.metadatas.extend(dict(m) for m in metadatas)
+        self.ids.extend(ids)
+        return list(ids)
+
+    def _reserve(self, capacity: int, dimension: int):
+        """Grows the backing matrix geometrically so appends are amortized O(1)."""
+        if self._vectors.shape[1] != dimension:
+            if self._size:
+                raise ValueError(
+                    f"Embedding dimension {dimension} does not match index dimension {self._vectors.shape[1]}."
+                )
+            self._vectors = np.empty((0, dimension), dtype=np.float32)
+        # A memory-mapped (read-only) matrix is copied into RAM on first write
+        writable = self._vectors.flags.writeable and not isinstance(self._vectors, np.memmap)
+        if capacity <= self._vectors.shape[0] and writable:
+            return
+        new_capacity = max(capacity, 2 * self._vectors.shape[0], 64)
+        grown = np.empty((new_capacity, dimension), dtype=np.float32)
+        grown[:self._size] = self._vectors[:self._size]
+        self._vectors = grown
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        if not ids:
+            return False
+        rows = {self._id_to_row[i] for i in ids if i in self._id_to_row}
+        if not rows:
+            return False
+        mask = np.ones(self._size, dtype=bool)
+        mask[list(rows)] = False
+        keep = np.flatnonzero(mask)
+        self._vectors = np.ascontiguousarray(self.vectors[keep])
+        self._size = len(keep)
+        self.texts = [self.texts[r] for r in keep]
+        self.metadatas = [self.metadatas[r] for r in keep]
+        self.ids = [self.ids[r] for r in keep]
+        self._id_to_row = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        return True
+
+    def update_metadata(self, ids: List[str], metadatas: List[Dict]):
+        """Merges `metadatas` into the stored metadata of `ids`, leaving vectors untouched."""
+        for doc_id, metadata in zip(ids, metadatas):
+            row = self._id_to_row.get(doc_id)
+            if row is not None:
+                self.metadatas[row] = {**self.metadatas[row], **metadata}
+
+    def get_by_ids(self, ids: List[str]) -> List[Document]:
+        return [self._document(self._id_to_row[i]) for i in ids if i in self._id_to_row]
+
+    # --- Search ---
+
+    def _document(self, row: int) -> Document:
+        return Document(
+            id=self.ids[row], page_content=self.texts[row], metadata=dict(self.metadatas[row])
+        )
+
+    def _filter_rows(self, filter: Optional[Dict]) -> Optional[np.ndarray]:
+        """Row indices whose metadata matches every key in `filter`, or None for all rows."""
+        if not filter:
+            return None
+        return np.array(
+            [row for row, metadata in enumerate(self.metadatas)
+             if all(metadata.get(key) == value for key, value in filter.items())],
+            dtype=np.int64,
+        )
+
+    def _top_k(self, query_vector, k: int, filter: Optional[Dict] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns (rows, scores) of the k most similar vectors, best first."""
+        if self._size == 0 or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        query = _normalize(np.asarray(query_vector, dtype=np.float32))
+        rows = self._filter_rows(filter)
+        matrix = self.vectors if rows is None else self.vectors[rows]
+        scores = matrix @ query
+        k = min(k, scores.shape[0])
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return (top if rows is None else rows[top]), scores[top]
+
+    def similarity_search_with_score_by_vector(
+        self, embedding: List[float], k: int = 4, filter: Optional[Dict] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        rows, scores = self._top_k(embedding, k, filter)
+        return [(self._document(int(r)), float(s)) for r, s in zip(rows, scores)]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[Dict] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        embedding = self.embedding.embed_query(query)
+        return self.similarity_search_with_score_by_vector(embedding, k, filter)
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, filter: Optional[Dict] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, filter)]
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: Optional[Dict] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def max_marginal_relevance_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[Dict] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        rows, _ = self._top_k(embedding, fetch_k, filter)
+        query = _normalize(np.asarray(embedding, dtype=np.float32))
+        selected = mmr_select(query, self.vectors[rows], k, lambda_mult)
+        return [self._document(int(rows[i])) for i in selected]
+
+    def max_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[Dict] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        embedding = self.embedding.embed_query(query)
+        return self.max_marginal_relevance_search_by_vector(embedding, k, fetch_k, lambda_mult, filter)
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # Scores are cosine similarities in [-1, 1]
+        return lambda score: (score + 1.0) / 2.0
+
+    # --- Construction and persistence ---
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[Dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> "NumpyVectorStore":
+        store = cls(embedding)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
+
+    def save(self, path: str):
+        """
+        Writes the vector matrix and docstore to the `path` directory. Each
+        file is replaced atomically, so saving a store that was loaded
+        memory-mapped from `path` is safe.
+        """
+        os.makedirs(path, exist_ok=True)
+        with atomic_write(os.path.join(path, VECTORS_FILE)) as f:
+            np.save(f, np.ascontiguousarray(self.vectors))
+        with atomic_write(os.path.join(path, DOCSTORE_FILE), "w", encoding="utf-8") as f:
+            json.dump({"ids": self.ids, "texts": self.texts, "metadatas": self.metadatas}, f)
+
+    @classmethod
+    def load(cls, path: str, embedding: Embeddings, mmap: bool = True) -> "NumpyVectorStore":
+        """
+        Loads a store written by `save`. With `mmap=True` the matrix is
+        memory-mapped read-only and only copied into RAM if the store is written to.
+        """
+        vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode="r" if mmap else None)
+        with open(os.path.join(path, DOCSTORE_FILE), encoding="utf-8") as f:
+            docstore = json.load(f)
+
+        store = cls(embedding)
+        store._vectors = vectors
+        store._size = vectors.shape[0]
+        store.ids = docstore["ids"]
+        store.texts = docstore["texts"]
+        store.metadatas = docstore["metadatas"]
+        store._id_to_row = {doc_id: row for row, doc_id in enumerate(store.ids)}
+        return store
@@ -0,0 +1,113 @@
+import os
+import sys
+from typing import List, Dict
+
+# Add the project root to the Python path to allow for absolute imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from nlp.rag.core.base import BaseRAG
+from nlp.rag.core.incremental import MANIFEST_FILE, IncrementalIndexer, IngestManifest, has_changes
+from nlp.rag.core.ivf_index import IVF_FILE, IVFVectorStore
+from nlp.rag.core.pipeline import CitationPipelineMixin, QueryContext
+from nlp.rag.core.vector_store import DOCSTORE_FILE, VECTORS_FILE, remove_saved
+from nlp.tools.langchain_file_processor.app.chunking import SpanChunker
+from nlp.tools.langchain_file_processor.app.langchain_logic import (
+    get_llm, get_embeddings
+)
+from langchain_core.documents import Document
+
+from dotenv import load_dotenv
+load_dotenv()
+
+class ANNRAG(CitationPipelineMixin, BaseRAG):
+    """
+    A RAG implementation for large corpora that retrieves through an
+    approximate nearest neighbour (IVF) index instead of exact search.
+
+    Config keys (see `nlp/rag/benchmarks/ann_benchmark.py` for picking them):
+    - 'k': number of chunks passed to the generator (default 5).
+    - 'nlist': number of IVF lists; defaults to ~4 * sqrt(number of chunks).
+    - 'nprobe': lists scanned per query; higher is slower but more exact (default 8).
+    - 'train_iterations': k-means iterations at build time (default 10).
+    - 'train_sample_size': max chunks sampled for k-means (default 100000).
+    - 'min_train_size': below this many chunks search stays exact (default 10000).
+    - 'persist_directory': if set, the index and its ingestion manifest are
+      saved there after ingestion and loaded from it on start-up.
+    - 'memoize_stages': see `CitationPipelineMixin`.
+    """
+    def __init__(self, config: Dict = {}):
+        google_api_key = os.getenv("GOOGLE_API_KEY")
+        if not google_api_key:
+            raise ValueError("GOOGLE_API_KEY not found in environment variables.")
+
+        self.llm = get_llm(google_api_key)
+        self.embeddings = get_embeddings(google_api_key)
+        self.chunker = SpanChunker(chunk_size=1000, chunk_overlap=200)
+        self.k = config.get("k", 5)
+        self.index_params = {
+            key: config[key]
+            for key in ("nlist", "nprobe", "train_iterations", "train_sample_size", "min_train_size")
+            if key in config
+        }
+        self.persist_directory = config.get("persist_directory")
+        self.vector_store = IVFVectorStore(self.embeddings, **self.index_params)
+        self.manifest = IngestManifest()
+
+        if self.persist_directory and os.path.exists(os.path.join(self.persist_directory, VECTORS_FILE)):
+            self.vector_store = IVFVectorStore.load(self.persist_directory, self.embeddings, **self.index_params)
+            self.manifest = IngestManifest.load(self.persist_directory)
+
+        self.pipeline = self._build_pipeline({"retrieve": self._retrieve}, config)
+
+    def _indexer(self) -> IncrementalIndexer:
+        return IncrementalIndexer(self.vector_store, self.chunker, self.manifest)
+
+    def ingest(self, documents: List[Dict[str, str]]):
+        """
+        Makes the index reflect exactly `documents`, embedding only chunks
+        whose text is new, then trains the IVF index if it is not trained yet.
+        """
+        print("Ingesting documents for ANNRAG...")
+        self._after_update(self._indexer().sync(documents))
+
+    def upsert(self, documents: List[Dict[str, str]]):
+        """Adds or replaces documents by id; new chunks join their nearest IVF list."""
+        self._after_update(self._indexer().upsert(documents))
+
+    def delete(self, doc_ids: List[str]):
+        """Removes documents and their chunks by id."""
+        self._after_update(self._indexer().delete(doc_ids))
+
+    def _after_update(self, stats: Dict[str, int]):
+        changed = has_changes(stats)
+        if changed:
+            self.pipeline.clear_cache()
+        if not len(self.vector_store):
+            # Otherwise the deleted documents would be loaded again on start-up
+            if self.persist_directory and changed:
+                remove_saved(self.persist_directory, (VECTORS_FILE, DOCSTORE_FILE, IVF_FILE, MANIFEST_FILE))
+            print("No text to ingest.")
+            return
+
+        if not self.vector_store.is_trained:
+            self.vector_store.train()
+            changed = changed or self.vector_store.is_trained
+        # Re-ingesting an unchanged corpus leaves the persisted index alone
+        if self.persist_directory and changed:
+            self.vector_store.save(self.persist_directory)
+            self.manifest.save(self.persist_directory)
+        print(f"Ingestion complete. IVF trained: {self.vector_store.is_trained}. {stats}")
+
+    def query(self, prompt: str, chat_history: List[Dict]) -> Dict:
+        """Retrieves through the ANN index and generates a cited answer."""
+        if not self.vector_store:
+            return {
+                "answer": "I have no documents to search. Please upload a file first.",
+                "sources": [],
+                "latency_ms": 0
+            }
+
+        return self.pipeline.run(prompt, chat_history).result()
+
+    def _retrieve(self, context: QueryContext) -> List[Document]:
+        return self.vector_store.similarity_search(context.query, k=self.k)
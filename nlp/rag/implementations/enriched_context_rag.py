@@ -1,6 +1,5 @@
 import os
 import sys
-import time
 from typing import List, Dict
 import instructor
 from pydantic import BaseModel, Field
@@ -10,11 +9,14 @@ from tqdm import tqdm
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
 
 from nlp.rag.core.base import BaseRAG
-from nlp.tools.langchain_file_processor.app.langchain_logic import get_llm, get_fast_llm, get_embeddings, CITATION_PROMPT
+from nlp.rag.core.incremental import IncrementalIndexer
+from nlp.rag.core.pipeline import CitationPipelineMixin, QueryContext
+from nlp.rag.core.vector_store import NumpyVectorStore
+from nlp.tools.langchain_file_processor.app.chunking import SpanChunker
+from nlp.tools.langchain_file_processor.app.langchain_logic import (
+    get_llm, get_fast_llm, get_embeddings
+)
 from langchain_core.documents import Document
-from langchain.chains import RetrievalQA
-from langchain_chroma import Chroma
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -24,10 +26,13 @@ class EnrichedChunk(BaseModel):
     summary: str = Field(..., description="A concise summary of the chunk.")
     hypothetical_question: str = Field(..., description="A hypothetical question the chunk answers.")
 
-class EnrichedContextRAG(BaseRAG):
+class EnrichedContextRAG(CitationPipelineMixin, BaseRAG):
     """
     A RAG implementation that uses a fast LLM to enrich document chunks
     at ingestion time with a summary and a hypothetical question.
+
+    Config keys:
+    - 'memoize_stages': see `CitationPipelineMixin`.
     """
     def __init__(self, config: Dict = {}):
         google_api_key = os.getenv("GOOGLE_API_KEY")
@@ -37,119 +42,83 @@ class EnrichedContextRAG(BaseRAG):
         self.llm = get_llm(google_api_key)
         self.fast_llm = get_fast_llm(google_api_key)
         self.embeddings = get_embeddings(google_api_key)
-        self.text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
+        self.chunker = SpanChunker(chunk_size=500, chunk_overlap=100)
+        self.vector_store = NumpyVectorStore(self.embeddings)
+        self.indexer = IncrementalIndexer(self.vector_store, self.chunker, enrich=self._enrich)
         self.retriever = None
+        self.pipeline = self._build_pipeline({"retrieve": self._retrieve, "compress": self._original_content}, config)
 
     def ingest(self, documents: List[Dict[str, str]]):
-        """Processes, enriches, and indexes documents."""
+        """
+        Processes, enriches, and indexes documents. Only chunks whose text
+        is not already indexed are sent to the enrichment LLM and embedded.
+        """
         print("Ingesting and enriching documents for EnrichedContextRAG...")
-        
-        # 1. Chunk all documents
-        all_chunks = []
-        for doc in documents:
-            chunks = self.text_splitter.split_text(doc['text'])
-            for chunk_text in chunks:
-                all_chunks.append({"text": chunk_text, "source_id": doc['id']})
-
-        # 2. Enrich each chunk using the fast LLM
-        enriched_docs_for_indexing = []
-        
+        self._after_update(self.indexer.sync(documents))
+
+    def upsert(self, documents: List[Dict[str, str]]):
+        """Adds or replaces documents by id, enriching only new chunks."""
+        self._after_update(self.indexer.upsert(documents))
+
+    def delete(self, doc_ids: List[str]):
+        """Removes documents and their enriched chunks by id."""
+        self._after_update(self.indexer.delete(doc_ids))
+
+    def _after_update(self, stats: Dict[str, int]):
+        self.pipeline.clear_cache()
+        if not len(self.vector_store):
+            print("No text to ingest.")
+            self.retriever = None
+            return
+        self.retriever = self.vector_store.as_retriever(search_kwargs={'k': 5})
+        print(f"Ingestion complete. {stats}")
+
+    def _enrich(self, chunks: List[Document]) -> List[Document]:
+        """Prefixes each chunk with an LLM-written question and summary, keeping its id."""
         enrichment_prompt_template = self._get_enrichment_prompt()
         # Patch the client with instructor for Pydantic parsing
         instructor_client = instructor.from_openai(self.fast_llm)
 
-        for chunk_info in tqdm(all_chunks, desc="Enriching Chunks"):
+        enriched_docs_for_indexing = []
+        for chunk in tqdm(chunks, desc="Enriching Chunks"):
+            metadata = {**chunk.metadata, "original_content": chunk.page_content}  # Store original for final answer
             try:
                 enriched_data = instructor_client.chat.completions.create(
                     model="gemini-1.0-flash-lite", # Using the fast model
                     response_model=EnrichedChunk,
-                    messages=[{"role": "user", "content": enrichment_prompt_template.format(chunk=chunk_info['text'])}]
+                    messages=[{"role": "user", "content": enrichment_prompt_template.format(chunk=chunk.page_content)}]
                 )
-                
+
                 combined_text = (
                     f"Question: {enriched_data.hypothetical_question}\n\n"
                     f"Summary: {enriched_data.summary}\n\n"
-                    f"Content: {chunk_info['text']}"
-                )
-                
-                doc = Document(
-                    page_content=combined_text,
-                    metadata={
-                        "source": chunk_info['source_id'],
-                        "original_content": chunk_info['text'] # Store original for final answer
-                    }
+                    f"Content: {chunk.page_content}"
                 )
-                enriched_docs_for_indexing.append(doc)
+                enriched_docs_for_indexing.append(Document(id=chunk.id, page_content=combined_text, metadata=metadata))
 
             except Exception as e:
                 print(f"Warning: Could not enrich chunk. Skipping. Error: {e}")
                 # Fallback: index the original chunk without enrichment
-                doc = Document(
-                    page_content=chunk_info['text'],
-                    metadata={
-                        "source": chunk_info['source_id'],
-                        "original_content": chunk_info['text']
-                    }
-                )
-                enriched_docs_for_indexing.append(doc)
-
-        # 3. Index the enriched documents
-        if not enriched_docs_for_indexing:
-            print("No text to ingest.")
-            self.retriever = None
-            return
+                enriched_docs_for_indexing.append(Document(id=chunk.id, page_content=chunk.page_content, metadata=metadata))
 
-        vector_store = Chroma.from_documents(enriched_docs_for_indexing, self.embeddings)
-        self.retriever = vector_store.as_retriever(search_kwargs={'k': 5})
-        print("Ingestion complete.")
+        return enriched_docs_for_indexing
 
     def query(self, prompt: str, chat_history: List[Dict]) -> Dict:
         """Performs retrieval against enriched documents and generates an answer."""
-        start_time = time.perf_counter()
-
         if not self.retriever:
             return {"answer": "Please ingest a document first.", "sources": [], "latency_ms": 0}
 
-        # The retriever will find the enriched docs, but the QA chain needs the original content.
-        # We need a custom chain to handle this. For simplicity, we'll do it manually.
-        
-        # 1. Retrieve enriched docs
-        retrieved_docs = self.retriever.get_relevant_documents(prompt)
-        
-        # 2. Reconstruct the context for the generator using the *original* content
-        source_documents_for_generator = []
-        for doc in retrieved_docs:
-            original_doc = Document(
-                page_content=doc.metadata['original_content'],
-                metadata={'source': doc.metadata['source']}
-            )
-            source_documents_for_generator.append(original_doc)
-        
-        # 3. Build a temporary QA chain with the original content
-        if not source_documents_for_generator:
-             return {"answer": "Could not find relevant information.", "sources": [], "latency_ms": 0}
-
-        contextual_vectorstore = Chroma.from_documents(source_documents_for_generator, self.embeddings)
-        qa_chain = RetrievalQA.from_chain_type(
-            llm=self.llm,
-            chain_type="stuff",
-            retriever=contextual_vectorstore.as_retriever(),
-            chain_type_kwargs={"prompt": CITATION_PROMPT},
-            return_source_documents=True,
-        )
-        
-        response = qa_chain.invoke({"query": prompt})
-        answer = response.get("result", "Sorry, I couldn't find an answer.")
-        sources = response.get("source_documents", [])
+        return self.pipeline.run(prompt, chat_history).result()
 
-        end_time = time.perf_counter()
-        latency_ms = (end_time - start_time) * 1000
+    def _retrieve(self, context: QueryContext) -> List[Document]:
+        return self.retriever.invoke(context.query)
 
-        return {
-            "answer": answer,
-            "sources": sources,
-            "latency_ms": latency_ms
-        }
+    def _original_content(self, context: QueryContext) -> List[Document]:
+        """Swaps each enriched chunk back to its original text for the generator."""
+        return [
+            Document(id=doc.id, page_content=doc.metadata['original_content'], metadata={'source': doc.metadata['source']})
+            for doc in context.documents
+        ]
 
     def _get_enrichment_prompt(self) -> str:
         return """
@@ -167,4 +136,4 @@ class EnrichedContextRAG(BaseRAG):
         
         <summary>This section outlines the core benefits of solar energy, emphasizing cost savings and environmental impact.</summary>
         <hypothetical_question>What are the main benefits of using solar energy?</hypothetical_question>
-        """
\ No newline at end of file
+        """
@@ -1,27 +1,44 @@
 import os
 import sys
-import time
 from typing import List, Dict
 
 # Add the project root to the Python path to allow for absolute imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
 
 from nlp.rag.core.base import BaseRAG
+from nlp.rag.core.context_cache import ContextCache, GeminiContextCache, LocalContextCache
+from nlp.rag.core.history import HistoryWindow
+from nlp.rag.core.pipeline import CitationPipelineMixin, QueryContext
 from nlp.tools.langchain_file_processor.app.langchain_logic import get_llm
 from langchain_core.documents import Document
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+from langchain_core.messages import HumanMessage, AIMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.output_parsers import StrOutputParser
 
 from dotenv import load_dotenv
 load_dotenv()
 
-class FullContextRAG(BaseRAG):
+class FullContextRAG(CitationPipelineMixin, BaseRAG):
     """
     A RAG implementation that stuffs the entire document content into the
     system prompt. This relies on the LLM's large context window to find
     relevant information without an explicit retrieval step.
+
+    The document prefix is registered once with a context cache and only
+    referenced on later turns, and the conversation is kept in a
+    token-budgeted window, so per-turn input size stays roughly constant.
+
+    Config keys:
+    - 'context_cache': "gemini" (default) or "local", or a ContextCache instance.
+    - 'context_cache_ttl_s': TTL of the server-side cache (default 3600).
+    - 'history_max_tokens': budget for verbatim recent turns (default 2000).
+    - 'history_summary_max_tokens': budget for compacted older turns (default 500).
+    - 'memoize_stages': see `CitationPipelineMixin`; "generate" is refused,
+      as it appends to the conversation.
     """
+    # Every query is recorded in `self.chat_history`
+    stateful = True
+
     def __init__(self, config: Dict = {}):
         google_api_key = os.getenv("GOOGLE_API_KEY")
         if not google_api_key:
@@ -29,16 +46,58 @@ class FullContextRAG(BaseRAG):
         
         self.llm = get_llm(google_api_key)
         self.full_context = None
+        self.system_prompt = None
         self.source_id = "N/A"
-        self.chat_history = []
+        self.context_key = None
+        self.local_cache = LocalContextCache()
+        self.context_cache = self._build_context_cache(config, google_api_key)
+        self.active_cache = self.context_cache
+        self.chat_history = HistoryWindow(
+            max_tokens=config.get("history_max_tokens", 2000),
+            summary_max_tokens=config.get("history_summary_max_tokens", 500),
+        )
+        # The "retrieval" stage is the whole document; all the work is in generation
+        self.pipeline = self._build_pipeline({"retrieve": self._source_document, "generate": self._generate}, config)
+
+    def _build_context_cache(self, config: Dict, google_api_key: str) -> ContextCache:
+        cache = config.get("context_cache", "gemini")
+        if isinstance(cache, ContextCache):
+            return cache
+        if cache == "local":
+            return self.local_cache
+        try:
+            return GeminiContextCache(
+                google_api_key, self.llm.model, ttl_seconds=config.get("context_cache_ttl_s", 3600)
+            )
+        except Exception as e:
+            print(f"Warning: Gemini context caching unavailable, using local cache. Error: {e}")
+            return self.local_cache
+
+    def _register_context(self, system_prompt: str):
+        """Registers the prefix, falling back to the local cache if the provider refuses it."""
+        try:
+            self.active_cache = self.context_cache
+            self.context_key = self.active_cache.register(system_prompt)
+        except Exception as e:
+            # e.g. documents below the provider's minimum cacheable size
+            print(f"Warning: Could not cache context, sending it inline. Error: {e}")
+            self.active_cache = self.local_cache
+            self.context_key = self.active_cache.register(system_prompt)
 
     def ingest(self, documents: List[Dict[str, str]]):
         """
         Loads the full text of the first document provided into the system prompt.
         """
         print("Ingesting document for FullContextRAG...")
+        if self.context_key:
+            self.active_cache.release(self.context_key)
+            self.context_key = None
+        self.chat_history.clear()
+        self.pipeline.clear_cache()
+
         if not documents:
             self.full_context = None
+            self.system_prompt = None
             self.source_id = "N/A"
             print("No documents provided for ingestion.")
             return
@@ -48,22 +107,20 @@ class FullContextRAG(BaseRAG):
         self.full_context = first_doc['text']
         self.source_id = first_doc['id']
         
-        system_prompt = (
+        self.system_prompt = (
             "You are a helpful assistant. Answer questions based on the provided document content. "
             "If the answer isn't in the document, say so.\n\n"
             f"--- DOCUMENT CONTENT ---\n{self.full_context}"
         )
         
-        # Reset and initialize chat history with the new system prompt
-        self.chat_history = [SystemMessage(content=system_prompt)]
+        # Register the document prefix once; later turns only reference it
+        self._register_context(self.system_prompt)
         print(f"Ingestion complete. Context length: {len(self.full_context)} characters.")
 
     def query(self, prompt: str, chat_history: List[Dict]) -> Dict:
         """
         Queries the LLM with the full document context and conversation history.
         """
-        start_time = time.perf_counter()
-
         if not self.full_context:
             return {
                 "answer": "I have no document to search. Please upload a file first.",
@@ -71,32 +128,39 @@ class FullContextRAG(BaseRAG):
                 "latency_ms": 0
             }
 
-        # Add the current user prompt to our internal history
-        self.chat_history.append(HumanMessage(content=prompt))
-
-        # Create the prompt template for the LLM call
-        prompt_template = ChatPromptTemplate.from_messages([
-            MessagesPlaceholder(variable_name="history")
-        ])
-        
-        chain = prompt_template | self.llm | StrOutputParser()
-        
-        response_text = chain.invoke({"history": self.chat_history})
-        
-        # Add the AI's response to our internal history for future context
-        self.chat_history.append(AIMessage(content=response_text))
-
-        end_time = time.perf_counter()
-        latency_ms = (end_time - start_time) * 1000
+        return self.pipeline.run(prompt, chat_history).result()
 
+    def _source_document(self, context: QueryContext) -> List[Document]:
         # For this strategy, the "source" is the entire document
-        source_doc = Document(
+        return [Document(
             page_content=self.full_context[:500] + "...", # Truncate for display
             metadata={"source": self.source_id}
-        )
+        )]
 
-        return {
-            "answer": response_text,
-            "sources": [source_doc],
-            "latency_ms": latency_ms
-        }
\ No newline at end of file
+    def _generate(self, context: QueryContext) -> str:
+        turn = self.chat_history.messages() + [HumanMessage(content=context.prompt)]
+        if not self.active_cache.renew(self.context_key):
+            self._register_context(self.system_prompt)
+        try:
+            response_text = self._invoke(turn)
+        except Exception as e:
+            if not self.active_cache.llm_kwargs(self.context_key):
+                raise
+            # A server-side cache can still expire or be evicted early; create it again once
+            print(f"Warning: Cached context call failed, registering the document again. Error: {e}")
+            self.active_cache.release(self.context_key)
+            self._register_context(self.system_prompt)
+            response_text = self._invoke(turn)
+
+        # Only a turn that got an answer is recorded, so a failed call leaves no dangling prompt
+        self.chat_history.append(HumanMessage(content=context.prompt))
+        self.chat_history.append(AIMessage(content=response_text))
+        return response_text
+
+    def _invoke(self, messages: List) -> str:
+        prompt_template = ChatPromptTemplate.from_messages([
+            MessagesPlaceholder(variable_name="history")
+        ])
+        llm = self.llm.bind(**self.active_cache.llm_kwargs(self.context_key))
+        chain = prompt_template | llm | StrOutputParser()
+        return chain.invoke({"history": self.active_cache.prefix_messages(self.context_key) + messages})
@@ -0,0 +1,165 @@
+import os
+import sys
+from typing import List, Dict
+
+# Add the project root to the Python path to allow for absolute imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from nlp.rag.core.base import BaseRAG
+from nlp.rag.core.bm25_index import BM25_FILE, BM25_VOCAB_FILE, BM25Index, reciprocal_rank_fusion
+from nlp.rag.core.incremental import MANIFEST_FILE, IncrementalIndexer, IngestManifest, has_changes
+from nlp.rag.core.pipeline import CitationPipelineMixin, QueryContext
+from nlp.rag.core.quantized_store import CODES_FILE, QuantizedVectorStore
+from nlp.rag.core.vector_store import DOCSTORE_FILE, VECTORS_FILE, NumpyVectorStore, remove_saved
+from nlp.tools.langchain_file_processor.app.chunking import SpanChunker
+from nlp.tools.langchain_file_processor.app.langchain_logic import (
+    get_llm, get_embeddings
+)
+from langchain_core.documents import Document
+
+from dotenv import load_dotenv
+load_dotenv()
+
+class HybridBM25RAG(CitationPipelineMixin, BaseRAG):
+    """
+    A RAG implementation that combines dense vector search with a BM25
+    inverted index built at ingestion time. The two rankings are fused with
+    Reciprocal Rank Fusion, so exact-term queries (product codes, names)
+    are found even when their embeddings are not close to the query's.
+
+    Config keys:
+    - 'k': number of chunks passed to the generator (default 5).
+    - 'fetch_k': candidates taken from each ranking before fusion (default 20).
+    - 'rrf_k': RRF smoothing constant (default 60).
+    - 'persist_directory': if set, the vector store, BM25 index and ingestion
+      manifest are saved there after ingestion and loaded from it on start-up.
+    - 'quantization': 'int8' or 'binary' to keep only quantized embeddings in
+      RAM and rescore candidates against the full-precision vectors, which
+      stay memory-mapped from 'persist_directory' (default None: float32).
+      Requires 'persist_directory': without it both would be held in RAM.
+    - 'rescore_factor': candidates rescored per result when quantized (default 4).
+    - 'memoize_stages': see `CitationPipelineMixin`.
+    """
+    def __init__(self, config: Dict = {}):
+        google_api_key = os.getenv("GOOGLE_API_KEY")
+        if not google_api_key:
+            raise ValueError("GOOGLE_API_KEY not found in environment variables.")
+
+        self.llm = get_llm(google_api_key)
+        self.embeddings = get_embeddings(google_api_key)
+        self.chunker = SpanChunker(chunk_size=1000, chunk_overlap=200)
+        self.k = config.get("k", 5)
+        self.fetch_k = config.get("fetch_k", 20)
+        self.rrf_k = config.get("rrf_k", 60)
+        self.persist_directory = config.get("persist_directory")
+        self.quantization = config.get("quantization")
+        self.rescore_factor = config.get("rescore_factor", 4)
+        if self.quantization and not self.persist_directory:
+            raise ValueError(
+                "'quantization' requires a 'persist_directory' to memory-map the full-precision vectors from; "
+                "without one they would be kept in RAM next to the codes."
+            )
+        self.vector_store = self._new_store()
+        self.bm25_index = None
+        self.manifest = IngestManifest()
+        self.pipeline = self._build_pipeline({"retrieve": lambda context: self.retrieve(context.query)}, config)
+
+        if self.persist_directory and os.path.exists(os.path.join(self.persist_directory, BM25_VOCAB_FILE)):
+            self.load(self.persist_directory)
+
+    def _new_store(self) -> NumpyVectorStore:
+        if self.quantization:
+            return QuantizedVectorStore(
+                self.embeddings, quantization=self.quantization, rescore_factor=self.rescore_factor
+            )
+        return NumpyVectorStore(self.embeddings)
+
+    def _indexer(self) -> IncrementalIndexer:
+        return IncrementalIndexer(self.vector_store, self.chunker, self.manifest)
+
+    def ingest(self, documents: List[Dict[str, str]]):
+        """
+        Makes the indexes reflect exactly `documents`, embedding only chunks
+        whose text is new.
+        """
+        print("Ingesting documents for HybridBM25RAG...")
+        self._after_update(self._indexer().sync(documents))
+
+    def upsert(self, documents: List[Dict[str, str]]):
+        """Adds or replaces documents by id, embedding only changed chunks."""
+        self._after_update(self._indexer().upsert(documents))
+
+    def delete(self, doc_ids: List[str]):
+        """Removes documents and their chunks by id."""
+        self._after_update(self._indexer().delete(doc_ids))
+
+    def _after_update(self, stats: Dict[str, int]):
+        """
+        Rebuilds the BM25 index from the vector store's chunks and persists
+        both, unless the update changed nothing.
+        """
+        if not len(self.vector_store):
+            self.pipeline.clear_cache()
+            # Otherwise the deleted documents would be loaded again on start-up
+            if self.persist_directory:
+                remove_saved(
+                    self.persist_directory,
+                    (VECTORS_FILE, DOCSTORE_FILE, CODES_FILE, BM25_FILE, BM25_VOCAB_FILE, MANIFEST_FILE),
+                )
+            print("No text to ingest.")
+            self.bm25_index = None
+            return
+        if not has_changes(stats) and self.bm25_index is not None:
+            print(f"Ingestion complete, nothing changed. {stats}")
+            return
+        self.pipeline.clear_cache()
+
+        # BM25 is rebuilt from the stored texts: no model calls, linear in the corpus
+        self.bm25_index = BM25Index()
+        self.bm25_index.build(self.vector_store.ids, self.vector_store.texts)
+
+        if self.persist_directory:
+            self.save(self.persist_directory)
+            if self.quantization:
+                # Reload so the full-precision vectors are memory-mapped rather than held in RAM
+                self.load(self.persist_directory)
+        print(f"Ingestion complete. {stats}")
+
+    def save(self, path: str):
+        """Serialises the vector store, BM25 index and ingestion manifest side by side."""
+        self.vector_store.save(path)
+        self.bm25_index.save(path)
+        self.manifest.save(path)
+
+    def load(self, path: str):
+        """Loads a vector store, BM25 index and manifest written by `save`."""
+        if self.quantization:
+            # The configured mode wins; a store saved with another one is requantized
+            self.vector_store = QuantizedVectorStore.load(
+                path, self.embeddings, quantization=self.quantization, rescore_factor=self.rescore_factor
+            )
+        else:
+            self.vector_store = NumpyVectorStore.load(path, self.embeddings)
+        self.bm25_index = BM25Index.load(path)
+        self.manifest = IngestManifest.load(path)
+
+    def retrieve(self, prompt: str) -> List[Document]:
+        """Returns the top-k chunks after fusing dense and lexical rankings."""
+        dense = self.vector_store.similarity_search(prompt, k=self.fetch_k)
+        lexical = self.bm25_index.search(prompt, k=self.fetch_k)
+        fused = reciprocal_rank_fusion(
+            [[doc.id for doc in dense], [doc_id for doc_id, _ in lexical]], k=self.rrf_k
+        )
+        top_ids = [doc_id for doc_id, _ in fused[:self.k]]
+        return self.vector_store.get_by_ids(top_ids)
+
+    def query(self, prompt: str, chat_history: List[Dict]) -> Dict:
+        """Performs hybrid retrieval and generates a cited answer."""
+        if not self.vector_store:
+            return {
+                "answer": "I have no documents to search. Please upload a file first.",
+                "sources": [],
+                "latency_ms": 0
+            }
+
+        return self.pipeline.run(prompt, chat_history).result()
@@ -1,26 +1,31 @@
 import os
 import sys
-import time
 from typing import List, Dict
 
 # Add the project root to the Python path to allow for absolute imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
 
 from nlp.rag.core.base import BaseRAG
-from nlp.tools.langchain_file_processor.app.langchain_logic import get_llm, get_embeddings, CITATION_PROMPT
+from nlp.rag.core.incremental import IncrementalIndexer
+from nlp.rag.core.pipeline import CitationPipelineMixin, QueryContext
+from nlp.rag.core.vector_store import NumpyVectorStore
+from nlp.tools.langchain_file_processor.app.chunking import SpanChunker
+from nlp.tools.langchain_file_processor.app.langchain_logic import (
+    get_llm, get_embeddings
+)
 from langchain_core.documents import Document
-from langchain.chains import RetrievalQA
-from langchain_chroma import Chroma
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 
 from dotenv import load_dotenv
 load_dotenv()
 
-class MMRSummaryRAG(BaseRAG):
+class MMRSummaryRAG(CitationPipelineMixin, BaseRAG):
     """
     A RAG implementation that uses Maximal Marginal Relevance (MMR) search.
     This is well-suited for summarization tasks where a diverse set of
     relevant chunks is desirable.
+
+    Config keys:
+    - 'memoize_stages': see `CitationPipelineMixin`.
     """
     def __init__(self, config: Dict = {}):
         google_api_key = os.getenv("GOOGLE_API_KEY")
@@ -29,38 +34,47 @@ class MMRSummaryRAG(BaseRAG):
         
         self.llm = get_llm(google_api_key)
         self.embeddings = get_embeddings(google_api_key)
-        self.text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+        self.chunker = SpanChunker(chunk_size=1000, chunk_overlap=200)
+        self.vector_store = NumpyVectorStore(self.embeddings)
+        # Chunk ids are content fingerprints, so each chunk inherits its parent
+        # document's ID in its metadata and keeps its embedding across edits
+        self.indexer = IncrementalIndexer(self.vector_store, self.chunker)
         self.retriever = None
+        self.pipeline = self._build_pipeline({"retrieve": self._retrieve}, config)
 
     def ingest(self, documents: List[Dict[str, str]]):
-        """Processes and indexes documents using an in-memory vector store."""
+        """
+        Makes the index reflect exactly `documents`. Only chunks whose text
+        is new are embedded, through the staged ingestion pipeline, so
+        re-ingesting a mostly unchanged corpus is cheap.
+        """
         print("Ingesting documents for MMRSummaryRAG...")
-        docs_to_chunk = []
-        for doc in documents:
-            # Each chunk inherits the ID of its parent document
-            chunks = self.text_splitter.split_text(doc['text'])
-            for chunk in chunks:
-                docs_to_chunk.append(Document(page_content=chunk, metadata={"source": doc['id']}))
-        
-        if not docs_to_chunk:
+        self._after_update(self.indexer.sync(documents))
+
+    def upsert(self, documents: List[Dict[str, str]]):
+        """Adds or replaces documents by id, embedding only changed chunks."""
+        self._after_update(self.indexer.upsert(documents))
+
+    def delete(self, doc_ids: List[str]):
+        """Removes documents and their chunks by id."""
+        self._after_update(self.indexer.delete(doc_ids))
+
+    def _after_update(self, stats: Dict[str, int]):
+        self.pipeline.clear_cache()
+        if not len(self.vector_store):
             print("No text to ingest.")
             self.retriever = None
             return
 
-        # Create a true in-memory vector store
-        vector_store = Chroma.from_documents(docs_to_chunk, self.embeddings)
-        
         # Use Maximal Marginal Relevance search
-        self.retriever = vector_store.as_retriever(
+        self.retriever = self.vector_store.as_retriever(
             search_type="mmr",
             search_kwargs={'k': 5, 'fetch_k': 20}
         )
-        print("Ingestion complete.")
+        print(f"Ingestion complete. {stats}")
 
     def query(self, prompt: str, chat_history: List[Dict]) -> Dict:
         """Performs the full RAG pipeline using the MMR strategy."""
-        start_time = time.perf_counter()
-
         if not self.retriever:
             return {
                 "answer": "I have no documents to search. Please upload a file first.",
@@ -68,23 +82,7 @@ class MMRSummaryRAG(BaseRAG):
                 "latency_ms": 0
             }
 
-        qa_chain = RetrievalQA.from_chain_type(
-            llm=self.llm,
-            chain_type="stuff",
-            retriever=self.retriever,
-            chain_type_kwargs={"prompt": CITATION_PROMPT},
-            return_source_documents=True,
-        )
-        
-        response = qa_chain.invoke({"query": prompt})
-        answer = response.get("result", "Sorry, I couldn't find an answer.")
-        sources = response.get("source_documents", [])
-
-        end_time = time.perf_counter()
-        latency_ms = (end_time - start_time) * 1000
+        return self.pipeline.run(prompt, chat_history).result()
 
-        return {
-            "answer": answer,
-            "sources": sources,
-            "latency_ms": latency_ms
-        }
+    def _retrieve(self, context: QueryContext) -> List[Document]:
+        return self.retriever.invoke(context.query)
@@ -0,0 +1,97 @@
+import http.client
+import json
+import socket
+import time
+from typing import Dict, List, Optional
+from urllib.parse import quote, urlparse
+
+from langchain_core.documents import Document
+
+from nlp.rag.core.base import BaseRAG
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class RemoteRAG(BaseRAG):
+    """
+    A BaseRAG that forwards `ingest` and `query` to the RAG service
+    (`nlp/rag/service/server.py`), so every UI process shares the service's
+    indexes instead of building its own. Tenants that ingest the same
+    corpus share one index; a tenant idle past the service's TTL must
+    ingest again before querying.
+
+    Config keys:
+    - 'service_url': 'http://host:port' or 'unix:///path/to/socket' (required).
+    - 'tenant': isolates this client's indexes from other tenants (required).
+    - 'strategy': class name of the strategy to run, e.g. 'HybridBM25RAG' (required).
+    - 'collection': index name within the tenant (default 'default').
+    - 'strategy_config': config passed to the strategy when the index is created.
+    - 'timeout_s': per-request timeout (default 600, ingestion can be slow).
+    """
+    def __init__(self, config: Dict = {}):
+        for key in ("service_url", "tenant", "strategy"):
+            if not config.get(key):
+                raise ValueError(f"RemoteRAG requires '{key}' in its config.")
+        self.service_url = config["service_url"]
+        self.tenant = config["tenant"]
+        self.strategy = config["strategy"]
+        self.collection = config.get("collection", "default")
+        self.strategy_config = config.get("strategy_config", {})
+        self.timeout_s = config.get("timeout_s", 600)
+
+    def _connection(self) -> http.client.HTTPConnection:
+        url = urlparse(self.service_url)
+        if url.scheme == "unix":
+            return _UnixHTTPConnection(url.path, self.timeout_s)
+        return http.client.HTTPConnection(url.hostname, url.port or 80, timeout=self.timeout_s)
+
+    def _request(self, method: str, action: Optional[str] = None, body: Optional[Dict] = None) -> Dict:
+        path = f"/v1/tenants/{quote(self.tenant, safe='')}/collections/{quote(self.collection, safe='')}"
+        if action:
+            path += f"/{action}"
+        connection = self._connection()
+        try:
+            connection.request(
+                method, path, body=json.dumps(body) if body is not None else None,
+                headers={"Content-Type": "application/json"},
+            )
+            response = connection.getresponse()
+            payload = json.loads(response.read() or b"{}")
+        finally:
+            connection.close()
+        if response.status >= 400:
+            raise RuntimeError(f"RAG service error {response.status}: {payload.get('error', payload)}")
+        return payload
+
+    def ingest(self, documents: List[Dict[str, str]]):
+        result = self._request("POST", "ingest", {
+            "strategy": self.strategy, "documents": documents, "config": self.strategy_config,
+        })
+        print(f"RAG service ingestion: {result['status']} ({result['documents']} documents).")
+
+    def query(self, prompt: str, chat_history: List[Dict]) -> Dict:
+        start_time = time.perf_counter()
+        result = self._request("POST", "query", {
+            "strategy": self.strategy, "prompt": prompt, "chat_history": chat_history,
+        })
+        result["sources"] = [
+            Document(id=s.get("id"), page_content=s["page_content"], metadata=s.get("metadata", {}))
+            for s in result.get("sources", [])
+        ]
+        # Report what the caller waited for, including the round trip
+        result["service_latency_ms"] = result.get("latency_ms", 0)
+        result["latency_ms"] = (time.perf_counter() - start_time) * 1000
+        return result
+
+    def drop(self):
+        """Detaches this tenant's collection; the service frees indexes no tenant uses."""
+        self._request("DELETE")
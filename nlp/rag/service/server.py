@@ -0,0 +1,316 @@
+"""
+A local RAG service that builds each corpus' index once and shares it
+between every tenant (browser session, UI process) that uploads the same
+corpus, and serves ingest/query requests to any number of UI processes.
+
+    python nlp/rag/service/server.py --port 8765
+    python nlp/rag/service/server.py --socket /tmp/rag.sock --index-ttl-s 1800 --max-indexes 16
+
+Endpoints (JSON bodies):
+- GET    /v1/strategies
+- POST   /v1/tenants/<tenant>/collections/<collection>/ingest
+         {"strategy": "HybridBM25RAG", "documents": [{"id", "text"}], "config": {...}}
+- POST   /v1/tenants/<tenant>/collections/<collection>/query
+         {"strategy": "HybridBM25RAG", "prompt": "...", "chat_history": [...]}
+- DELETE /v1/tenants/<tenant>/collections/<collection>
+- GET    /healthz
+
+Indexes are keyed by (strategy, strategy config, corpus fingerprint), so a
+corpus is indexed once however many tenants upload it. The tenant is an
+access check: a tenant can only query an index it attached to by
+ingesting that exact corpus, so it never sees documents it did not upload.
+Indexes unused for `--index-ttl-s` are evicted, as are the least recently
+used ones beyond `--max-indexes`; detached tenants must re-ingest.
+
+Requests run concurrently: queries on the same index share a read lock,
+ingestion takes it exclusively.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Add the project root to the Python path to allow for absolute imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from flask import Flask, jsonify, request
+
+from nlp.rag.core.base import BaseRAG
+from nlp.rag.core.registry import StrategyInfo, discover_strategies, load_strategy
+
+IMPLEMENTATIONS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'implementations'))
+
+# (strategy, config digest, corpus fingerprint): what an index was built from
+IndexKey = Tuple[str, str, str]
+# (tenant, collection, strategy): who is attached to an index
+Attachment = Tuple[str, str, str]
+
+
+class UnknownStrategyError(KeyError):
+    pass
+
+
+class ReadWriteLock:
+    """Many concurrent readers or one writer; writers are not starved by new readers."""
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    def acquire_read(self):
+        with self._condition:
+            while self._writer or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._condition:
+            self._readers -= 1
+            if self._readers == 0:
+                self._condition.notify_all()
+
+    def acquire_write(self):
+        with self._condition:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._condition.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+
+    def release_write(self):
+        with self._condition:
+            self._writer = False
+            self._condition.notify_all()
+
+
+class SharedIndex:
+    """
+    One strategy instance, the tenants attached to it (with the time each
+    last used it) and the bookkeeping needed to share it safely.
+    """
+    def __init__(self, rag: BaseRAG):
+        self.rag = rag
+        self.lock = ReadWriteLock()
+        self.corpus_fingerprint: Optional[str] = None
+        self.tenants: Dict[Attachment, float] = {}
+        self.last_used = 0.0
+
+
+def corpus_fingerprint(documents: List[Dict[str, str]]) -> str:
+    """Order-independent hash of a corpus' ids and texts."""
+    digests = sorted(
+        hashlib.sha256(f"{doc['id']}\0{doc['text']}".encode("utf-8")).hexdigest() for doc in documents
+    )
+    return hashlib.sha256("".join(digests).encode("ascii")).hexdigest()
+
+
+def config_digest(config: Dict) -> str:
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class IndexRegistry:
+    """
+    Owns every shared index and the tenants attached to them.
+
+    - `attach` finds or creates the index for a corpus and records the
+      tenant's access to it. A tenant re-ingesting a changed corpus into an
+      index no one else uses updates that index in place (incrementally,
+      for strategies that support it) rather than building a new one.
+    - `lookup` only returns an index the tenant is attached to.
+    - Attachments unused for `ttl_s` are dropped, and an index is evicted
+      when its last attachment goes or when it is the least recently used
+      one beyond `max_indexes`.
+    """
+    def __init__(
+        self,
+        strategies: Dict[str, StrategyInfo],
+        ttl_s: float = 3600,
+        max_indexes: int = 32,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.strategies = strategies
+        self.ttl_s = ttl_s
+        self.max_indexes = max_indexes
+        self.clock = clock
+        self._indexes: "OrderedDict[IndexKey, SharedIndex]" = OrderedDict()
+        self._attachments: Dict[Attachment, IndexKey] = {}
+        self._lock = threading.Lock()
+
+    def strategy(self, name: str) -> StrategyInfo:
+        if name not in self.strategies:
+            raise UnknownStrategyError(f"Unknown strategy '{name}'.")
+        return self.strategies[name]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._indexes)
+
+    def attach(self, attachment: Attachment, config: Dict, fingerprint: str) -> SharedIndex:
+        """Returns the index for this corpus, attached to `attachment`; it is empty if newly created."""
+        key = (attachment[2], config_digest(config), fingerprint)
+        with self._lock:
+            now = self.clock()
+            self._evict_expired(now)
+            previous_key = self._attachments.get(attachment)
+            index = self._indexes.get(key)
+            if index is None:
+                previous = self._indexes.get(previous_key) if previous_key else None
+                if previous is not None and previous_key[:2] == key[:2] and set(previous.tenants) == {attachment}:
+                    index = self._indexes.pop(previous_key)
+                else:
+                    rag_class = load_strategy(self.strategy(attachment[2]))
+                    index = SharedIndex(rag_class(config))
+                self._indexes[key] = index
+            if previous_key is not None and previous_key != key:
+                self._detach(attachment, previous_key)
+            self._attachments[attachment] = key
+            self._touch(key, index, attachment, now)
+            while len(self._indexes) > self.max_indexes:
+                self._evict(next(iter(self._indexes)))
+            return index
+
+    def lookup(self, attachment: Attachment) -> Optional[SharedIndex]:
+        with self._lock:
+            now = self.clock()
+            self._evict_expired(now)
+            key = self._attachments.get(attachment)
+            if key is None:
+                return None
+            index = self._indexes[key]
+            self._touch(key, index, attachment, now)
+            return index
+
+    def drop(self, tenant: str, collection: str) -> int:
+        """Detaches the tenant's collection from its indexes; returns how many it was attached to."""
+        with self._lock:
+            attachments = [a for a in self._attachments if a[:2] == (tenant, collection)]
+            for attachment in attachments:
+                self._detach(attachment, self._attachments[attachment])
+            return len(attachments)
+
+    def _touch(self, key: IndexKey, index: SharedIndex, attachment: Attachment, now: float):
+        index.tenants[attachment] = now
+        index.last_used = now
+        self._indexes.move_to_end(key)
+
+    def _detach(self, attachment: Attachment, key: IndexKey):
+        self._attachments.pop(attachment, None)
+        index = self._indexes.get(key)
+        if index is not None:
+            index.tenants.pop(attachment, None)
+            if not index.tenants:
+                del self._indexes[key]
+
+    def _evict(self, key: IndexKey):
+        for attachment in self._indexes.pop(key).tenants:
+            self._attachments.pop(attachment, None)
+
+    def _evict_expired(self, now: float):
+        for key, index in list(self._indexes.items()):
+            for attachment, last_used in list(index.tenants.items()):
+                if now - last_used > self.ttl_s:
+                    self._detach(attachment, key)
+
+
+def serialize_sources(sources) -> List[Dict]:
+    return [
+        {"id": getattr(doc, "id", None), "page_content": doc.page_content, "metadata": doc.metadata}
+        for doc in sources
+    ]
+
+
+def create_app(registry: IndexRegistry) -> Flask:
+    app = Flask(__name__)
+
+    @app.errorhandler(UnknownStrategyError)
+    def unknown(error):
+        return jsonify({"error": str(error.args[0])}), 404
+
+    @app.route("/healthz", methods=["GET"])
+    def healthz():
+        return jsonify({"status": "ok"})
+
+    @app.route("/v1/strategies", methods=["GET"])
+    def strategies():
+        return jsonify([info._asdict() for info in registry.strategies.values()])
+
+    @app.route("/v1/tenants/<tenant>/collections/<collection>/ingest", methods=["POST"])
+    def ingest(tenant: str, collection: str):
+        data = request.get_json(silent=True) or {}
+        if "strategy" not in data or not isinstance(data.get("documents"), list):
+            return jsonify({"error": "'strategy' and a 'documents' list are required"}), 400
+        registry.strategy(data["strategy"])
+        fingerprint = corpus_fingerprint(data["documents"])
+        index = registry.attach((tenant, collection, data["strategy"]), data.get("config", {}), fingerprint)
+
+        index.lock.acquire_write()
+        try:
+            if fingerprint == index.corpus_fingerprint:
+                return jsonify({"status": "unchanged", "documents": len(data["documents"])})
+            index.rag.ingest(data["documents"])
+            index.corpus_fingerprint = fingerprint
+        finally:
+            index.lock.release_write()
+        return jsonify({"status": "ingested", "documents": len(data["documents"])})
+
+    @app.route("/v1/tenants/<tenant>/collections/<collection>/query", methods=["POST"])
+    def query(tenant: str, collection: str):
+        data = request.get_json(silent=True) or {}
+        if "strategy" not in data or "prompt" not in data:
+            return jsonify({"error": "'strategy' and 'prompt' are required"}), 400
+        registry.strategy(data["strategy"])
+        index = registry.lookup((tenant, collection, data["strategy"]))
+        if index is None:
+            return jsonify({
+                "answer": "I have no documents to search. Please upload a file first.",
+                "sources": [],
+                "latency_ms": 0,
+            })
+
+        index.lock.acquire_read()
+        try:
+            result = index.rag.query(data["prompt"], data.get("chat_history", []))
+        finally:
+            index.lock.release_read()
+        return jsonify({**result, "sources": serialize_sources(result.get("sources", []))})
+
+    @app.route("/v1/tenants/<tenant>/collections/<collection>", methods=["DELETE"])
+    def drop(tenant: str, collection: str):
+        return jsonify({"dropped": registry.drop(tenant, collection)})
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--socket", help="Listen on this Unix socket path instead of TCP.")
+    parser.add_argument("--index-ttl-s", type=float, default=3600, help="Detach tenants idle for this long.")
+    parser.add_argument("--max-indexes", type=int, default=32, help="Evict least recently used indexes beyond this.")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    from werkzeug.serving import run_simple
+
+    strategies = discover_strategies(IMPLEMENTATIONS_DIR, "nlp.rag.implementations")
+    app = create_app(IndexRegistry(
+        {info.class_name: info for info in strategies.values()}, ttl_s=args.index_ttl_s, max_indexes=args.max_indexes,
+    ))
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        run_simple(f"unix://{args.socket}", 0, app, threaded=True)
+    else:
+        run_simple(args.host, args.port, app, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
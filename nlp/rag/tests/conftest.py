@@ -0,0 +1,37 @@
+import os
+import sys
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import FakeListChatModel
+
+from nlp.rag.implementations import ann_rag, hybrid_bm25_rag
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    calls: list = []
+
+    def embed_documents(self, texts):
+        self.calls.append(len(texts))
+        return super().embed_documents(texts)
+
+
+def corpus(n=3, words=300):
+    return [
+        {"id": f"doc{d}", "text": " ".join(f"doc{d}-word{w}" for w in range(words))}
+        for d in range(n)
+    ]
+
+
+@pytest.fixture
+def fake_models(monkeypatch):
+    """Replaces the Gemini models of the persisted implementations with deterministic fakes."""
+    monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+    embeddings = CountingEmbeddings(size=16, calls=[])
+    for module in (ann_rag, hybrid_bm25_rag):
+        monkeypatch.setattr(module, "get_embeddings", lambda api_key: embeddings)
+        monkeypatch.setattr(module, "get_llm", lambda api_key: FakeListChatModel(responses=["answer [1]"]))
+    return embeddings
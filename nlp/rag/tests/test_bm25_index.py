@@ -0,0 +1,75 @@
+import os
+import sys
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+import math
+from collections import Counter
+
+import pytest
+
+from nlp.rag.core.bm25_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+TEXTS = [
+    "The X-200 pump replaces the X-100 pump.",
+    "Pumps move water. Water pumps are common.",
+    "Release v1.2 fixes the pump controller.",
+    "Nothing relevant here at all.",
+]
+IDS = ["a", "b", "c", "d"]
+
+
+def reference_score(query, text, texts, k1=1.5, b=0.75):
+    """Okapi BM25 computed directly from the formula, one document at a time."""
+    docs = [tokenize(t) for t in texts]
+    avg_length = sum(map(len, docs)) / len(docs)
+    tf = Counter(tokenize(text))
+    length = len(tokenize(text))
+    score = 0.0
+    for term in set(tokenize(query)):
+        df = sum(term in doc for doc in docs)
+        if not tf[term]:
+            continue
+        idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+        score += idf * tf[term] * (k1 + 1) / (tf[term] + k1 * (1 - b + b * length / avg_length))
+    return score
+
+
+@pytest.fixture
+def index():
+    index = BM25Index()
+    index.build(IDS, TEXTS)
+    return index
+
+
+def test_tokenize_keeps_codes_together():
+    assert tokenize("The X-200 runs v1.2, not X.") == ["the", "x-200", "runs", "v1.2", "not", "x"]
+
+
+def test_scores_match_the_bm25_formula(index):
+    for query in ["pump water", "x-200 pump", "v1.2 controller"]:
+        results = dict(index.search(query, k=len(IDS)))
+        for doc_id, text in zip(IDS, TEXTS):
+            expected = reference_score(query, text, TEXTS)
+            assert results.get(doc_id, 0.0) == pytest.approx(expected, rel=1e-5)
+
+
+def test_exact_codes_rank_first(index):
+    assert index.search("x-200", k=2) == [("a", pytest.approx(reference_score("x-200", TEXTS[0], TEXTS)))]
+    assert index.search("V1.2")[0][0] == "c"
+    assert index.search("unknown words") == []
+    assert index.search("pump", k=0) == []
+
+
+def test_round_trip(tmp_path, index):
+    index.save(str(tmp_path))
+    loaded = BM25Index.load(str(tmp_path))
+    assert len(loaded) == len(IDS)
+    assert loaded.search("water pumps", k=3) == index.search("water pumps", k=3)
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d"]], k=60)
+    assert [doc_id for doc_id, _ in fused] == ["b", "a", "d", "c"]
+    assert fused[0][1] == pytest.approx(1 / 62 + 1 / 61)
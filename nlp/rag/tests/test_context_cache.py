@@ -0,0 +1,150 @@
+import os
+import sys
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from types import SimpleNamespace
+
+import pytest
+
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from nlp.rag.core.context_cache import GeminiContextCache, LocalContextCache
+from nlp.rag.implementations import full_context_rag
+
+
+class RecordingChatModel(FakeListChatModel):
+    seen: list = []
+    dead_caches: set = set()
+
+    def _call(self, messages, stop=None, run_manager=None, **kwargs):
+        self.seen.append((messages, kwargs))
+        if kwargs.get("cached_content") in self.dead_caches:
+            raise RuntimeError(f"{kwargs.get('cached_content')} not found")
+        return super()._call(messages, stop, run_manager, **kwargs)
+
+
+class FakeCaches:
+    def __init__(self):
+        self.created = []
+        self.deleted = []
+        self.updated = []
+        self.expired = set()
+
+    def create(self, model, config):
+        self.created.append(config)
+        return SimpleNamespace(name=f"cachedContents/{len(self.created)}")
+
+    def update(self, name, config):
+        if name in self.expired:
+            raise RuntimeError(f"{name} not found")
+        self.updated.append((name, config.ttl))
+
+    def delete(self, name):
+        self.deleted.append(name)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def gemini_cache(monkeypatch, caches, **kwargs):
+    from google import genai
+
+    monkeypatch.setattr(genai, "Client", lambda api_key: SimpleNamespace(caches=caches))
+    return GeminiContextCache("key", "models/gemini", **kwargs)
+
+
+def test_local_cache_registers_each_prefix_once():
+    cache = LocalContextCache()
+    key = cache.register("document")
+    assert cache.register("document") == key and cache.registrations == 1
+    assert cache.prefix_messages(key) == [SystemMessage(content="document")]
+    assert cache.llm_kwargs(key) == {}
+    cache.release(key)
+    assert cache.register("document") == key and cache.registrations == 2
+
+
+def test_gemini_cache_references_uploaded_prefix(monkeypatch):
+    caches = FakeCaches()
+    cache = gemini_cache(monkeypatch, caches, ttl_seconds=60)
+    name = cache.register("document")
+    assert cache.register("document") == name and len(caches.created) == 1
+    assert caches.created[0].system_instruction == "document" and caches.created[0].ttl == "60s"
+    assert cache.prefix_messages(name) == []
+    assert cache.llm_kwargs(name) == {"cached_content": name}
+    cache.release(name)
+    assert caches.deleted == [name]
+    assert cache.register("document") != name
+
+
+def test_full_context_rag_sends_prefix_once_per_document(monkeypatch):
+    monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+    llm = RecordingChatModel(responses=["first", "second"], seen=[])
+    monkeypatch.setattr(full_context_rag, "get_llm", lambda api_key: llm)
+    cache = LocalContextCache()
+    rag = full_context_rag.FullContextRAG({"context_cache": cache})
+    rag.ingest([{"id": "book.txt", "text": "the whole book"}])
+
+    assert rag.query("q1", [])["answer"] == "first"
+    assert rag.query("q2", [])["answer"] == "second"
+    assert cache.registrations == 1
+    messages, _ = llm.seen[-1]
+    assert isinstance(messages[0], SystemMessage) and "the whole book" in messages[0].content
+    assert [type(m) for m in messages[1:]] == [HumanMessage, AIMessage, HumanMessage]
+
+
+def test_gemini_cache_is_renewed_before_it_expires(monkeypatch):
+    caches, clock = FakeCaches(), Clock()
+    cache = gemini_cache(monkeypatch, caches, ttl_seconds=60, clock=clock)
+    name = cache.register("document")
+    clock.now = 20
+    assert cache.renew(name) and caches.updated == []
+    clock.now = 40
+    assert cache.renew(name) and caches.updated == [(name, "60s")]
+    clock.now = 65
+    assert cache.renew(name) and len(caches.updated) == 1
+
+    # Expired server-side: the caller has to register it again
+    caches.expired.add(name)
+    clock.now = 95
+    assert not cache.renew(name)
+    assert cache.register("document") != name
+
+
+def fake_full_context_rag(monkeypatch, llm, cache):
+    monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+    monkeypatch.setattr(full_context_rag, "get_llm", lambda api_key: llm)
+    rag = full_context_rag.FullContextRAG({"context_cache": cache})
+    rag.ingest([{"id": "book.txt", "text": "the whole book"}])
+    return rag
+
+
+def test_expired_gemini_cache_is_created_again(monkeypatch):
+    caches = FakeCaches()
+    llm = RecordingChatModel(responses=["first", "second"], seen=[], dead_caches=set())
+    rag = fake_full_context_rag(monkeypatch, llm, gemini_cache(monkeypatch, caches))
+    first = rag.context_key
+    assert rag.query("q1", [])["answer"] == "first"
+
+    # Evicted before its TTL: the failed call is retried against a new cache
+    llm.dead_caches.add(first)
+    assert rag.query("q2", [])["answer"] == "second"
+    assert len(caches.created) == 2 and caches.deleted == [first]
+    assert llm.seen[-1][1]["cached_content"] == "cachedContents/2"
+    assert [m.content for m in rag.chat_history.recent] == ["q1", "first", "q2", "second"]
+
+
+def test_failed_call_leaves_no_unanswered_turn(monkeypatch):
+    llm = RecordingChatModel(responses=["answer"], seen=[], dead_caches=set())
+    rag = fake_full_context_rag(monkeypatch, llm, LocalContextCache())
+    llm.dead_caches.add(None)  # the local cache binds no cached_content
+    with pytest.raises(RuntimeError):
+        rag.query("q1", [])
+    assert len(rag.chat_history) == 0
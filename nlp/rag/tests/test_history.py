@@ -0,0 +1,59 @@
+import os
+import sys
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from nlp.rag.core.history import HistoryWindow, estimate_tokens
+
+
+def conversation(window, turns, words=40):
+    for turn in range(turns):
+        window.append(HumanMessage(content=f"question {turn} " + "q " * words))
+        window.append(AIMessage(content=f"answer {turn} " + "a " * words))
+
+
+def test_short_conversation_is_sent_verbatim():
+    window = HistoryWindow(max_tokens=1000)
+    conversation(window, 2)
+    messages = window.messages()
+    assert len(messages) == 4 and messages[0].content.startswith("question 0")
+
+
+def test_window_stays_within_budget_and_starts_on_a_human_turn():
+    window = HistoryWindow(max_tokens=60, summary_max_tokens=1000)
+    for _ in range(8):
+        conversation(window, 1)
+        window.append(HumanMessage(content="follow-up " + "f " * 30))
+        messages = window.messages()
+        assert isinstance(window.recent[0], HumanMessage)
+        assert [type(m) for m in messages[1::2]] == [AIMessage] * (len(messages) // 2)
+        assert sum(estimate_tokens(m.content) for m in window.recent) <= 60
+        window.append(AIMessage(content="ok"))
+
+
+def test_compaction_truncates_instead_of_summarizing():
+    window = HistoryWindow(max_tokens=50, compact_chars=20)
+    conversation(window, 3)
+    first = window.messages()[0]
+    assert first.content.startswith("Summary of the earlier conversation:\nHuman: question 0 q q q q q...")
+    assert "AI: answer 0 a a a a a a..." in first.content
+    # The summary rides on the first kept human turn rather than being a turn of its own
+    assert first.content.endswith(window.recent[0].content)
+
+
+def test_summary_is_capped():
+    window = HistoryWindow(max_tokens=50, summary_max_tokens=40)
+    conversation(window, 20)
+    assert len(window.summary_lines) < 20
+    assert window.summary_lines[-1].startswith("AI: answer")
+    assert sum(estimate_tokens(line) for line in window.summary_lines) <= 40
+
+
+def test_clear():
+    window = HistoryWindow(max_tokens=30)
+    conversation(window, 3)
+    window.clear()
+    assert window.messages() == [] and len(window) == 0
@@ -0,0 +1,65 @@
+import os
+import sys
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+import numpy as np
+import pytest
+
+from conftest import corpus
+from nlp.rag.core.quantized_store import QuantizedVectorStore
+from nlp.rag.implementations.hybrid_bm25_rag import HybridBM25RAG
+
+
+def test_quantization_requires_persist_directory(fake_models):
+    with pytest.raises(ValueError, match="persist_directory"):
+        HybridBM25RAG({"quantization": "int8"})
+
+
+def test_configured_quantization_wins_over_saved_one(tmp_path, fake_models):
+    HybridBM25RAG({"persist_directory": str(tmp_path), "quantization": "binary"}).ingest(corpus())
+    rag = HybridBM25RAG({"persist_directory": str(tmp_path), "quantization": "int8"})
+    assert isinstance(rag.vector_store, QuantizedVectorStore)
+    assert rag.vector_store.quantization == "int8" and rag.vector_store.codes.dtype == np.int8
+    assert rag.query("doc1-word5", [])["answer"] == "answer [1]"
+
+
+DOCS = [
+    {"id": "manual.txt", "text": "To reset the ZX-9 controller, hold the power button for ten seconds."},
+    {"id": "faq.txt", "text": "Most questions about shipping and returns are answered here."},
+    {"id": "notes.txt", "text": "Meeting notes: the team discussed the roadmap for next year."},
+]
+
+
+def test_exact_terms_are_found_through_bm25(fake_models):
+    rag = HybridBM25RAG({"k": 1})
+    rag.ingest(DOCS)
+    assert len(rag.bm25_index) == len(rag.vector_store) == 3
+    assert rag.retrieve("zx-9")[0].metadata["source"] == "manual.txt"
+
+
+def test_upsert_and_delete_keep_bm25_in_sync(fake_models):
+    rag = HybridBM25RAG({"k": 1})
+    rag.ingest(DOCS)
+    rag.upsert([{"id": "faq.txt", "text": "Returns of the QR-7 adapter are free."}])
+    assert rag.retrieve("QR-7")[0].metadata["source"] == "faq.txt"
+    assert rag.bm25_index.search("shipping") == []
+
+    rag.delete(["manual.txt"])
+    assert set(rag.bm25_index.ids) == set(rag.vector_store.ids)
+    assert rag.bm25_index.search("zx-9") == []
+
+    rag.ingest([])
+    assert rag.bm25_index is None
+    assert "upload a file" in rag.query("zx-9", [])["answer"]
+
+
+def test_restart_loads_bm25_index(tmp_path, fake_models):
+    HybridBM25RAG({"persist_directory": str(tmp_path), "k": 1}).ingest(DOCS)
+    restarted = HybridBM25RAG({"persist_directory": str(tmp_path), "k": 1})
+    embedded = sum(fake_models.calls)
+    assert restarted.retrieve("ZX-9")[0].metadata["source"] == "manual.txt"
+    result = restarted.query("How do I reset the ZX-9?", [])
+    assert result["answer"] == "answer [1]" and result["sources"][0].metadata["source"] == "manual.txt"
+    assert sum(fake_models.calls) == embedded
@@ -0,0 +1,78 @@
+import os
+import sys
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from conftest import CountingEmbeddings, corpus
+from nlp.rag.core.incremental import IncrementalIndexer, has_changes
+from nlp.rag.core.vector_store import VECTORS_FILE, NumpyVectorStore
+from nlp.rag.implementations import ann_rag, hybrid_bm25_rag
+from nlp.tools.langchain_file_processor.app.chunking import SpanChunker
+
+
+def test_sync_only_embeds_changed_chunks():
+    embeddings = CountingEmbeddings(size=16, calls=[])
+    indexer = IncrementalIndexer(NumpyVectorStore(embeddings), SpanChunker(chunk_size=400, chunk_overlap=50))
+    docs = corpus()
+    first = indexer.sync(docs)
+    assert has_changes(first)
+    embedded = sum(embeddings.calls)
+
+    assert not has_changes(indexer.sync(docs))
+    assert sum(embeddings.calls) == embedded
+
+    docs[1]["text"] += " an extra sentence at the end"
+    stats = indexer.sync(docs[:2])
+    assert stats["documents_updated"] == 1 and stats["documents_removed"] == 1
+    assert sum(embeddings.calls) - embedded < first["chunks_added"] // 3
+
+
+def test_delete_of_unknown_document_is_not_a_change():
+    indexer = IncrementalIndexer(NumpyVectorStore(DeterministicFakeEmbedding(size=16)), SpanChunker(chunk_size=400))
+    indexer.sync(corpus(1))
+    assert not has_changes(indexer.delete(["missing"]))
+    assert has_changes(indexer.delete(["doc0"]))
+
+
+@pytest.mark.parametrize("cls", ["ANNRAG", "HybridBM25RAG"])
+def test_reingest_after_restart_keeps_index(tmp_path, fake_models, cls):
+    module = ann_rag if cls == "ANNRAG" else hybrid_bm25_rag
+    config = {"persist_directory": str(tmp_path), "k": 2}
+    docs = corpus()
+    getattr(module, cls)(config).ingest(docs)
+    mtime = os.path.getmtime(tmp_path / VECTORS_FILE)
+
+    # A restarted process memory-maps the saved vectors and re-ingests the same corpus
+    rag = getattr(module, cls)(config)
+    embedded = sum(fake_models.calls)
+    rag.ingest(docs)
+    assert sum(fake_models.calls) == embedded
+    assert os.path.getmtime(tmp_path / VECTORS_FILE) == mtime
+
+    # ...then a changed one, which is saved over the mapped files
+    rag.ingest(docs[:2])
+    restarted = getattr(module, cls)(config)
+    assert set(restarted.manifest.documents) == {"doc0", "doc1"}
+    assert restarted.query("doc1-word5", [])["answer"] == "answer [1]"
+
+
+@pytest.mark.parametrize("cls", ["ANNRAG", "HybridBM25RAG"])
+def test_deleting_everything_survives_a_restart(tmp_path, fake_models, cls):
+    module = ann_rag if cls == "ANNRAG" else hybrid_bm25_rag
+    config = {"persist_directory": str(tmp_path), "k": 2}
+    rag = getattr(module, cls)(config)
+    rag.ingest(corpus(2))
+    rag.delete(["doc0", "doc1"])
+
+    restarted = getattr(module, cls)(config)
+    assert len(restarted.vector_store) == 0 and restarted.manifest.documents == {}
+    assert "upload a file" in restarted.query("doc0-word1", [])["answer"]
+
+    # ...and the same through a re-ingest of an empty corpus
+    restarted.ingest(corpus(1))
+    restarted.ingest([])
+    assert len(getattr(module, cls)(config).vector_store) == 0
@@ -0,0 +1,95 @@
+import os
+import sys
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from conftest import corpus
+from nlp.rag.core.ivf_index import IVFVectorStore, nearest_centroids, spherical_kmeans
+from nlp.rag.core.vector_store import NumpyVectorStore, _normalize
+from nlp.rag.implementations.ann_rag import ANNRAG
+
+DIMENSION = 32
+
+
+def clustered_vectors(n=4000, clusters=40, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, DIMENSION))
+    points = centers[rng.integers(clusters, size=n)] + 0.3 * rng.normal(size=(n, DIMENSION))
+    return _normalize(points.astype(np.float32))
+
+
+@pytest.fixture
+def trained_store():
+    store = IVFVectorStore(DeterministicFakeEmbedding(size=DIMENSION), nlist=40, nprobe=4, min_train_size=0)
+    vectors = clustered_vectors()
+    store.add_vectors(vectors, [f"text {i}" for i in range(len(vectors))], ids=[f"id{i}" for i in range(len(vectors))])
+    store.train()
+    return store
+
+
+def test_batched_assignment_matches_full_matrix():
+    vectors = clustered_vectors(500)
+    centroids = vectors[:30]
+    expected = np.argmax(vectors @ centroids.T, axis=1)
+    # 4 * 30 * 7 bytes: 7 rows per batch
+    np.testing.assert_array_equal(nearest_centroids(vectors, centroids, max_bytes=840), expected)
+    np.testing.assert_array_equal(
+        spherical_kmeans(vectors, 30, seed=1, max_bytes=840), spherical_kmeans(vectors, 30, seed=1)
+    )
+
+
+def test_recall_against_exact_search(trained_store):
+    exact = NumpyVectorStore(trained_store.embeddings)
+    exact.add_vectors(np.asarray(trained_store.vectors), list(trained_store.texts), ids=list(trained_store.ids))
+    rng = np.random.default_rng(1)
+    queries = _normalize(np.asarray(trained_store.vectors[:50]) + 0.2 * rng.normal(size=(50, DIMENSION)).astype(np.float32))
+
+    def recall(nprobe):
+        trained_store.nprobe = nprobe
+        hits = [
+            len(set(trained_store._top_k(q, 10)[0]) & set(exact._top_k(q, 10)[0])) for q in queries
+        ]
+        return sum(hits) / (10 * len(queries))
+
+    assert recall(1) <= recall(4)
+    assert recall(4) >= 0.9
+    assert recall(40) == 1.0
+
+
+def test_new_rows_join_their_nearest_list(trained_store):
+    vector = clustered_vectors(1, seed=2)
+    trained_store.add_vectors(vector, ["new"], ids=["new"])
+    assert trained_store._assignments[-1] == np.argmax(trained_store.centroids @ vector[0])
+    assert trained_store.similarity_search_by_vector(vector[0], k=1)[0].id == "new"
+    trained_store.delete(["new"])
+    assert len(trained_store._assignments) == len(trained_store)
+
+
+def test_round_trip_keeps_the_index(tmp_path, trained_store):
+    trained_store.save(str(tmp_path))
+    loaded = IVFVectorStore.load(str(tmp_path), trained_store.embeddings, nprobe=4)
+    assert loaded.is_trained
+    np.testing.assert_array_equal(loaded.centroids, trained_store.centroids)
+    np.testing.assert_array_equal(loaded._assignments, trained_store._assignments)
+    query = clustered_vectors(1, seed=3)[0]
+    np.testing.assert_array_equal(loaded._top_k(query, 5)[0], trained_store._top_k(query, 5)[0])
+
+
+def test_ann_rag_trains_and_reloads(tmp_path, fake_models):
+    config = {"persist_directory": str(tmp_path), "min_train_size": 10, "nlist": 4, "nprobe": 4, "k": 2}
+    rag = ANNRAG(config)
+    rag.ingest(corpus(5))
+    assert rag.vector_store.is_trained
+    assert rag.query("doc3-word7", [])["answer"] == "answer [1]"
+
+    restarted = ANNRAG(config)
+    assert restarted.vector_store.is_trained and len(restarted.vector_store) == len(rag.vector_store)
+    query = rag.embeddings.embed_query("doc3-word7")
+    assert [d.id for d in restarted.vector_store.similarity_search_by_vector(query, k=2)] == [
+        d.id for d in rag.vector_store.similarity_search_by_vector(query, k=2)
+    ]
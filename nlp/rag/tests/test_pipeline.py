@@ -0,0 +1,106 @@
+import os
+import sys
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+
+from nlp.rag.core.pipeline import CitationPipelineMixin, QueryContext, RetrievalPipeline, default_cache_key
+from nlp.rag.implementations import full_context_rag
+
+DOCS = [Document(id="a", page_content="alpha"), Document(id="b", page_content="beta")]
+
+
+def counting_pipeline(calls, **kwargs):
+    def stage(name, output):
+        def fn(context):
+            calls.append(name)
+            return output(context)
+        return fn
+
+    return RetrievalPipeline(
+        {
+            "generate": stage("generate", lambda c: f"{c.query}: {', '.join(d.page_content for d in c.documents)}"),
+            "retrieve": stage("retrieve", lambda c: list(DOCS)),
+            "rewrite": stage("rewrite", lambda c: c.prompt.upper()),
+        },
+        **kwargs,
+    )
+
+
+def test_stages_run_in_order():
+    calls = []
+    context = counting_pipeline(calls).run("q", [])
+    assert calls == ["rewrite", "retrieve", "generate"]
+    assert context.answer == "Q: alpha, beta"
+    assert set(context.result()["stage_timings_ms"]) == {"rewrite", "retrieve", "generate"}
+
+
+def test_empty_retrieval_skips_generation():
+    pipeline = RetrievalPipeline({"retrieve": lambda c: [], "generate": lambda c: "never"}, empty_answer="none")
+    assert pipeline.run("q", []).answer == "none"
+
+
+def test_memoized_stages_are_skipped_on_repeat():
+    calls = []
+    pipeline = counting_pipeline(calls, memoize=["rewrite", "retrieve"])
+    pipeline.run("q", [])
+    second = pipeline.run("q", [])
+    assert calls == ["rewrite", "retrieve", "generate", "generate"]
+    assert second.cached == ["rewrite", "retrieve"]
+    assert pipeline.profile()["retrieve"]["cache_hits"] == 1
+
+    # A cached list is copied, so a caller can't corrupt it
+    second.documents.clear()
+    assert pipeline.run("q", []).documents == DOCS
+
+    pipeline.clear_cache()
+    pipeline.run("q", [])
+    assert calls.count("retrieve") == 2
+
+
+def test_rewrite_key_accepts_messages_and_dicts():
+    messages = QueryContext("q", [HumanMessage(content="hi"), AIMessage(content="hello")])
+    dicts = QueryContext("q", [{"role": "user", "content": "hi"}])
+    assert default_cache_key("rewrite", messages) == default_cache_key(
+        "rewrite", QueryContext("q", [HumanMessage(content="hi"), AIMessage(content="hello")])
+    )
+    assert default_cache_key("rewrite", messages) != default_cache_key("rewrite", dicts)
+
+
+def test_replace_keeps_memoization_but_not_outputs():
+    calls = []
+    pipeline = counting_pipeline(calls, memoize=["retrieve"])
+    pipeline.run("q", [])
+    pipeline.replace("retrieve", lambda c: [DOCS[1]])
+    assert pipeline.run("q", []).answer == "Q: beta"
+    assert pipeline.run("q", []).cached == ["retrieve"]
+
+
+def test_stateful_stage_cannot_be_memoized():
+    with pytest.raises(ValueError, match="stateful"):
+        counting_pipeline([], memoize=["generate"], stateful=["generate"])
+
+
+class CitingRAG(CitationPipelineMixin):
+    def __init__(self, config):
+        self.llm = FakeListChatModel(responses=["alpha [source_1]"])
+        self.pipeline = self._build_pipeline({"retrieve": lambda c: list(DOCS)}, config)
+
+
+def test_citation_mixin_generates_and_memoizes():
+    rag = CitingRAG({"memoize_stages": ["generate"]})
+    assert rag.pipeline.run("q", []).answer == "alpha [source_1]"
+    assert rag.pipeline.run("q", []).cached == ["generate"]
+
+
+def test_full_context_rag_refuses_to_memoize_generate(monkeypatch):
+    monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+    monkeypatch.setattr(full_context_rag, "get_llm", lambda api_key: FakeListChatModel(responses=["a"]))
+    with pytest.raises(ValueError, match="stateful"):
+        full_context_rag.FullContextRAG({"context_cache": "local", "memoize_stages": ["generate"]})
+    assert full_context_rag.FullContextRAG({"context_cache": "local", "memoize_stages": ["retrieve"]})
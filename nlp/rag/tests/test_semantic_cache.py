@@ -0,0 +1,126 @@
+import os
+import sys
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from typing import Dict, List
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.messages import AIMessage, HumanMessage
+
+from nlp.rag.core import semantic_cache
+from nlp.rag.core.base import BaseRAG
+from nlp.rag.core.semantic_cache import SemanticCache, SemanticCachedRAG, history_digest
+
+
+class CountingRAG(BaseRAG):
+    def __init__(self, config: Dict = {}):
+        self.queries: List[str] = []
+        self.documents: Dict[str, str] = {}
+
+    def ingest(self, documents: List[Dict[str, str]]):
+        self.documents = {doc["id"]: doc["text"] for doc in documents}
+
+    def upsert(self, documents: List[Dict[str, str]]):
+        self.documents.update((doc["id"], doc["text"]) for doc in documents)
+
+    def delete(self, doc_ids: List[str]):
+        for doc_id in doc_ids:
+            self.documents.pop(doc_id, None)
+
+    def query(self, prompt: str, chat_history: List[Dict]) -> Dict:
+        self.queries.append(prompt)
+        return {"answer": f"answer {len(self.queries)}", "sources": [Document(page_content="s")], "latency_ms": 5}
+
+
+class ConversationalRAG(CountingRAG):
+    stateful = True
+
+
+def make_rag(rag_class=CountingRAG, **config):
+    rag = rag_class()
+    return rag, SemanticCachedRAG(rag, DeterministicFakeEmbedding(size=16), config)
+
+
+def test_repeated_prompt_is_a_hit():
+    rag, cached = make_rag()
+    assert cached.query("what is x?", [])["cache_hit"] is False
+    hit = cached.query("what is x?", [])
+    assert hit["cache_hit"] is True and hit["answer"] == "answer 1"
+    assert rag.queries == ["what is x?"]
+    assert cached.cache.stats()["hit_rate"] == 0.5
+
+
+def test_answers_are_not_reused_across_conversations():
+    rag, cached = make_rag()
+    first = [HumanMessage(content="tell me about x"), AIMessage(content="x is a letter")]
+    other = [HumanMessage(content="tell me about y"), AIMessage(content="y is a letter")]
+    cached.query("why?", first)
+    assert cached.query("why?", other)["cache_hit"] is False
+    assert cached.query("why?", [{"role": "user", "content": "tell me about x"}])["cache_hit"] is False
+    assert cached.query("why?", list(first))["cache_hit"] is True
+    assert len(rag.queries) == 3
+
+
+def test_history_digest():
+    assert history_digest([]) == ""
+    messages = [HumanMessage(content="hi")]
+    assert history_digest(messages) == history_digest([HumanMessage(content="hi")])
+    assert history_digest(messages) != history_digest([AIMessage(content="hi")])
+
+
+def test_stateful_rag_bypasses_cache():
+    rag, cached = make_rag(ConversationalRAG)
+    cached.query("what is x?", [])
+    assert cached.query("what is x?", [])["cache_hit"] is False
+    assert rag.queries == ["what is x?", "what is x?"]
+    assert cached.cache.stats()["entries"] == 0
+
+
+def test_expired_entries_are_reclaimed(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(semantic_cache.time, "time", lambda: now[0])
+    cache = SemanticCache(DeterministicFakeEmbedding(size=16), ttl_seconds=10)
+    cache.store("a", {"answer": "a"})
+    now[0] += 5
+    cache.store("b", {"answer": "b"})
+    now[0] += 6
+    assert cache.lookup("a") is None
+    assert cache.stats()["entries"] == 1
+    assert cache.lookup("b") == {"answer": "b"}
+    now[0] += 10
+    cache.store("c", {"answer": "c"})
+    assert cache.stats()["entries"] == 1
+
+
+def test_full_cache_replaces_least_recently_used():
+    cache = SemanticCache(DeterministicFakeEmbedding(size=16), max_entries=2)
+    cache.store("a", {"answer": "a"})
+    cache.store("b", {"answer": "b"})
+    cache.lookup("a")
+    cache.store("c", {"answer": "c"})
+    assert cache.lookup("b") is None
+    assert cache.lookup("a") == {"answer": "a"}
+    assert cache.lookup("c") == {"answer": "c"}
+
+
+def test_ingest_invalidates():
+    rag, cached = make_rag()
+    cached.query("what is x?", [])
+    cached.ingest([{"id": "doc", "text": "new"}])
+    assert cached.query("what is x?", [])["cache_hit"] is False
+
+
+def test_upsert_and_delete_forward_to_the_wrapped_rag():
+    rag, cached = make_rag()
+    cached.ingest([{"id": "a", "text": "first"}, {"id": "b", "text": "second"}])
+    cached.query("what is x?", [])
+    cached.upsert([{"id": "c", "text": "third"}])
+    assert rag.documents == {"a": "first", "b": "second", "c": "third"}
+    assert cached.query("what is x?", [])["cache_hit"] is False
+
+    cached.delete(["a"])
+    assert set(rag.documents) == {"b", "c"}
+    assert cached.query("what is x?", [])["cache_hit"] is False
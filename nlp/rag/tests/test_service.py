@@ -0,0 +1,136 @@
+import os
+import sys
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from typing import Dict, List
+
+import pytest
+from langchain_core.documents import Document
+
+from nlp.rag.core.base import BaseRAG
+from nlp.rag.core.registry import StrategyInfo
+from nlp.rag.service.server import IndexRegistry, create_app
+
+
+class FakeRAG(BaseRAG):
+    instances: List["FakeRAG"] = []
+
+    def __init__(self, config: Dict = {}):
+        self.documents: List[Dict[str, str]] = []
+        self.ingests = 0
+        FakeRAG.instances.append(self)
+
+    def ingest(self, documents: List[Dict[str, str]]):
+        self.documents = list(documents)
+        self.ingests += 1
+
+    def query(self, prompt: str, chat_history: List[Dict]) -> Dict:
+        return {
+            "answer": " ".join(doc["id"] for doc in self.documents),
+            "sources": [Document(page_content=doc["text"], metadata={"source": doc["id"]}) for doc in self.documents],
+            "latency_ms": 1,
+        }
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def service():
+    FakeRAG.instances = []
+    clock = Clock()
+    registry = IndexRegistry(
+        {"FakeRAG": StrategyInfo("Fake RAG", "FakeRAG", __name__, "")}, ttl_s=60, max_indexes=2, clock=clock,
+    )
+    return create_app(registry).test_client(), registry, clock
+
+
+def ingest(client, tenant, documents, collection="default"):
+    response = client.post(
+        f"/v1/tenants/{tenant}/collections/{collection}/ingest",
+        json={"strategy": "FakeRAG", "documents": documents},
+    )
+    return response.get_json()["status"]
+
+
+def query(client, tenant, collection="default"):
+    return client.post(
+        f"/v1/tenants/{tenant}/collections/{collection}/query", json={"strategy": "FakeRAG", "prompt": "q"},
+    ).get_json()["answer"]
+
+
+BOOK = [{"id": "book.txt", "text": "a book"}]
+NOTES = [{"id": "notes.txt", "text": "private notes"}]
+
+
+def test_same_corpus_is_indexed_once_across_tenants(service):
+    client, registry, _ = service
+    assert ingest(client, "alice", BOOK) == "ingested"
+    assert ingest(client, "bob", BOOK) == "unchanged"
+    assert len(FakeRAG.instances) == 1 and FakeRAG.instances[0].ingests == 1
+    assert query(client, "bob") == "book.txt"
+
+
+def test_tenants_only_query_what_they_ingested(service):
+    client, _, _ = service
+    ingest(client, "alice", NOTES)
+    ingest(client, "bob", BOOK)
+    assert query(client, "alice") == "notes.txt"
+    assert query(client, "bob") == "book.txt"
+    assert "upload a file" in query(client, "carol")
+
+
+def test_reingest_updates_unshared_index_in_place(service):
+    client, registry, _ = service
+    ingest(client, "alice", BOOK)
+    ingest(client, "alice", BOOK + NOTES)
+    assert len(FakeRAG.instances) == 1 and len(registry) == 1
+    assert query(client, "alice") == "book.txt notes.txt"
+
+
+def test_reingest_leaves_shared_index_alone(service):
+    client, registry, _ = service
+    ingest(client, "alice", BOOK)
+    ingest(client, "bob", BOOK)
+    ingest(client, "alice", BOOK + NOTES)
+    assert len(FakeRAG.instances) == 2 and len(registry) == 2
+    assert query(client, "bob") == "book.txt"
+
+
+def test_idle_tenants_and_unused_indexes_are_evicted(service):
+    client, registry, clock = service
+    ingest(client, "alice", BOOK)
+    clock.now = 30
+    ingest(client, "bob", NOTES)
+    clock.now = 70
+    assert "upload a file" in query(client, "alice")
+    assert len(registry) == 1
+    assert query(client, "bob") == "notes.txt"
+
+
+def test_least_recently_used_index_is_evicted(service):
+    client, registry, clock = service
+    ingest(client, "alice", BOOK)
+    ingest(client, "bob", NOTES)
+    query(client, "alice")
+    ingest(client, "carol", [{"id": "other.txt", "text": "other"}])
+    assert len(registry) == 2
+    assert "upload a file" in query(client, "bob")
+    assert query(client, "alice") == "book.txt"
+
+
+def test_drop_frees_index_when_last_tenant_leaves(service):
+    client, registry, _ = service
+    ingest(client, "alice", BOOK)
+    ingest(client, "bob", BOOK)
+    assert client.delete("/v1/tenants/alice/collections/default").get_json() == {"dropped": 1}
+    assert len(registry) == 1
+    client.delete("/v1/tenants/bob/collections/default")
+    assert len(registry) == 0
@@ -1,41 +1,75 @@
 import streamlit as st
 import os
 import sys
-import importlib
-from typing import Dict
+import uuid
+from typing import Dict, Type
 
 # Add the project root to the Python path to allow for absolute imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
 
 from nlp.rag.core.base import BaseRAG
+from nlp.rag.core.registry import StrategyInfo, discover_strategies, load_strategy
 from langchain_core.messages import AIMessage, HumanMessage
 
+IMPLEMENTATIONS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'implementations'))
+# e.g. 'http://127.0.0.1:8765' or 'unix:///tmp/rag.sock'; see nlp/rag/service/server.py
+RAG_SERVICE_URL = os.getenv("RAG_SERVICE_URL")
+
 # --- Helper Functions ---
 
-def find_rag_implementations() -> Dict[str, BaseRAG]:
-    """Scans the 'implementations' directory to find all BaseRAG subclasses."""
-    implementations = {}
-    impl_dir = os.path.join(os.path.dirname(__file__), '..', 'implementations')
-    for filename in os.listdir(impl_dir):
-        if filename.endswith(".py") and not filename.startswith("__"):
-            module_name = f"nlp.rag.implementations.{filename[:-3]}"
-            try:
-                module = importlib.import_module(module_name)
-                for attr_name in dir(module):
-                    attr = getattr(module, attr_name)
-                    if isinstance(attr, type) and issubclass(attr, BaseRAG) and attr is not BaseRAG:
-                        # Use a user-friendly name for the dropdown
-                        friendly_name = attr.__name__.replace("RAG", " RAG").replace("_", " ")
-                        implementations[friendly_name] = attr
-            except Exception as e:
-                st.error(f"Could not load {module_name}: {e}")
-    return implementations
+@st.cache_resource
+def get_strategy_registry(directory_mtime: int) -> Dict[str, StrategyInfo]:
+    """
+    Discovers the strategies in the 'implementations' directory from their
+    source, without importing them. Cached across reruns; the directory's
+    mtime is part of the key so added or removed modules are picked up.
+    """
+    return discover_strategies(IMPLEMENTATIONS_DIR, "nlp.rag.implementations")
+
+def find_rag_implementations() -> Dict[str, StrategyInfo]:
+    """Returns the strategy registry, keyed by display name."""
+    return get_strategy_registry(os.stat(IMPLEMENTATIONS_DIR).st_mtime_ns)
+
+@st.cache_resource
+def get_rag_class(info: StrategyInfo) -> Type[BaseRAG]:
+    """Imports the selected strategy's module the first time it is chosen."""
+    return load_strategy(info)
 
 @st.cache_resource
 def get_rag_instance(rag_class) -> BaseRAG:
     """Creates and caches an instance of the selected RAG class."""
     return rag_class()
 
+@st.cache_resource
+def get_semantic_cached_instance(rag_class) -> BaseRAG:
+    """Wraps the cached RAG instance with a semantic answer cache."""
+    from nlp.rag.core.semantic_cache import SemanticCachedRAG
+    from nlp.tools.langchain_file_processor.app.langchain_logic import get_embeddings
+    return SemanticCachedRAG(get_rag_instance(rag_class), get_embeddings(os.getenv("GOOGLE_API_KEY")))
+
+def get_session_instance(info: StrategyInfo, use_semantic_cache: bool) -> BaseRAG:
+    """
+    With a RAG service configured, each browser session is its own tenant.
+    The service builds an index once per corpus and shares it between the
+    sessions that upload that corpus; a session can only query indexes of
+    documents it uploaded, and idle indexes are evicted by the service.
+    """
+    from nlp.rag.service.client import RemoteRAG
+    key = (info.class_name, use_semantic_cache)
+    instances = st.session_state.setdefault("remote_instances", {})
+    if key not in instances:
+        rag = RemoteRAG({
+            "service_url": RAG_SERVICE_URL,
+            "tenant": st.session_state.tenant_id,
+            "strategy": info.class_name,
+        })
+        if use_semantic_cache:
+            from nlp.rag.core.semantic_cache import SemanticCachedRAG
+            from nlp.tools.langchain_file_processor.app.langchain_logic import get_embeddings
+            rag = SemanticCachedRAG(rag, get_embeddings(os.getenv("GOOGLE_API_KEY")))
+        instances[key] = rag
+    return instances[key]
+
 # --- Main Streamlit App ---
 
 st.set_page_config(page_title="Modular RAG Chat", layout="wide")
@@ -46,6 +80,8 @@ if "messages" not in st.session_state:
     st.session_state.messages = []
 if "rag_instance" not in st.session_state:
     st.session_state.rag_instance = None
+if "tenant_id" not in st.session_state:
+    st.session_state.tenant_id = uuid.uuid4().hex
 
 # --- Sidebar for Configuration ---
 with st.sidebar:
@@ -58,13 +94,35 @@ with st.sidebar:
 
     selected_rag_name = st.selectbox(
         "Choose a RAG Strategy",
-        options=list(available_rags.keys())
+        options=list(available_rags.keys()),
+        help="\n\n".join(f"**{name}**: {info.description}" for name, info in available_rags.items()),
     )
-    
-    RagClass = available_rags[selected_rag_name]
-    st.session_state.rag_instance = get_rag_instance(RagClass)
+
+    use_semantic_cache = st.checkbox(
+        "Semantic answer cache",
+        help="Return a stored answer when a previous question was worded similarly.",
+    )
+    if RAG_SERVICE_URL:
+        st.session_state.rag_instance = get_session_instance(available_rags[selected_rag_name], use_semantic_cache)
+    else:
+        try:
+            RagClass = get_rag_class(available_rags[selected_rag_name])
+        except Exception as e:
+            st.error(f"Could not load {available_rags[selected_rag_name].module}: {e}")
+            st.stop()
+
+        if use_semantic_cache:
+            st.session_state.rag_instance = get_semantic_cached_instance(RagClass)
+        else:
+            st.session_state.rag_instance = get_rag_instance(RagClass)
 
     st.info(f"**Current Strategy:** `{selected_rag_name}`")
+    if use_semantic_cache:
+        cache_stats = st.session_state.rag_instance.cache.stats()
+        st.caption(
+            f"Cache: {cache_stats['entries']} entries, "
+            f"hit rate {cache_stats['hit_rate']:.0%} ({cache_stats['hits']}/{cache_stats['hits'] + cache_stats['misses']})"
+        )
 
     uploaded_file = st.file_uploader("Upload a document to chat with", type=['txt', 'pdf'])
 
@@ -76,6 +134,9 @@ with st.sidebar:
                 file_text = uploaded_file.getvalue().decode("utf-8", errors="ignore")
                 documents = [{"id": uploaded_file.name, "text": file_text}]
                 st.session_state.rag_instance.ingest(documents)
+                if not use_semantic_cache and not RAG_SERVICE_URL:
+                    # The corpus changed underneath any existing answer cache
+                    get_semantic_cached_instance.clear()
                 st.success("Ingestion complete! You can now ask questions.")
         else:
             st.warning("Please upload a file and select a RAG strategy first.")
@@ -99,7 +160,10 @@ if prompt := st.chat_input("Ask a question about the document..."):
             with st.spinner("Thinking..."):
                 response_dict = st.session_state.rag_instance.query(prompt, []) # History not yet implemented
                 st.markdown(response_dict['answer'])
-                
+                timings = response_dict.get("stage_timings_ms")
+                if timings:
+                    st.caption(" · ".join(f"{stage}: {ms:.0f} ms" for stage, ms in timings.items()))
+
                 with st.expander("Sources"):
                     for source in response_dict['sources']:
                         st.write(f"**Source:** `{source.metadata.get('source', 'N/A')}`")
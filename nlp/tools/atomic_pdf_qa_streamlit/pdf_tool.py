@@ -4,8 +4,29 @@ from atomic_agents.lib.base.base_tool import BaseTool
 import PyPDF2
 import logging
 
+from nlp.tools.langchain_file_processor.app.config import (PDF_EXTRACT_WORKERS, PDF_PAGE_CACHE_MAX_ENTRIES,
+                                                           PDF_PAGE_CACHE_PATH)
+from nlp.tools.langchain_file_processor.app.disk_cache import DiskCache
+from nlp.tools.langchain_file_processor.app.pdf_extraction import PDFExtractor
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+_extractor = None
+
+def get_pdf_extractor() -> PDFExtractor:
+    """
+    The PDF extractor shared with the LangChain file processor: pages are
+    extracted in parallel, and cached on disk by file hash, so a book
+    opened by either tool before is not extracted again.
+    """
+    global _extractor
+    if _extractor is None:
+        _extractor = PDFExtractor(
+            DiskCache(PDF_PAGE_CACHE_PATH, max_entries=PDF_PAGE_CACHE_MAX_ENTRIES),
+            max_workers=PDF_EXTRACT_WORKERS,
+        )
+    return _extractor
+
 class FilePathInputSchema(BaseModel):
     """Input schema for the PDFReaderTool, requiring a file path."""
     file_path: str = Field(..., description="The absolute path to the PDF file.")
@@ -28,11 +49,7 @@ class PDFReaderTool(BaseTool):
         """The internal method to run the tool's logic."""
         try:
             logging.info(f"Reading PDF file from path: {file_path}")
-            with open(file_path, 'rb') as file:
-                reader = PyPDF2.PdfReader(file)
-                text = ""
-                for page in reader.pages:
-                    text += page.extract_text() or ""
+            text = get_pdf_extractor().extract_text(file_path)
             logging.info(f"Successfully extracted {len(text)} characters from PDF.")
             return PDFContentOutputSchema(text_content=text)
         except FileNotFoundError:
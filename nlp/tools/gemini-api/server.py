@@ -1,10 +1,14 @@
 import streamlit as st
 import os
+import sys
 import google.generativeai as genai
 from pymongo import MongoClient
 from voyageai import Client
 from dotenv import load_dotenv
-from langchain_text_splitters import RecursiveCharacterTextSplitter # New import
+
+# Add the project root to the Python path to reuse the shared chunker
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+from nlp.tools.langchain_file_processor.app.chunking import SpanChunker
 
 load_dotenv() # Load environment variables from .env file
 
@@ -72,19 +76,15 @@ if (uploaded_file is not None) and (collection is not None) and voyage_client:
     st.sidebar.write(f"Processing file: {file_name}")
 
     try:
-        # Initialize text splitter
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=CHUNK_SIZE,
-            chunk_overlap=CHUNK_OVERLAP,
-            length_function=len,
-            is_separator_regex=False,
-        )
-        chunks = text_splitter.split_text(file_content)
+        # Chunk as (start, end) spans over the uploaded text
+        chunker = SpanChunker(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        spans = chunker.split_spans(file_content)
 
-        st.sidebar.info(f"Split into {len(chunks)} chunks.")
+        st.sidebar.info(f"Split into {len(spans)} chunks.")
 
         # Store each chunk in MongoDB
-        for i, chunk in enumerate(chunks):
+        for i, (start, end) in enumerate(spans):
+            chunk = file_content[start:end]
             result = voyage_client.embed([chunk], model="voyage-lite-02-instruct")
             embedding = result.embeddings[0]
 
@@ -0,0 +1,319 @@
+"""
+Offset-based, parallel re-implementation of LangChain's
+`RecursiveCharacterTextSplitter` (default settings: literal separators,
+separator kept at the start of each split, whitespace stripped, `len` as
+the length function).
+
+Chunks are produced as `(doc_id, start, end)` spans into the original
+document string instead of new string copies, and documents are consumed
+lazily so callers can index chunks while later documents are still being
+read. Very large documents are split across a process pool at separator
+boundaries; the per-worker results are stitched at a point where both
+workers provably reached the same splitter state, so the output is
+identical to the sequential splitter.
+"""
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from langchain_text_splitters import TextSplitter
+
+DEFAULT_SEPARATORS = ["\n\n", "\n", " ", ""]
+
+Span = Tuple[int, int]
+# (sync key, spans emitted by that event); see `_chunk_range`
+Event = Tuple[Optional[tuple], List[Span]]
+
+
+class ChunkSpan(NamedTuple):
+    doc_id: str
+    start: int
+    end: int
+
+
+def span_text(text: str, span) -> str:
+    """Materializes the text of a span (a `ChunkSpan` or `(start, end)` pair)."""
+    start, end = (span.start, span.end) if isinstance(span, ChunkSpan) else span
+    return text[start:end]
+
+
+def _strip(text: str, start: int, end: int) -> Optional[Span]:
+    """Span equivalent of `text[start:end].strip()`, or None if it is empty."""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return (start, end) if start < end else None
+
+
+def _split_boundaries(text: str, start: int, end: int, separator: str) -> List[Span]:
+    """
+    Span equivalent of splitting text[start:end] on `separator` while keeping
+    the separator at the start of each piece, dropping empty pieces.
+    """
+    if separator == "":
+        return [(i, i + 1) for i in range(start, end)]
+    cuts = [start]
+    cuts.extend(m.start() for m in re.compile(re.escape(separator)).finditer(text, start, end))
+    cuts.append(end)
+    return [(a, b) for a, b in zip(cuts, cuts[1:]) if a < b]
+
+
+def _choose_separator(text: str, start: int, end: int, separators: List[str]) -> Tuple[str, List[str]]:
+    """Picks the first separator present in text[start:end], like the LangChain splitter."""
+    for i, separator in enumerate(separators):
+        if separator == "":
+            return separator, []
+        if text.find(separator, start, end) != -1:
+            return separator, separators[i + 1:]
+    return separators[-1], []
+
+
+class _Merger:
+    """
+    Greedy merge of consecutive small splits into chunks with overlap (the
+    span form of `TextSplitter._merge_splits`). Its whole state is the
+    window of splits [window[0], window[-1]) being accumulated.
+    """
+    def __init__(self, text: str, chunk_size: int, chunk_overlap: int):
+        self.text = text
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.window: List[Span] = []
+        self.total = 0
+
+    def add(self, split: Span) -> Optional[Event]:
+        """Adds a split; returns an event if a chunk was emitted."""
+        length = split[1] - split[0]
+        event = None
+        if self.window and self.total + length > self.chunk_size:
+            start, end = self.window[0][0], self.window[-1][1]
+            chunk = _strip(self.text, start, end)
+            # Emitting window [start, end) fully determines the state from here on
+            event = (("window", start, end), [chunk] if chunk else [])
+            while self.total > self.chunk_overlap or (self.total + length > self.chunk_size and self.total > 0):
+                first = self.window.pop(0)
+                self.total -= first[1] - first[0]
+        self.window.append(split)
+        self.total += length
+        return event
+
+    def flush(self) -> List[Span]:
+        if not self.window:
+            return []
+        chunk = _strip(self.text, self.window[0][0], self.window[-1][1])
+        self.window = []
+        self.total = 0
+        return [chunk] if chunk else []
+
+
+def _split_recursive(text: str, start: int, end: int, separators: List[str], chunk_size: int, chunk_overlap: int) -> List[Span]:
+    """Span equivalent of `RecursiveCharacterTextSplitter._split_text` on text[start:end]."""
+    separator, remaining = _choose_separator(text, start, end, separators)
+    chunks: List[Span] = []
+    merger = _Merger(text, chunk_size, chunk_overlap)
+    for split in _split_boundaries(text, start, end, separator):
+        if split[1] - split[0] < chunk_size:
+            event = merger.add(split)
+            if event:
+                chunks.extend(event[1])
+        else:
+            chunks.extend(merger.flush())
+            if not remaining:
+                chunks.append(split)
+            else:
+                chunks.extend(_split_recursive(text, split[0], split[1], remaining, chunk_size, chunk_overlap))
+    chunks.extend(merger.flush())
+    return chunks
+
+
+def _chunk_range(
+    text: str, base: int, separator: str, remaining: List[str], chunk_size: int, chunk_overlap: int
+) -> List[Event]:
+    """
+    Top-level splitting of one slice of a large document, run in a worker.
+
+    Returns a list of events with absolute offsets. Each event carries a
+    sync key describing a point after which the splitter state no longer
+    depends on where the worker started: emitting a given merge window, or
+    passing a split too large to merge (which resets the merge state).
+    """
+    events: List[Event] = []
+    merger = _Merger(text, chunk_size, chunk_overlap)
+    for split in _split_boundaries(text, 0, len(text), separator):
+        if split[1] - split[0] < chunk_size:
+            event = merger.add(split)
+            if event:
+                events.append(event)
+        else:
+            spans = merger.flush()
+            if not remaining:
+                spans.append(split)
+            else:
+                spans.extend(_split_recursive(text, split[0], split[1], remaining, chunk_size, chunk_overlap))
+            events.append((("big", split[0]), spans))
+    events.append((None, merger.flush()))
+    return [
+        (_shift_key(key, base), [(a + base, b + base) for a, b in spans])
+        for key, spans in events
+    ]
+
+
+def _shift_key(key: Optional[tuple], base: int) -> Optional[tuple]:
+    if key is None:
+        return None
+    return (key[0], *(position + base for position in key[1:]))
+
+
+class SpanChunker:
+    """
+    Splits documents into `(doc_id, start, end)` spans, identical to
+    `RecursiveCharacterTextSplitter(chunk_size, chunk_overlap).split_text`.
+
+    Documents longer than `parallel_threshold` characters are split across
+    `max_workers` processes. Each worker also scans `lookahead` characters
+    into its neighbour's slice so the two outputs can be stitched at a
+    shared splitter state; if no such point exists the document is simply
+    re-split sequentially, so the result is always exact.
+    """
+    def __init__(
+        self,
+        chunk_size: int = 4000,
+        chunk_overlap: int = 200,
+        separators: Optional[List[str]] = None,
+        max_workers: Optional[int] = None,
+        parallel_threshold: int = 8_000_000,
+        lookahead: Optional[int] = None,
+    ):
+        if chunk_overlap > chunk_size:
+            raise ValueError(
+                f"Got a larger chunk overlap ({chunk_overlap}) than chunk size ({chunk_size}), should be smaller."
+            )
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = separators or DEFAULT_SEPARATORS
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.parallel_threshold = parallel_threshold
+        self.lookahead = lookahead or 32 * chunk_size
+
+    def split_spans(self, text: str) -> List[Span]:
+        """Returns the (start, end) span of every chunk of `text`."""
+        if len(text) >= self.parallel_threshold and self.max_workers > 1:
+            spans = self._split_parallel(text)
+            if spans is not None:
+                return spans
+        return _split_recursive(text, 0, len(text), self.separators, self.chunk_size, self.chunk_overlap)
+
+    def split_text(self, text: str) -> List[str]:
+        return [text[start:end] for start, end in self.split_spans(text)]
+
+    def iter_spans(self, documents: Iterable[Dict[str, str]]) -> Iterator[ChunkSpan]:
+        """
+        Lazily yields the spans of each document ({'id', 'text'} dicts) as it
+        is consumed, so callers can start indexing before the input is exhausted.
+        """
+        for doc in documents:
+            for start, end in self.split_spans(doc["text"]):
+                yield ChunkSpan(doc["id"], start, end)
+
+    def iter_chunks(self, documents: Iterable[Dict[str, str]]) -> Iterator[Tuple[ChunkSpan, str]]:
+        """Like `iter_spans`, but also yields each chunk's text."""
+        for doc in documents:
+            for start, end in self.split_spans(doc["text"]):
+                yield ChunkSpan(doc["id"], start, end), doc["text"][start:end]
+
+    def _split_parallel(self, text: str) -> Optional[List[Span]]:
+        separator, remaining = _choose_separator(text, 0, len(text), self.separators)
+        cuts = self._cut_points(text, separator)
+        if len(cuts) < 3:
+            return None
+
+        ranges = []
+        for i, (start, end) in enumerate(zip(cuts, cuts[1:])):
+            if i < len(cuts) - 2:
+                end = self._next_boundary(text, separator, min(end + self.lookahead, len(text)))
+            ranges.append((start, end))
+
+        # spawn, not fork: the caller (e.g. Streamlit) is multi-threaded
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(self.max_workers, len(ranges)), mp_context=context) as pool:
+            futures = [
+                pool.submit(_chunk_range, text[start:end], start, separator, remaining,
+                            self.chunk_size, self.chunk_overlap)
+                for start, end in ranges
+            ]
+            results = [future.result() for future in futures]
+        return self._stitch(results, cuts)
+
+    def _cut_points(self, text: str, separator: str) -> List[int]:
+        """Evenly spaced cut positions snapped forward to separator matches."""
+        step = max(len(text) // self.max_workers, self.lookahead)
+        cuts = [0]
+        position = step
+        while position < len(text):
+            boundary = self._next_boundary(text, separator, position)
+            if boundary >= len(text):
+                break
+            if boundary > cuts[-1]:
+                cuts.append(boundary)
+            position = boundary + step
+        cuts.append(len(text))
+        return cuts
+
+    @staticmethod
+    def _next_boundary(text: str, separator: str, position: int) -> int:
+        """
+        The first split boundary at or after `position`: a separator match
+        that a left-to-right scan of the whole text would also produce.
+        """
+        if separator == "" or position >= len(text):
+            return min(position, len(text))
+        while True:
+            found = text.find(separator, position)
+            if found == -1:
+                return len(text)
+            # If another occurrence starts inside the preceding separator
+            # length (e.g. "\n\n\n"), the scan may consume `found`; skip it.
+            overlap_start = max(found - len(separator) + 1, 0)
+            if text.find(separator, overlap_start, found + len(separator) - 1) == -1:
+                return found
+            position = found + 1
+
+    @staticmethod
+    def _stitch(results: List[List[Event]], cuts: List[int]) -> Optional[List[Span]]:
+        spans: List[Span] = []
+        first = 0
+        for worker, events in enumerate(results):
+            if worker == len(results) - 1:
+                for _, event_spans in events[first:]:
+                    spans.extend(event_spans)
+                return spans
+
+            next_keys = {key: i for i, (key, _) in enumerate(results[worker + 1]) if key is not None}
+            sync = None
+            for i in range(first, len(events)):
+                key = events[i][0]
+                if key is not None and key[1] >= cuts[worker + 1] and key in next_keys:
+                    sync = i
+                    break
+            if sync is None:
+                return None
+            for _, event_spans in events[first:sync + 1]:
+                spans.extend(event_spans)
+            first = next_keys[events[sync][0]] + 1
+        return spans
+
+
+class SpanTextSplitter(TextSplitter):
+    """
+    LangChain `TextSplitter` adapter around `SpanChunker`, for components
+    such as `ParentDocumentRetriever` that expect a splitter object.
+    """
+    def __init__(self, chunk_size: int = 4000, chunk_overlap: int = 200, **kwargs):
+        super().__init__(chunk_size=chunk_size, chunk_overlap=chunk_overlap, keep_separator=True)
+        self.chunker = SpanChunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap, **kwargs)
+
+    def split_text(self, text: str) -> List[str]:
+        return self.chunker.split_text(text)
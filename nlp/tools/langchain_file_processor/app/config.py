@@ -2,8 +2,30 @@ from pathlib import Path
 
 # --- Configuration ---
 PERSIST_DIRECTORY = Path(__file__).parent.parent / ".chroma_db"
+PARENT_DOCSTORE_PATH = PERSIST_DIRECTORY / "parents.sqlite"
+COLLECTION_NAME = "split_parents"
+DELETE_BATCH_SIZE = 500  # Max chunks removed per Chroma call
+STAGED_RUN_LEASE_SECONDS = 120  # An ingestion that stops renewing its lease this long is rolled back
 PARENT_CHUNK_SIZE = 2000
 CHILD_CHUNK_SIZE = 400
 LLM_MODEL = "gemini-2.5-flash-lite-preview-06-17"
 FAST_LLM_MODEL = "gemini-2.0-flash-lite"
 EMBEDDINGS_MODEL = "models/embedding-001"
+CACHE_DIRECTORY = Path(__file__).parent.parent / ".cache"
+EMBEDDING_CACHE_PATH = CACHE_DIRECTORY / "embeddings.sqlite"
+EMBEDDING_CACHE_MAX_ENTRIES = 200_000
+EMBED_BATCH_SIZE = 100  # Max texts per batchEmbedContents request
+INGEST_EMBED_WORKERS = 4
+INGEST_QUEUE_SIZE = 8
+RERANKER_BACKEND = "auto"  # "cross_encoder", "embedding" or "auto"
+RERANKER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RERANK_CACHE_PATH = CACHE_DIRECTORY / "rerank_scores.sqlite"
+RERANK_CACHE_MAX_ENTRIES = 100_000
+RERANK_TOP_K = 4
+CHAPTER_SUMMARY_MAX_PARENTS = 12  # Parents passed to the LLM to summarize a chapter
+PDF_PAGE_CACHE_PATH = CACHE_DIRECTORY / "pdf_pages.sqlite"
+PDF_PAGE_CACHE_MAX_ENTRIES = 100_000
+PDF_EXTRACT_WORKERS = None  # Extraction processes; None means one per CPU
+LLM_CACHE_PATH = CACHE_DIRECTORY / "llm_calls.sqlite"
+LLM_CACHE_MAX_ENTRIES = 20_000
+LLM_CACHE_TTL_SECONDS = 7 * 24 * 3600
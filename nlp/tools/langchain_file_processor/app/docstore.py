@@ -0,0 +1,492 @@
+"""
+A persistent parent-document store for ParentDocumentRetriever.
+
+Child chunks live in the Chroma collection under PERSIST_DIRECTORY; their
+parents live in a SQLite file next to it, so both survive a restart and a
+previously indexed PDF never has to be re-split or re-embedded.
+
+Chroma and SQLite cannot share a transaction, so consistency comes from
+ordering: parents are written as pending before any of their children are
+indexed, and only marked committed once every child is in Chroma. A run
+that fails (or a process that dies) leaves pending parents behind, and
+`reconcile` removes them together with whatever children they got.
+Every staged run holds a lease in the same file, renewed by a heartbeat
+while the run is in flight, so `reconcile` in any process only rolls back
+runs whose owner stopped renewing (i.e. died), never one still running.
+
+The same file holds a manifest of indexed sources (chunk and parent
+counts, a content hash and the ingest time). It is updated in the same
+SQLite transaction that commits a run's parents, so listing the indexed
+files never has to scan the Chroma collection.
+
+It also holds a structural index of the child chunks: for each chunk, its
+parent, source, chapter, page range and section heading. A chapter's
+parents can be read in order, and the table of contents built, without a
+vector search. Rows are only trusted once their parent is
+committed, and they are deleted together with it.
+"""
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.stores import BaseStore
+
+# SQLite's default limit on host parameters in a single statement is 999
+_BATCH_SIZE = 500
+
+
+def _batches(items: Sequence, size: int = _BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class SQLiteDocStore(BaseStore[str, Document]):
+    """
+    A durable key -> Document store. `mset(..., pending=True)` stages
+    documents that must not be trusted until `commit` is called for them.
+    `created` is True if the file did not exist before this instance.
+
+    Staged documents are recorded with this instance's `owner` id, which
+    holds a lease in the `runs` table for as long as it has staged keys.
+    A heartbeat thread renews it every `lease_seconds / 3`, so `reconcile`
+    in another Streamlit session or process never rolls back an ingestion
+    still running here; once the owner dies the lease expires after
+    `lease_seconds` and its staged documents are rolled back.
+    """
+    def __init__(self, path, lease_seconds: float = 120):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.created = not self.path.exists()
+        self.lease_seconds = lease_seconds
+        self.owner = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._in_flight: set = set()
+        self._heartbeat: Optional[threading.Thread] = None
+        self._closed = threading.Event()
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, committed INTEGER NOT NULL, owner TEXT)"
+        )
+        if "owner" not in {row[1] for row in self._conn.execute("PRAGMA table_info(documents)")}:
+            self._conn.execute("ALTER TABLE documents ADD COLUMN owner TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS documents_committed ON documents (committed)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS runs (owner TEXT PRIMARY KEY, expires_at REAL NOT NULL)")
+        # A store created before the manifest existed needs it backfilled once
+        self._sources_backfilled = self.created or self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sources'"
+        ).fetchone() is not None
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sources ("
+            "source TEXT PRIMARY KEY, chunks INTEGER NOT NULL, parents INTEGER NOT NULL, "
+            "sha256 TEXT, ingested_at REAL, deleting INTEGER NOT NULL DEFAULT 0)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(sources)")}
+        if "deleting" not in columns:
+            self._conn.execute("ALTER TABLE sources ADD COLUMN deleting INTEGER NOT NULL DEFAULT 0")
+        # Parents are deleted by source, without knowing their keys
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS documents_source ON documents (json_extract(value, '$.metadata.source'))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "chunk_id TEXT PRIMARY KEY, parent_key TEXT NOT NULL, source TEXT, chapter INTEGER, "
+            "page_start INTEGER, page_end INTEGER, heading TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_chapter ON chunks (chapter)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_parent ON chunks (parent_key)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_source ON chunks (source)")
+        self._conn.commit()
+
+    # --- BaseStore interface ---
+
+    def mget(self, keys: Sequence[str]) -> List[Optional[Document]]:
+        found: Dict[str, Document] = {}
+        with self._lock:
+            for batch in _batches(list(keys)):
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM documents WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for key, value in rows:
+                    data = json.loads(value)
+                    found[key] = Document(page_content=data["page_content"], metadata=data["metadata"])
+        return [found.get(key) for key in keys]
+
+    def mset(self, key_value_pairs: Sequence[Tuple[str, Document]], pending: bool = False) -> None:
+        owner = self.owner if pending else None
+        rows = [
+            (key, json.dumps({"page_content": doc.page_content, "metadata": doc.metadata}, default=str),
+             int(not pending), owner)
+            for key, doc in key_value_pairs
+        ]
+        if not rows:
+            return
+        with self._lock:
+            if pending:
+                self._in_flight.update(row[0] for row in rows)
+                self._renew_lease()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO documents (key, value, committed, owner) VALUES (?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+            if pending and self._heartbeat is None:
+                self._heartbeat = threading.Thread(target=self._heartbeat_loop, name="docstore-lease", daemon=True)
+                self._heartbeat.start()
+
+    def mdelete(self, keys: Sequence[str]) -> None:
+        with self._lock:
+            for batch in _batches(list(keys)):
+                placeholders = ",".join("?" * len(batch))
+                self._conn.execute(f"DELETE FROM documents WHERE key IN ({placeholders})", batch)
+                self._conn.execute(f"DELETE FROM chunks WHERE parent_key IN ({placeholders})", batch)
+            self._conn.commit()
+
+    def yield_keys(self, prefix: Optional[str] = None) -> Iterator[str]:
+        with self._lock:
+            if prefix is None:
+                keys = [row[0] for row in self._conn.execute("SELECT key FROM documents")]
+            else:
+                keys = [row[0] for row in self._conn.execute(
+                    "SELECT key FROM documents WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+                )]
+        yield from keys
+
+    def close(self):
+        """Stops renewing the lease and closes the file; runs still staged are left to expire."""
+        self._closed.set()
+        with self._lock:
+            self._conn.close()
+
+    # --- Consistency with the vector store ---
+
+    def _renew_lease(self):
+        """Extends this owner's lease; call with the lock held."""
+        self._conn.execute(
+            "INSERT INTO runs (owner, expires_at) VALUES (?, ?) "
+            "ON CONFLICT(owner) DO UPDATE SET expires_at = excluded.expires_at",
+            (self.owner, time.time() + self.lease_seconds),
+        )
+
+    def _release_lease_if_idle(self):
+        """Drops this owner's lease once nothing is staged; call with the lock held."""
+        if not self._in_flight:
+            self._conn.execute("DELETE FROM runs WHERE owner = ?", (self.owner,))
+            self._conn.commit()
+
+    def _heartbeat_loop(self):
+        while not self._closed.wait(self.lease_seconds / 3):
+            with self._lock:
+                if not self._in_flight:
+                    self._heartbeat = None
+                    return
+                self._renew_lease()
+                self._conn.commit()
+
+    def commit(self, keys: Sequence[str], sources: Optional[Dict[str, Dict]] = None):
+        """
+        Marks staged documents as durable (all their children are indexed)
+        and, in the same transaction, records `sources` in the manifest:
+        {source: {"sha256"}}. The hash and ingest time are replaced, and the
+        chunk and parent counts are recounted from what is committed, so
+        ingesting a source again never adds to stale counts.
+        """
+        now = time.time()
+        with self._lock:
+            for batch in _batches(list(keys)):
+                self._conn.execute(
+                    f"UPDATE documents SET committed = 1 WHERE key IN ({','.join('?' * len(batch))})", batch
+                )
+            self._conn.executemany(
+                "INSERT INTO sources (source, chunks, parents, sha256, ingested_at) VALUES (?, 0, 0, ?, ?) "
+                "ON CONFLICT(source) DO UPDATE SET sha256 = excluded.sha256, "
+                "ingested_at = excluded.ingested_at, deleting = 0",
+                [(source, r.get("sha256"), now) for source, r in (sources or {}).items()],
+            )
+            self._recount(list(sources or {}))
+            self._conn.commit()
+            self._in_flight.difference_update(keys)
+            self._release_lease_if_idle()
+
+    def _recount(self, sources: Sequence[str]):
+        """Sets the manifest counts of `sources` from their committed parents and chunks. Caller holds the lock."""
+        for batch in _batches(list(sources)):
+            self._conn.execute(
+                "UPDATE sources SET "
+                "parents = (SELECT COUNT(*) FROM documents d WHERE d.committed = 1 "
+                "AND json_extract(d.value, '$.metadata.source') = sources.source), "
+                "chunks = (SELECT COUNT(*) FROM chunks c JOIN documents d ON d.key = c.parent_key "
+                "WHERE d.committed = 1 AND c.source = sources.source) "
+                f"WHERE source IN ({','.join('?' * len(batch))})",
+                batch,
+            )
+
+    def supersede(self, vectorstore, sources: Sequence[str], keys: Sequence[str], id_key: str = "doc_id") -> int:
+        """
+        Removes the previous version of re-ingested `sources`: their
+        committed parents other than `keys` (the run that just committed),
+        with their children, then recounts them. Called after `commit`, so a
+        crash in between leaves both versions rather than neither. Returns
+        the number of children removed.
+        """
+        current = set(keys)
+        with self._lock:
+            previous = [
+                row[0] for source in sources for row in self._conn.execute(
+                    "SELECT key FROM documents WHERE committed = 1 AND json_extract(value, '$.metadata.source') = ?",
+                    (source,),
+                )
+                if row[0] not in current
+            ]
+        removed = self.discard(vectorstore, previous, id_key) if previous else 0
+        if previous:
+            with self._lock:
+                self._recount(sources)
+                self._conn.commit()
+        return removed
+
+    def pending_keys(self) -> List[str]:
+        """Staged keys of runs whose owner's lease has expired (or that predate leases), i.e. that died."""
+        with self._lock:
+            return [
+                row[0] for row in self._conn.execute(
+                    "SELECT d.key FROM documents d LEFT JOIN runs r ON r.owner = d.owner "
+                    "WHERE d.committed = 0 AND (r.expires_at IS NULL OR r.expires_at < ?)",
+                    (time.time(),),
+                )
+                if row[0] not in self._in_flight
+            ]
+
+    def discard(self, vectorstore, keys: Sequence[str], id_key: str = "doc_id") -> int:
+        """
+        Removes documents and their children from `vectorstore`, children
+        first so no indexed chunk is ever left pointing at a missing parent.
+        Returns the number of children removed.
+        """
+        removed = 0
+        for batch in _batches(list(keys)):
+            child_ids = vectorstore.get(where={id_key: {"$in": list(batch)}}, include=[])["ids"]
+            if child_ids:
+                vectorstore.delete(ids=child_ids)
+                removed += len(child_ids)
+        self.mdelete(keys)
+        with self._lock:
+            self._in_flight.difference_update(keys)
+            self._release_lease_if_idle()
+        return removed
+
+    def reconcile(self, vectorstore, id_key: str = "doc_id") -> Dict[str, int]:
+        """
+        Rolls back ingestion runs that never committed and finishes source
+        deletions that were interrupted. On a freshly created store it also
+        drops children indexed before parents were persisted, since their
+        parents are gone for good.
+        """
+        pending = self.pending_keys()
+        stats = {"parents_rolled_back": len(pending), "children_removed": 0}
+        if pending:
+            stats["children_removed"] += self.discard(vectorstore, pending, id_key)
+        with self._lock:
+            self._conn.execute("DELETE FROM runs WHERE expires_at < ?", (time.time(),))
+            self._conn.commit()
+        for source in self.deleting_sources():
+            stats["children_removed"] += self.delete_source(vectorstore, source)
+        if self.created:
+            self.created = False
+            indexed = vectorstore.get(include=["metadatas"])
+            parent_ids = list({(m or {}).get(id_key) for m in indexed["metadatas"]} - {None})
+            present = {key for key, doc in zip(parent_ids, self.mget(parent_ids)) if doc is not None}
+            orphans = [
+                child_id for child_id, m in zip(indexed["ids"], indexed["metadatas"])
+                if (m or {}).get(id_key) not in present
+            ]
+            for batch in _batches(orphans):
+                vectorstore.delete(ids=list(batch))
+            stats["children_removed"] += len(orphans)
+        return stats
+
+    # --- Source manifest ---
+
+    def list_sources(self) -> List[Dict]:
+        """Every indexed source with its counts, hash and ingest time, by source name."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT source, chunks, parents, sha256, ingested_at FROM sources WHERE deleting = 0 ORDER BY source"
+            ).fetchall()
+        return [
+            {"source": source, "chunks": chunks, "parents": parents, "sha256": sha256, "ingested_at": ingested_at}
+            for source, chunks, parents, sha256, ingested_at in rows
+        ]
+
+    def deleting_sources(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT source FROM sources WHERE deleting = 1")]
+
+    def delete_source(self, vectorstore, source: str, batch_size: int = _BATCH_SIZE) -> int:
+        """
+        Removes a source's children from `vectorstore` in batches of at most
+        `batch_size`, then its parents and manifest row in one transaction.
+        The source is first marked as deleting, which hides it from
+        `list_sources` and lets `reconcile` resume an interrupted deletion;
+        no child ever outlives its parent. Returns the number of children removed.
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sources (source, chunks, parents, deleting) VALUES (?, 0, 0, 1) "
+                "ON CONFLICT(source) DO UPDATE SET deleting = 1",
+                (source,),
+            )
+            self._conn.commit()
+
+        removed = 0
+        while True:
+            child_ids = vectorstore.get(where={"source": source}, limit=batch_size, include=[])["ids"]
+            if child_ids:
+                vectorstore.delete(ids=child_ids)
+                removed += len(child_ids)
+            if len(child_ids) < batch_size:
+                break
+
+        with self._lock:
+            self._conn.execute("DELETE FROM documents WHERE json_extract(value, '$.metadata.source') = ?", (source,))
+            self._conn.execute("DELETE FROM chunks WHERE source = ?", (source,))
+            self._conn.execute("DELETE FROM sources WHERE source = ?", (source,))
+            self._conn.commit()
+        return removed
+
+    def backfill_sources(self, vectorstore, id_key: str = "doc_id"):
+        """
+        Builds the manifest from one scan of `vectorstore` if this store
+        predates it; afterwards this is a no-op. Hashes and ingest times of
+        backfilled sources are unknown and left empty.
+        """
+        if self._sources_backfilled:
+            return
+        metadatas = [m or {} for m in vectorstore.get(include=["metadatas"])["metadatas"]]
+        chunks = Counter(m["source"] for m in metadatas if "source" in m)
+        parents = Counter(source for source, _ in {(m["source"], m.get(id_key)) for m in metadatas if "source" in m})
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO sources (source, chunks, parents, sha256, ingested_at) VALUES (?, ?, ?, NULL, NULL)",
+                [(source, count, parents[source]) for source, count in chunks.items()],
+            )
+            self._conn.commit()
+        self._sources_backfilled = True
+
+    # --- Structural index ---
+
+    def index_chunks(self, rows: Sequence[Tuple[str, str, Optional[str], Optional[int], Optional[int], Optional[int], Optional[str]]]):
+        """
+        Records child chunks as (chunk_id, parent_key, source, chapter,
+        page_start, page_end, heading), in document order.
+        """
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (chunk_id, parent_key, source, chapter, page_start, page_end, heading) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def chapter_chunk_ids(self, chapter: int, source: Optional[str] = None) -> List[str]:
+        """Ids of the committed child chunks of `chapter` (in every source, unless given)."""
+        query = (
+            "SELECT c.chunk_id FROM chunks c JOIN documents d ON d.key = c.parent_key "
+            "WHERE c.chapter = ? AND d.committed = 1"
+        )
+        params: list = [chapter]
+        if source is not None:
+            query += " AND c.source = ?"
+            params.append(source)
+        with self._lock:
+            return [row[0] for row in self._conn.execute(query, params)]
+
+    def chapter_sources(self, chapter: int) -> List[str]:
+        """The sources with committed chunks in `chapter`, sorted."""
+        query = (
+            "SELECT DISTINCT c.source FROM chunks c JOIN documents d ON d.key = c.parent_key "
+            "WHERE c.chapter = ? AND d.committed = 1 AND c.source IS NOT NULL ORDER BY c.source"
+        )
+        with self._lock:
+            return [row[0] for row in self._conn.execute(query, (chapter,))]
+
+    def chapter_parents(self, chapter: int, source: Optional[str] = None, limit: Optional[int] = None) -> List[Document]:
+        """The committed parents of `chapter`, in page order."""
+        query = (
+            "SELECT c.parent_key FROM chunks c JOIN documents d ON d.key = c.parent_key "
+            "WHERE c.chapter = ? AND d.committed = 1"
+        )
+        params: list = [chapter]
+        if source is not None:
+            query += " AND c.source = ?"
+            params.append(source)
+        # Pages first: documents of one run are split concurrently
+        query += " GROUP BY c.parent_key ORDER BY MIN(c.page_start), MIN(c.rowid) LIMIT ?"
+        params.append(-1 if limit is None else limit)
+        with self._lock:
+            keys = [row[0] for row in self._conn.execute(query, params)]
+        return [doc for doc in self.mget(keys) if doc is not None]
+
+    def chapters(self, source: Optional[str] = None) -> List[Dict]:
+        """
+        The table of contents of the index: for every (source, chapter), its
+        page range, chunk and parent counts, and the headings found in it,
+        in page order.
+        """
+        query = (
+            "SELECT c.source, c.chapter, c.page_start, c.page_end, c.parent_key, c.heading "
+            "FROM chunks c JOIN documents d ON d.key = c.parent_key "
+            "WHERE c.chapter IS NOT NULL AND d.committed = 1"
+        )
+        params: list = []
+        if source is not None:
+            query += " AND c.source = ?"
+            params.append(source)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY c.page_start, c.rowid", params).fetchall()
+
+        toc: Dict[Tuple[str, int], Dict] = {}
+        for row_source, chapter, page_start, page_end, parent_key, heading in rows:
+            entry = toc.setdefault((row_source, chapter), {
+                "source": row_source, "chapter": chapter, "page_start": page_start, "page_end": page_end,
+                "chunks": 0, "parents": set(), "headings": [],
+            })
+            if page_start is not None:
+                entry["page_start"] = min(p for p in (entry["page_start"], page_start) if p is not None)
+            if page_end is not None:
+                entry["page_end"] = max(p for p in (entry["page_end"], page_end) if p is not None)
+            entry["chunks"] += 1
+            entry["parents"].add(parent_key)
+            if heading and heading not in entry["headings"]:
+                entry["headings"].append(heading)
+        for entry in toc.values():
+            entry["parents"] = len(entry["parents"])
+        return sorted(toc.values(), key=lambda entry: (entry["source"] or "", entry["chapter"]))
+
+    # --- Maintenance ---
+
+    def drop_unreferenced(self, vectorstore, id_key: str = "doc_id") -> int:
+        """Deletes committed parents that no child in `vectorstore` points at."""
+        referenced = {
+            (m or {}).get(id_key) for m in vectorstore.get(include=["metadatas"])["metadatas"]
+        }
+        with self._lock:
+            keys = [row[0] for row in self._conn.execute("SELECT key FROM documents WHERE committed = 1")]
+        unreferenced = [key for key in keys if key not in referenced]
+        self.mdelete(unreferenced)
+        return len(unreferenced)
+
+    def vacuum(self):
+        """Rewrites the file so space freed by deletions is returned to the OS."""
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._conn.execute("VACUUM")
@@ -0,0 +1,95 @@
+"""
+A caching wrapper for LangChain embedding models, backed by `DiskCache`.
+"""
+import hashlib
+import inspect
+from array import array
+from typing import Dict, List
+
+from langchain_core.embeddings import Embeddings
+
+from .disk_cache import DiskCache
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embeddings model and stores every vector on disk, keyed by the
+    model name, the embedding kind (document or query, which use different
+    task types) and a hash of the text. Only cache misses reach the model,
+    and they are sent in a single batched call.
+    """
+    def __init__(self, underlying: Embeddings, cache: DiskCache, model_name: str):
+        self.underlying = underlying
+        self.cache = cache
+        self.model_name = model_name
+
+    def _key(self, kind: str, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self.model_name}:{kind}:{digest}"
+
+    @staticmethod
+    def _encode(vector: List[float]) -> bytes:
+        return array("f", vector).tobytes()
+
+    @staticmethod
+    def _decode(blob: bytes) -> List[float]:
+        vector = array("f")
+        vector.frombytes(blob)
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key("document", text) for text in texts]
+        cached = self.cache.get_many(keys)
+
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in cached:
+                missing[key] = text
+        if missing:
+            vectors = self.underlying.embed_documents(list(missing.values()))
+            encoded = [(key, self._encode(v)) for key, v in zip(missing, vectors)]
+            self.cache.set_many(encoded)
+            cached.update(encoded)
+
+        return [self._decode(cached[key]) for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key("query", text)
+        blob = self.cache.get(key)
+        if blob is None:
+            vector = self.underlying.embed_query(text)
+            blob = self._encode(vector)
+            self.cache.set(key, blob)
+        return self._decode(blob)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embeds several queries, sending all cache misses in one request."""
+        keys = [self._key("query", text) for text in texts]
+        cached = self.cache.get_many(keys)
+
+        missing = {key: text for key, text in zip(keys, texts) if key not in cached}
+        if missing:
+            vectors = embed_queries(self.underlying, list(missing.values()))
+            encoded = [(key, self._encode(v)) for key, v in zip(missing, vectors)]
+            self.cache.set_many(encoded)
+            cached.update(encoded)
+
+        return [self._decode(cached[key]) for key in keys]
+
+    def stats(self) -> Dict:
+        return self.cache.stats()
+
+
+def embed_queries(embeddings: Embeddings, texts: List[str]) -> List[List[float]]:
+    """
+    Embeds several queries with as few requests as the model allows. Models
+    whose batch endpoint takes a task type (e.g. Google's) embed them all
+    in one call as queries; others fall back to one `embed_query` each.
+    """
+    if not texts:
+        return []
+    if isinstance(embeddings, CachedEmbeddings):
+        return embeddings.embed_queries(texts)
+    if "task_type" in inspect.signature(embeddings.embed_documents).parameters:
+        return embeddings.embed_documents(texts, task_type="RETRIEVAL_QUERY")
+    return [embeddings.embed_query(text) for text in texts]
@@ -0,0 +1,282 @@
+"""
+A staged ingestion pipeline: load -> split -> embed -> index.
+
+Stages run in their own worker threads and are connected by bounded
+queues, so a slow stage applies backpressure instead of letting the whole
+corpus pile up in memory, and the first batches are indexed while later
+sources are still being loaded. Chunks are embedded in batches of up to
+`batch_size` texts, one provider request per batch.
+"""
+import queue
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from .config import EMBED_BATCH_SIZE, INGEST_EMBED_WORKERS, INGEST_QUEUE_SIZE
+
+STAGES = ("load", "split", "embed", "index")
+
+Batch = Tuple[List[Document], List[List[float]]]
+
+_DONE = object()
+
+
+class _Aborted(Exception):
+    """Raised inside a worker when another stage has failed."""
+
+
+class StageStats:
+    """Progress counters for one stage; `items` are the stage's outputs."""
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def record(self, items: int, seconds: float):
+        with self._lock:
+            if self.started is None:
+                self.started = time.perf_counter() - seconds
+            self.items += items
+            self.busy_seconds += seconds
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def throughput(self) -> float:
+        """Items per second of wall-clock time since the stage's first item."""
+        return self.items / self.elapsed if self.elapsed else 0.0
+
+    def __repr__(self) -> str:
+        return f"{self.name}: {self.items} items, {self.throughput:.1f}/s"
+
+
+def format_progress(stats: Dict[str, StageStats]) -> str:
+    return " | ".join(repr(stats[name]) for name in STAGES)
+
+
+def print_progress(stats: Dict[str, StageStats]):
+    print(f"Ingestion progress: {format_progress(stats)}")
+
+
+def index_embedded(vectorstore: VectorStore) -> Callable[[List[Document], List[List[float]]], None]:
+    """
+    Returns an index function that adds documents with precomputed
+    embeddings to `vectorstore`, without embedding them a second time.
+    """
+    if hasattr(vectorstore, "add_vectors"):
+        def index(docs: List[Document], vectors: List[List[float]]):
+            vectorstore.add_vectors(
+                vectors, [d.page_content for d in docs], [d.metadata for d in docs],
+                [d.id for d in docs] if all(d.id for d in docs) else None,
+            )
+    elif hasattr(vectorstore, "_collection"):
+        # Chroma: upsert straight into the collection
+        def index(docs: List[Document], vectors: List[List[float]]):
+            vectorstore._collection.upsert(
+                ids=[d.id or str(uuid.uuid4()) for d in docs],
+                embeddings=vectors,
+                metadatas=[d.metadata or None for d in docs],
+                documents=[d.page_content for d in docs],
+            )
+    else:
+        def index(docs: List[Document], vectors: List[List[float]]):
+            vectorstore.add_documents(docs)
+    return index
+
+
+class IngestionPipeline:
+    """
+    Runs sources through load -> split -> embed -> index.
+
+    - `load(source)` returns the documents of one source (default: the
+      source is already a Document).
+    - `split(document)` returns its chunks.
+    - `index(chunks, vectors)` stores one embedded batch; it always runs on
+      a single thread, so it need not be thread-safe.
+
+    Batches are indexed as soon as they are embedded, so if a run fails the
+    batches already indexed are kept (and, with `CachedEmbeddings`, a re-run
+    does not pay for their embeddings again). The first error raised by any
+    stage stops the pipeline and is re-raised from `run`.
+    """
+    def __init__(
+        self,
+        split: Callable[[Document], List[Document]],
+        embeddings: Embeddings,
+        index: Callable[[List[Document], List[List[float]]], None],
+        load: Optional[Callable[[Any], List[Document]]] = None,
+        batch_size: int = EMBED_BATCH_SIZE,
+        load_workers: int = 2,
+        split_workers: int = 2,
+        embed_workers: int = INGEST_EMBED_WORKERS,
+        queue_size: int = INGEST_QUEUE_SIZE,
+        progress: Optional[Callable[[Dict[str, StageStats]], None]] = None,
+        progress_interval: float = 5.0,
+    ):
+        self.load = load or (lambda source: [source])
+        self.split = split
+        self.embeddings = embeddings
+        self.index = index
+        self.batch_size = batch_size
+        self.workers = {"load": load_workers, "split": split_workers, "embed": embed_workers, "index": 1}
+        self.queue_size = queue_size
+        self.progress = progress
+        self.progress_interval = progress_interval
+
+    def run(self, sources: Iterable[Any]) -> Dict[str, StageStats]:
+        """Ingests every source; returns the final per-stage statistics."""
+        self.stats = {name: StageStats(name) for name in STAGES}
+        self._failed = threading.Event()
+        self._error: Optional[BaseException] = None
+        # sources -> load -> documents -> split -> chunks -> batcher -> batches -> embed -> embedded -> index
+        queues = {name: queue.Queue(self.queue_size) for name in
+                  ("sources", "documents", "chunks", "batches", "embedded")}
+
+        threads = [threading.Thread(target=self._feed, args=(sources, queues["sources"]), daemon=True)]
+        threads += self._stage("load", queues["sources"], queues["documents"], self._load_one)
+        threads += self._stage("split", queues["documents"], queues["chunks"], self._split_one)
+        threads.append(threading.Thread(target=self._batch, args=(queues["chunks"], queues["batches"]), daemon=True))
+        # Embedding throughput is counted in chunks, not batches
+        threads += self._stage("embed", queues["batches"], queues["embedded"], self._embed_one,
+                               count=lambda outputs: len(outputs[0][0]))
+        threads += self._stage("index", queues["embedded"], None, self._index_one)
+
+        for thread in threads:
+            thread.start()
+        last_report = time.perf_counter()
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=0.1)
+                if self.progress and time.perf_counter() - last_report >= self.progress_interval:
+                    self.progress(self.stats)
+                    last_report = time.perf_counter()
+
+        if self._error is not None:
+            raise self._error
+        if self.progress:
+            self.progress(self.stats)
+        return self.stats
+
+    # --- Workers ---
+
+    def _load_one(self, source) -> List[Document]:
+        return list(self.load(source))
+
+    def _split_one(self, doc: Document) -> List[Document]:
+        return list(self.split(doc))
+
+    def _embed_one(self, chunks: List[Document]) -> List[Batch]:
+        return [(chunks, self.embeddings.embed_documents([c.page_content for c in chunks]))]
+
+    def _index_one(self, batch: Batch) -> List:
+        chunks, vectors = batch
+        self.index(chunks, vectors)
+        return [None] * len(chunks)
+
+    def _stage(
+        self, name: str, inbox: queue.Queue, outbox: Optional[queue.Queue], fn: Callable, count: Callable = len
+    ) -> List[threading.Thread]:
+        remaining = [self.workers[name]]
+        lock = threading.Lock()
+
+        def work():
+            try:
+                while True:
+                    item = self._get(inbox)
+                    if item is _DONE:
+                        inbox.put(_DONE)  # let the stage's other workers see it too
+                        break
+                    start = time.perf_counter()
+                    outputs = fn(item)
+                    self.stats[name].record(count(outputs), time.perf_counter() - start)
+                    if outbox is not None:
+                        for output in outputs:
+                            self._put(outbox, output)
+            except _Aborted:
+                return
+            except BaseException as e:
+                self._fail(e)
+                return
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                self.stats[name].finished = time.perf_counter()
+                if outbox is not None:
+                    self._put_quietly(outbox, _DONE)
+
+        return [threading.Thread(target=work, daemon=True, name=f"ingest-{name}-{i}")
+                for i in range(self.workers[name])]
+
+    def _feed(self, sources: Iterable, outbox: queue.Queue):
+        try:
+            for source in sources:
+                self._put(outbox, source)
+        except _Aborted:
+            return
+        except BaseException as e:
+            self._fail(e)
+            return
+        self._put_quietly(outbox, _DONE)
+
+    def _batch(self, inbox: queue.Queue, outbox: queue.Queue):
+        """Regroups chunks into embedding batches of `batch_size`."""
+        try:
+            batch: List[Document] = []
+            while True:
+                item = self._get(inbox)
+                if item is _DONE:
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    self._put(outbox, batch)
+                    batch = []
+            if batch:
+                self._put(outbox, batch)
+        except _Aborted:
+            return
+        self._put_quietly(outbox, _DONE)
+
+    # --- Queue helpers that give up once another stage has failed ---
+
+    def _fail(self, error: BaseException):
+        if self._error is None:
+            self._error = error
+        self._failed.set()
+
+    def _get(self, inbox: queue.Queue):
+        while True:
+            if self._failed.is_set():
+                raise _Aborted()
+            try:
+                return inbox.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+    def _put(self, outbox: queue.Queue, item):
+        while True:
+            if self._failed.is_set():
+                raise _Aborted()
+            try:
+                outbox.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _put_quietly(self, outbox: queue.Queue, item):
+        try:
+            self._put(outbox, item)
+        except _Aborted:
+            pass
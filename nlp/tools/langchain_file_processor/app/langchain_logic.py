@@ -1,26 +1,44 @@
-from typing import List, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
+import hashlib
 import os
 import re
+import threading
+import time
+import uuid
 import chromadb
 import streamlit as st
-from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
 from langchain.retrievers import ParentDocumentRetriever
-from langchain.storage import InMemoryStore
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_chroma import Chroma
 from langchain_community.chat_message_histories import StreamlitChatMessageHistory
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_google_genai import (ChatGoogleGenerativeAI,
                                     GoogleGenerativeAIEmbeddings)
-from langchain_core.messages import AIMessage, HumanMessage
-from typing import List, Optional
 
-from .config import (CHILD_CHUNK_SIZE, EMBEDDINGS_MODEL, FAST_LLM_MODEL,
-                    LLM_MODEL, PARENT_CHUNK_SIZE, PERSIST_DIRECTORY)
+from .chunking import SpanTextSplitter
+from .config import (CHAPTER_SUMMARY_MAX_PARENTS, CHILD_CHUNK_SIZE,
+                    COLLECTION_NAME, DELETE_BATCH_SIZE,
+                    EMBEDDING_CACHE_MAX_ENTRIES, EMBEDDING_CACHE_PATH,
+                    EMBEDDINGS_MODEL, FAST_LLM_MODEL, LLM_CACHE_MAX_ENTRIES,
+                    LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS, LLM_MODEL,
+                    PARENT_CHUNK_SIZE, PARENT_DOCSTORE_PATH, PERSIST_DIRECTORY,
+                    RERANK_CACHE_MAX_ENTRIES, RERANK_CACHE_PATH, RERANK_TOP_K,
+                    RERANKER_BACKEND, RERANKER_MODEL,
+                    STAGED_RUN_LEASE_SECONDS)
+from .disk_cache import DiskCache
+from .docstore import SQLiteDocStore
+from .embedding_cache import CachedEmbeddings, embed_queries
+from .ingestion import IngestionPipeline, index_embedded, print_progress
+from .llm_cache import LLMCache, model_name
+from .query_planner import (PLANNER_PROMPT_VERSION, QueryPlan, find_chapter,
+                            format_chat_history, is_summary_request,
+                            plan_with_llm, rule_based_plan)
+from .reranking import Reranker, create_reranker
+from .utils import page_span
 
 @st.cache_resource
 def get_llm(api_key: str) -> ChatGoogleGenerativeAI:
@@ -41,32 +59,72 @@ def get_fast_llm(api_key: str) -> ChatGoogleGenerativeAI:
     )
 
 @st.cache_resource
-def get_embeddings(api_key: str) -> GoogleGenerativeAIEmbeddings:
-    """Initializes and caches the embeddings model."""
-    return GoogleGenerativeAIEmbeddings(
-        model=EMBEDDINGS_MODEL, google_api_key=api_key
+def get_embeddings(api_key: str) -> CachedEmbeddings:
+    """
+    Initializes and caches the embeddings model. Vectors are persisted in a
+    disk cache shared across processes, so the same text is only embedded once.
+    """
+    return CachedEmbeddings(
+        GoogleGenerativeAIEmbeddings(model=EMBEDDINGS_MODEL, google_api_key=api_key),
+        DiskCache(EMBEDDING_CACHE_PATH, max_entries=EMBEDDING_CACHE_MAX_ENTRIES),
+        model_name=EMBEDDINGS_MODEL,
     )
 
 @st.cache_resource
 def build_vector_store(
-    _embeddings: GoogleGenerativeAIEmbeddings,
+    _embeddings: Embeddings,
 ) -> Chroma:
     """Builds and caches the Chroma vector store."""
     client = chromadb.PersistentClient(path=str(PERSIST_DIRECTORY))
     return Chroma(
-        collection_name="split_parents",
+        collection_name=COLLECTION_NAME,
         embedding_function=_embeddings,
         client=client,
         persist_directory=str(PERSIST_DIRECTORY),
     )
 
+@st.cache_resource
+def get_parent_docstore() -> SQLiteDocStore:
+    """Opens and caches the parent-document store kept next to the Chroma collection."""
+    return SQLiteDocStore(PARENT_DOCSTORE_PATH, lease_seconds=STAGED_RUN_LEASE_SECONDS)
+
+# Numbered ("2.3 Results") or all-caps ("METHODS") lines of at most 80 characters
+_HEADING = re.compile(
+    r"^[ \t]*(\d+(?:\.\d+)*\.?[ \t]+[A-Z][^\n.]{1,76}|[A-Z][A-Z0-9 ,:'&-]{3,79})[ \t]*$", re.MULTILINE
+)
+
+def _find_headings(text: str) -> List[str]:
+    return [match.group(1).strip() for match in _HEADING.finditer(text)]
+
+def _set_pages(metadata: Dict, pages: Tuple[Optional[int], Optional[int]]):
+    """Replaces a split's page offsets with its own page range."""
+    metadata.pop("page_offsets", None)
+    for name, page in zip(("page_start", "page_end"), pages):
+        if page is not None:
+            metadata[name] = page
+
 def build_retriever(
-    vectorstore: Chroma, docs: List[Document]
+    vectorstore: Chroma,
+    docs: Iterable[Document] = (),
+    docstore: Optional[SQLiteDocStore] = None,
 ) -> ParentDocumentRetriever:
-    """Builds the ParentDocumentRetriever and adds documents to it."""
-    parent_splitter = RecursiveCharacterTextSplitter(chunk_size=PARENT_CHUNK_SIZE)
-    child_splitter = RecursiveCharacterTextSplitter(chunk_size=CHILD_CHUNK_SIZE)
-    store = InMemoryStore()
+    """
+    Builds the ParentDocumentRetriever over the persistent parent docstore
+    and adds `docs` to it through the staged ingestion pipeline. `docs` may
+    be a lazy iterator (e.g. a loader's `lazy_load()`): child chunks are
+    embedded in batches and indexed while later documents are still being
+    read. With no `docs` this just reattaches to what is already indexed.
+
+    Parents are staged before their children are indexed and committed
+    after, so a failed run is rolled back rather than leaving children
+    whose parents are missing. Each child is also recorded in the
+    docstore's structural index with its chapter, page range and the
+    section heading in effect where its parent starts.
+    """
+    parent_splitter = SpanTextSplitter(chunk_size=PARENT_CHUNK_SIZE)
+    child_splitter = SpanTextSplitter(chunk_size=CHILD_CHUNK_SIZE)
+    store = docstore or get_parent_docstore()
+    store.reconcile(vectorstore)
 
     retriever = ParentDocumentRetriever(
         vectorstore=vectorstore,
@@ -74,192 +132,194 @@ def build_retriever(
         child_splitter=child_splitter,
         parent_splitter=parent_splitter,
     )
-    
-    retriever.add_documents(docs, ids=None)
+
+    staged: List[str] = []
+    digests: Dict[str, List[str]] = {}
+    lock = threading.Lock()
+
+    def split(doc: Document) -> List[Document]:
+        children, parents = retriever._split_docs_for_adding([doc])
+        heading = doc.metadata.get("chapter_title")
+        parent_headings, parent_pages = {}, {}
+        cursor = 0
+        for key, parent in parents:
+            found = _find_headings(parent.page_content)
+            parent_headings[key] = found[0] if found else heading
+            heading = found[-1] if found else heading
+            # Parents are in text order (overlapping), so each is found after the previous one's start
+            start = doc.page_content.find(parent.page_content, cursor)
+            start = cursor if start < 0 else start
+            cursor = start + 1
+            parent_pages[key] = page_span(doc.metadata, start, start + len(parent.page_content))
+            _set_pages(parent.metadata, parent_pages[key])
+        rows = []
+        for child in children:
+            # Chunk ids are assigned here so the index can refer to them
+            child.id = child.id or str(uuid.uuid4())
+            metadata = child.metadata
+            parent_key = metadata[retriever.id_key]
+            # A chunk is given its own parent's pages, not its chapter's
+            _set_pages(metadata, parent_pages[parent_key])
+            rows.append((
+                child.id, parent_key, metadata.get("source"), metadata.get("chapter"),
+                *parent_pages[parent_key], parent_headings.get(parent_key),
+            ))
+        store.mset(parents, pending=True)
+        store.index_chunks(rows)
+        source = doc.metadata.get("source", "N/A")
+        with lock:
+            staged.extend(key for key, _ in parents)
+            digests.setdefault(source, []).append(hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest())
+        return children
+
+    try:
+        IngestionPipeline(
+            split, vectorstore.embeddings, index_embedded(vectorstore), progress=print_progress
+        ).run(docs)
+    except BaseException:
+        store.discard(vectorstore, staged)
+        raise
+    # Pages may be split in any order; hash their digests sorted so the
+    # source hash only depends on content
+    sources = {
+        source: {"sha256": hashlib.sha256("".join(sorted(source_digests)).encode("ascii")).hexdigest()}
+        for source, source_digests in digests.items()
+    }
+    store.commit(staged, sources)
+    # A re-uploaded file replaces its previous version
+    store.supersede(vectorstore, list(sources), staged)
     return retriever
 
-def get_indexed_files(vectorstore: Chroma) -> List[str]:
-    """Retrieves the list of unique source file names from the vector store."""
+def get_indexed_files(vectorstore: Chroma, docstore: Optional[SQLiteDocStore] = None) -> List[str]:
+    """
+    Retrieves the list of unique source file names from the source manifest,
+    at a cost proportional to the number of files rather than of chunks.
+    """
     if not vectorstore:
         return []
     
     try:
-        all_docs = vectorstore.get()
-        if not all_docs or not all_docs.get("metadatas"):
-            return []
-        
-        unique_sources = set()
-        for metadata in all_docs["metadatas"]:
-            if "source" in metadata:
-                unique_sources.add(metadata["source"])
-        
-        return list(unique_sources)
+        store = docstore or get_parent_docstore()
+        store.backfill_sources(vectorstore)
+        return [record["source"] for record in store.list_sources()]
     except Exception:
         # This can happen if the collection doesn't exist yet
         return []
 
-@st.cache_data
-def classify_intent(_llm: ChatGoogleGenerativeAI, query: str) -> str:
-    """Uses an LLM to classify the user's intent."""
-    system_message = """
-    You are an intent classifier. Your job is to determine the user's intent based on their message.
-    There are three possible intents:
-    1. "conversational": For greetings, farewells, thank yous, or other general chat.
-    2. "list_files": For when the user explicitly asks to see the list of loaded files.
-    3. "question_about_document": For any question that should be answered from the loaded document.
-
-    Respond with ONLY one of the three intent names.
+@st.cache_resource
+def get_llm_cache() -> LLMCache:
     """
-    prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system", system_message),
-            ("human", "{question}"),
-        ]
-    )
-    
-    chain = prompt | _llm | StrOutputParser()
-    result = chain.invoke({"question": query})
-    return result.strip()
-
-@st.cache_data
-def generate_sub_queries(_llm: ChatGoogleGenerativeAI, query: str, _chat_history: List[dict]) -> List[str]:
+    Initializes and caches the LLM helper cache, persisted on disk and
+    shared by every worker process.
     """
-    Uses an LLM to break down a complex or conversational query into simpler, self-contained sub-queries.
+    return LLMCache(DiskCache(LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES, ttl_seconds=LLM_CACHE_TTL_SECONDS))
+
+def plan_query(
+    llm: ChatGoogleGenerativeAI, query: str, chat_history: List, cache: Optional[LLMCache] = None
+) -> QueryPlan:
     """
-    # Format the chat history into a string
-    history_str = ""
-    for message in _chat_history:
-        if isinstance(message, HumanMessage):
-            history_str += f"Human: {message.content}\n"
-        elif isinstance(message, AIMessage):
-            # Skip file list messages from history context
-            if not (isinstance(message.additional_kwargs, dict) and message.additional_kwargs.get("type") == "file_list"):
-                history_str += f"AI: {message.content}\n"
-        elif isinstance(message, dict): # For backward compatibility
-            role = message.get("role")
-            if role == "user":
-                history_str += f"Human: {message.get('content')}\n"
-            elif role == "assistant":
-                history_str += f"AI: {message.get('content')}\n"
-
-    system_message = f"""
-    You are an expert at query rewriting and decomposition. Your goal is to reformulate the user's latest question into a set of simple, self-contained sub-queries that a semantic search system can effectively answer.
-
-    Use the provided conversation history to understand the full context of the user's request.
-    Resolve pronouns (e.g., "it", "that", "they") and ambiguous references based on the preceding conversation.
-    The rewritten queries must be explicit and stand on their own.
-
-    - For broad requests (e.g., "list all...", "summarize..."), first generate a query to find the general context, then generate queries to extract the specific details.
-    - Each sub-query should be on a new line.
-    - Do not number the sub-queries.
-
-    Conversation History:
-    {history_str}
+    Works out the intent, the sub-queries and their chapter filters for a
+    message: with no LLM call if a rule matches, otherwise with one whose
+    result is cached on disk per model, prompt version, message and history.
     """
-    
-    prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system", system_message),
-            ("human", "{question}"),
-        ]
+    plan = rule_based_plan(query)
+    if plan is not None:
+        return plan
+    history = format_chat_history(chat_history)
+    return (cache or get_llm_cache()).memoize(
+        "plan_query", PLANNER_PROMPT_VERSION, model_name(llm), {"query": query, "history": history},
+        lambda: plan_with_llm(llm, query, history),
+        encode=QueryPlan.to_dict,
+        decode=QueryPlan.from_dict,
+        should_cache=lambda plan: not plan.fallback,
     )
-    
-    chain = prompt | _llm | StrOutputParser()
-    result = chain.invoke({"question": query})
-    return [q.strip() for q in result.split("\n") if q.strip()]
 
-@st.cache_data
-def extract_chapter_from_query(_llm: ChatGoogleGenerativeAI, query: str) -> Optional[int]:
+def find_chapter_source(docstore: SQLiteDocStore, chapters: List[int], text: str) -> Tuple[Optional[str], List[str]]:
     """
-    Uses an LLM to extract a chapter number from a user query.
+    Works out which file `chapters` refer to: the only indexed file that
+    has them, or the one whose name appears in `text` (the message and its
+    planned sub-queries). Returns (source, candidates); source is None
+    when no file has them or several do and none is named.
     """
-    system_message = """
-    You are an expert at extracting specific information. Your only job is to find a chapter number in the user's query.
-    
-    - If you find a chapter number, respond with ONLY the integer number (e.g., "4", "12").
-    - If you do not find any reference to a chapter, respond with the word "None".
-    - Do not add any explanation or conversational text.
+    candidates = sorted({source for chapter in chapters for source in docstore.chapter_sources(chapter)})
+    if len(candidates) <= 1:
+        return (candidates[0] if candidates else None), candidates
+    named = [
+        source for source in candidates
+        if re.search(rf"\b{re.escape(os.path.splitext(os.path.basename(source))[0])}\b", text, re.IGNORECASE)
+    ]
+    return (named[0] if len(named) == 1 else None), candidates
+
+def _search_chapter(
+    retriever: ParentDocumentRetriever, vector: List[float], chapter: int, source: Optional[str] = None
+) -> List[Document]:
     """
-    
-    prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system", system_message),
-            ("human", "{question}"),
-        ]
-    )
-    
-    chain = prompt | _llm | StrOutputParser()
-    result = chain.invoke({"question": query}).strip()
-    
-    # Find the first number in the LLM's response
-    match = re.search(r'\d+', result)
-    if match:
-        return int(match.group(0))
-    return None
-
-def rerank_documents(
-    _llm: ChatGoogleGenerativeAI, query: str, documents: List[Document]
+    Searches only the child chunks of `chapter` (of `source`, if given),
+    through the vector store's public metadata filter on the `chapter` and
+    `source` every child is indexed with.
+    """
+    where = {"chapter": chapter} if source is None else {"$and": [{"chapter": chapter}, {"source": source}]}
+    return retriever.vectorstore.similarity_search_by_vector(vector, **{**retriever.search_kwargs, "filter": where})
+
+def retrieve_for_sub_queries(
+    retriever: ParentDocumentRetriever,
+    sub_queries: List[str],
+    chapters: Optional[List[Optional[int]]] = None,
+    source: Optional[str] = None,
 ) -> List[Document]:
-    """Uses an LLM to re-rank a list of documents based on their relevance to the query."""
-    if not documents:
+    """
+    Retrieves parent documents for every sub-query with one batched
+    embedding request; the vector searches are local, and parents are
+    fetched with one docstore read. `chapters[i]`, if set, restricts the
+    search for `sub_queries[i]` to that chapter (of `source`, if given). Results are merged in
+    sub-query order, then rank order, keeping each parent's first
+    occurrence, so the output does not depend on timing.
+    """
+    if not sub_queries:
         return []
+    chapters = chapters or [None] * len(sub_queries)
+    vectors = embed_queries(retriever.vectorstore.embeddings, sub_queries)
+
+    parent_ids: List[str] = []
+    for vector, chapter in zip(vectors, chapters):
+        children = []
+        if chapter is not None:
+            children = _search_chapter(retriever, vector, chapter, source)
+        # Documents without chapter metadata can't match the filter
+        if not children:
+            children = retriever.vectorstore.similarity_search_by_vector(vector, **retriever.search_kwargs)
+        parent_ids.extend(child.metadata[retriever.id_key] for child in children if retriever.id_key in child.metadata)
+
+    parent_ids = list(dict.fromkeys(parent_ids))
+    parents = [doc for doc in retriever.docstore.mget(parent_ids) if doc is not None]
+    return list({doc.page_content: doc for doc in parents}.values())
 
-    prompt = ChatPromptTemplate.from_template(
-        """
-    You are a document re-ranking expert.
-    Given a query and a list of documents, your task is to assign a relevance score to each document.
-    The score should be an integer between 1 and 10, where 10 is the most relevant.
-
-    Respond with a list of scores, one for each document, in the same order.
-    The output should be a comma-separated string of numbers, e.g., "8,5,9,3".
-
-    Query: {query}
-
-    Documents:
-    {docs}
+@st.cache_resource
+def get_reranker(_embeddings: Embeddings) -> Reranker:
+    """
+    Initializes and caches the local reranker. Scores are persisted in a
+    disk cache keyed by (query, document hash), shared across processes.
     """
+    return create_reranker(
+        RERANKER_BACKEND,
+        _embeddings,
+        EMBEDDINGS_MODEL,
+        RERANKER_MODEL,
+        cache=DiskCache(RERANK_CACHE_PATH, max_entries=RERANK_CACHE_MAX_ENTRIES),
     )
 
-    chain = prompt | _llm | StrOutputParser()
-
-    doc_strings = [
-        f"ID: {i}\nContent: {doc.page_content}"
-        for i, doc in enumerate(documents)
-    ]
-    
-    result = chain.invoke({"query": query, "docs": "\n---\n".join(doc_strings)})
-    
-    try:
-        scores = [float(s.strip()) for s in result.split(",")]
-        
-        if len(scores) != len(documents):
-            st.error("Re-ranking returned a different number of scores than documents.")
-            return documents
-
-        scored_docs = sorted(
-            zip(scores, documents), key=lambda x: x[0], reverse=True
-        )
-        
-        return [doc for score, doc in scored_docs]
-
-    except ValueError:
-        st.error(f"Error parsing re-ranking scores: {result}")
-        return documents
-
-def delete_file(vectorstore: Chroma, file_path: str) -> bool:
+def delete_file(vectorstore: Chroma, file_path: str, docstore: Optional[SQLiteDocStore] = None) -> bool:
     """
-    Deletes a file and its corresponding entries from the vector store.
+    Deletes a file and its corresponding entries from the vector store and
+    the parent docstore, in bounded batches (see `SQLiteDocStore.delete_source`).
     """
     if not file_path or not os.path.exists(file_path):
         st.error(f"File not found: {file_path}")
         return False
 
-    all_docs = vectorstore.get(where={"source": file_path})
-    doc_ids = all_docs.get("ids", [])
-
-    if doc_ids:
-        vectorstore.delete(ids=doc_ids)
-        st.success(f"Removed {len(doc_ids)} document chunks from the vector store.")
+    removed = (docstore or get_parent_docstore()).delete_source(vectorstore, file_path, DELETE_BATCH_SIZE)
+    if removed:
+        st.success(f"Removed {removed} document chunks from the vector store.")
     else:
         st.warning(f"No documents found in vector store for: {os.path.basename(file_path)}")
 
@@ -289,6 +349,48 @@ Answer with Citations:""",
     input_variables=["context", "question"],
 )
 
+def format_citation_context(docs: List[Document]) -> str:
+    """
+    Joins documents into a single context string, labelling each one so the
+    LLM can cite it as [source_N] in the order given.
+    """
+    return "\n\n".join(
+        f"[source_{i}]\n{doc.page_content}" for i, doc in enumerate(docs, start=1)
+    )
+
+class TimedStream:
+    """
+    Passes a stream of text chunks through, keeping the full text and the
+    time to the first non-empty chunk (TTFT) and to the last one, both in
+    milliseconds from the start of iteration.
+    """
+    def __init__(self, chunks: Iterable[str]):
+        self._chunks = chunks
+        self.parts: List[str] = []
+        self.ttft_ms: Optional[float] = None
+        self.total_ms: Optional[float] = None
+
+    def __iter__(self):
+        start = time.perf_counter()
+        for chunk in self._chunks:
+            if self.ttft_ms is None and chunk:
+                self.ttft_ms = (time.perf_counter() - start) * 1000
+            self.parts.append(chunk)
+            yield chunk
+        self.total_ms = (time.perf_counter() - start) * 1000
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+
+def record_answer_latency(stream: TimedStream, max_entries: int = 100) -> Dict[str, Optional[float]]:
+    """Keeps the latencies of the session's last `max_entries` answers in `st.session_state.answer_latencies`."""
+    latency = {"ttft_ms": stream.ttft_ms, "total_ms": stream.total_ms}
+    history = st.session_state.setdefault("answer_latencies", [])
+    history.append(latency)
+    del history[:-max_entries]
+    return latency
+
 def handle_direct_llm_query(prompt: str, llm: ChatGoogleGenerativeAI) -> str:
     """Handles a direct query to the LLM without retrieval, maintaining conversation history."""
     
@@ -322,62 +424,91 @@ def handle_rag_query(
     llm: ChatGoogleGenerativeAI,
     fast_llm: ChatGoogleGenerativeAI,
     retriever: ParentDocumentRetriever,
-    embeddings: GoogleGenerativeAIEmbeddings,
+    embeddings: Embeddings,
     chat_history: List[dict],
+    plan: Optional[QueryPlan] = None,
+    source: Optional[str] = None,
 ) -> str:
-    """Handles a query using the RAG workflow with query decomposition and citations."""
+    """
+    Handles a query using the RAG workflow with query decomposition and citations.
+    Pass the `plan` from `plan_query` if the message was already planned to
+    route it; otherwise it is planned here with `fast_llm`.
+    Chapter references are scoped to `source` (e.g. the file selected in
+    the UI). Without one, the file is found with `find_chapter_source`, and
+    if several files have the chapter the user is asked to name one.
+    `embeddings` is no longer used: the reranked documents are passed to the
+    LLM directly instead of being re-embedded into a throwaway index.
+
+    The answer is streamed into the current container (call this inside the
+    assistant's `st.chat_message`) as it is generated, and its full text is
+    returned for the chat history; callers should not write it out again.
+    """
     with st.spinner("Analyzing conversation and breaking down question..."):
-        sub_queries = generate_sub_queries(llm, prompt, chat_history)
-        
-        with st.expander("Generated Sub-Queries"):
-            st.write(sub_queries)
-
-        all_retrieved_docs: List[Document] = []
-        for q in sub_queries:
-            chapter_num = extract_chapter_from_query(fast_llm, q)
-            
-            search_kwargs = {}
-            if chapter_num is not None:
-                st.info(f"Filtering search to Chapter {chapter_num}...")
-                search_kwargs = {"filter": {"chapter": chapter_num}}
-
-            retrieved = retriever.get_relevant_documents(q, search_kwargs=search_kwargs)
-            all_retrieved_docs.extend(retrieved)
-        
-        unique_docs = list({doc.page_content: doc for doc in all_retrieved_docs}.values())
-        
-        if not unique_docs:
-            return "I couldn't find any relevant information in the document to answer your question."
-
-        st.success(f"Retrieved {len(unique_docs)} unique document sections.")
-
-    with st.spinner("Re-ranking retrieved documents for relevance..."):
-        reranked_docs = rerank_documents(llm, prompt, unique_docs)
-        top_docs = reranked_docs[:4]
-        st.success(f"Re-ranked and selected top {len(top_docs)} documents.")
-
-    with st.spinner("Synthesizing the final answer with citations..."):
-        try:
-            contextual_vectorstore = Chroma.from_documents(top_docs, embeddings)
-
-            qa_chain = RetrievalQA.from_chain_type(
-                llm=llm,
-                chain_type="stuff",
-                retriever=contextual_vectorstore.as_retriever(),
-                chain_type_kwargs={"prompt": CITATION_PROMPT},
-                return_source_documents=True,
+        if plan is None:
+            plan = plan_query(fast_llm or llm, prompt, chat_history)
+        sub_queries = plan.sub_queries or [prompt]
+        chapters = plan.chapters if plan.sub_queries else [find_chapter(prompt)]
+        requested_chapters = sorted({c for c in chapters if c is not None})
+        indexed = isinstance(retriever.docstore, SQLiteDocStore)
+
+        # Chapter numbers repeat across files; never mix two files' chapter N
+        if requested_chapters and source is None and indexed:
+            source, candidates = find_chapter_source(
+                retriever.docstore, requested_chapters, " ".join([prompt, *sub_queries])
             )
+            if source is None and len(candidates) > 1:
+                names = ", ".join(os.path.basename(candidate) for candidate in candidates)
+                return (
+                    f"Chapter {', '.join(map(str, requested_chapters))} appears in several files ({names}). "
+                    "Which one do you mean? Please include the file name in your question."
+                )
+
+        # "Summarize chapter N" needs the whole chapter, in order, not the
+        # passages most similar to the word "summarize"
+        top_docs = []
+        if len(requested_chapters) == 1 and is_summary_request(prompt) and indexed:
+            top_docs = retriever.docstore.chapter_parents(
+                requested_chapters[0], source=source, limit=CHAPTER_SUMMARY_MAX_PARENTS
+            )
+        if top_docs:
+            st.info(f"Summarizing Chapter {requested_chapters[0]} from its {len(top_docs)} indexed sections...")
+        else:
+            with st.expander("Generated Sub-Queries"):
+                st.write(sub_queries)
+
+            unique_docs = retrieve_for_sub_queries(retriever, sub_queries, chapters, source)
+            for chapter_num in requested_chapters:
+                st.info(f"Filtering search to Chapter {chapter_num}...")
 
-            response = qa_chain.invoke({"query": prompt})
-            answer = response.get("result", "Sorry, I couldn't find an answer.")
-            
-            with st.expander("Cited Sources"):
-                for i, doc in enumerate(response["source_documents"]):
-                    st.markdown(f"**[source_{i+1}]** - *{os.path.basename(doc.metadata.get('source', 'N/A'))}*")
-                    st.markdown(doc.page_content)
-            
-            return answer
-
-        except Exception as e:
-            st.error(f"An error occurred: {e}")
-            return "An error occurred while processing the document."
+            if not unique_docs:
+                return "I couldn't find any relevant information in the document to answer your question."
+
+            st.success(f"Retrieved {len(unique_docs)} unique document sections.")
+
+    if not top_docs:
+        with st.spinner("Re-ranking retrieved documents for relevance..."):
+            reranker = get_reranker(retriever.vectorstore.embeddings)
+            top_docs = reranker.rerank(prompt, unique_docs, top_k=RERANK_TOP_K)
+            st.success(f"Re-ranked and selected top {len(top_docs)} documents.")
+
+    try:
+        # Stuff the reranked documents straight into the citation prompt,
+        # in reranked order, so [source_N] is the N-th document shown below
+        chain = CITATION_PROMPT | llm | StrOutputParser()
+        stream = TimedStream(chain.stream({"context": format_citation_context(top_docs), "question": prompt}))
+        # Tokens are shown as they arrive instead of behind a spinner
+        st.write_stream(stream)
+        latency = record_answer_latency(stream)
+        if latency["ttft_ms"] is not None:
+            st.caption(f"First token: {latency['ttft_ms']:.0f} ms · full answer: {latency['total_ms']:.0f} ms")
+
+        with st.expander("Cited Sources"):
+            for i, doc in enumerate(top_docs):
+                st.markdown(f"**[source_{i+1}]** - *{os.path.basename(doc.metadata.get('source', 'N/A'))}*")
+                st.markdown(doc.page_content)
+
+        return stream.text
+
+    except Exception as e:
+        st.error(f"An error occurred: {e}")
+        return "An error occurred while processing the document."
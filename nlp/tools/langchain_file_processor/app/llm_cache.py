@@ -0,0 +1,80 @@
+"""
+A persistent memoization layer for LLM helper calls, backed by `DiskCache`.
+
+`st.cache_data` keeps results per process, without a size bound, and loses
+them on restart. Here results are stored in a SQLite file shared by every
+Streamlit worker. Each result is keyed on the helper, its prompt version,
+the model and every input the call depends on. Entries expire after a TTL,
+and the least recently used ones are evicted past a size bound.
+"""
+import hashlib
+import json
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from .disk_cache import DiskCache
+
+T = TypeVar("T")
+
+
+def model_name(llm) -> str:
+    """The model an LLM client calls, used to keep its cached answers apart."""
+    return str(getattr(llm, "model", None) or getattr(llm, "model_name", None) or type(llm).__name__)
+
+
+class LLMCache:
+    """
+    Memoizes LLM helper results as JSON. `hits` / `misses` count lookups
+    per helper in this process; `stats()` adds the disk cache's totals.
+    """
+    def __init__(self, cache: DiskCache):
+        self.cache = cache
+        self.hits: Dict[str, int] = defaultdict(int)
+        self.misses: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(helper: str, version: str, model: str, inputs: Dict[str, Any]) -> str:
+        payload = json.dumps(inputs, sort_keys=True, default=str)
+        digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        return f"{helper}:{version}:{model}:{digest}"
+
+    def memoize(
+        self,
+        helper: str,
+        version: str,
+        model: str,
+        inputs: Dict[str, Any],
+        compute: Callable[[], T],
+        encode: Callable[[T], Any] = lambda value: value,
+        decode: Callable[[Any], T] = lambda value: value,
+        should_cache: Callable[[T], bool] = lambda value: True,
+    ) -> T:
+        """
+        Returns the cached result of `compute()` for these inputs, calling
+        it on a miss. `encode` / `decode` convert the result to and from
+        JSON-serializable data; results rejected by `should_cache` (such as
+        fallbacks for unparseable output) are returned but not stored.
+        """
+        key = self.key(helper, version, model, inputs)
+        blob: Optional[bytes] = self.cache.get(key)
+        if blob is not None:
+            with self._lock:
+                self.hits[helper] += 1
+            return decode(json.loads(blob))
+
+        with self._lock:
+            self.misses[helper] += 1
+        value = compute()
+        if should_cache(value):
+            self.cache.set(key, json.dumps(encode(value)).encode("utf-8"))
+        return value
+
+    def stats(self) -> Dict:
+        with self._lock:
+            helpers = {
+                helper: {"hits": self.hits[helper], "misses": self.misses[helper]}
+                for helper in sorted(set(self.hits) | set(self.misses))
+            }
+        return {**self.cache.stats(), "helpers": helpers}
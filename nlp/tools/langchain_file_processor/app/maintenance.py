@@ -0,0 +1,118 @@
+"""
+Maintenance commands for the persisted index. Run them while the app is
+stopped, from the project root:
+
+    python -m app.maintenance compact
+
+`compact` rebuilds the Chroma collection into a fresh one (the HNSW index
+only marks deleted vectors, so its files never shrink on their own),
+drops parents no chunk points at, and VACUUMs both SQLite files, so disk
+usage and query latency track the live data rather than its history.
+"""
+import argparse
+import os
+import sqlite3
+from pathlib import Path
+from typing import Dict
+
+import chromadb
+
+from .config import COLLECTION_NAME, DELETE_BATCH_SIZE, PARENT_DOCSTORE_PATH, PERSIST_DIRECTORY
+from .docstore import SQLiteDocStore
+
+CHROMA_SQLITE_FILE = "chroma.sqlite3"
+
+
+def directory_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file())
+
+
+def rebuild_collection(client, name: str, batch_size: int = DELETE_BATCH_SIZE) -> int:
+    """
+    Copies every record of collection `name` into a new collection, then
+    swaps it in under the same name. Returns the number of records copied.
+
+    The copy is built under a temporary name and only renamed once it is
+    complete, so an interrupted rebuild is redone from scratch next time,
+    and one interrupted after the old collection was dropped is finished.
+    """
+    temporary = f"{name}__compacting"
+    existing = {getattr(c, "name", c) for c in client.list_collections()}
+    if temporary in existing:
+        if name in existing:
+            client.delete_collection(temporary)
+        else:
+            client.get_collection(temporary).modify(name=name)
+            return client.get_collection(name).count()
+    if name not in existing:
+        return 0
+
+    source = client.get_collection(name)
+    target = client.create_collection(temporary, metadata=source.metadata)
+    for offset in range(0, source.count(), batch_size):
+        batch = source.get(limit=batch_size, offset=offset, include=["embeddings", "metadatas", "documents"])
+        if batch["ids"]:
+            target.add(
+                ids=batch["ids"],
+                embeddings=batch["embeddings"],
+                metadatas=batch["metadatas"],
+                documents=batch["documents"],
+            )
+
+    copied = target.count()
+    if copied != source.count():
+        client.delete_collection(temporary)
+        raise RuntimeError(f"Rebuild copied {copied} of {source.count()} records; the original was kept.")
+    client.delete_collection(name)
+    target.modify(name=name)
+    return copied
+
+
+def compact(persist_directory: Path = PERSIST_DIRECTORY, docstore_path: Path = PARENT_DOCSTORE_PATH) -> Dict:
+    """Rebuilds the collection, sweeps the docstore and VACUUMs; returns before/after sizes."""
+    size_before = directory_size(persist_directory)
+    client = chromadb.PersistentClient(path=str(persist_directory))
+
+    docstore = SQLiteDocStore(docstore_path)
+    collection = client.get_or_create_collection(COLLECTION_NAME)
+    reconciled = docstore.reconcile(collection)
+    records = rebuild_collection(client, COLLECTION_NAME)
+    unreferenced = docstore.drop_unreferenced(client.get_collection(COLLECTION_NAME))
+    docstore.vacuum()
+
+    chroma_sqlite = Path(persist_directory) / CHROMA_SQLITE_FILE
+    if chroma_sqlite.exists():
+        with sqlite3.connect(str(chroma_sqlite), timeout=30) as conn:
+            conn.execute("VACUUM")
+
+    return {
+        "records": records,
+        "parents_rolled_back": reconciled["parents_rolled_back"],
+        "children_removed": reconciled["children_removed"],
+        "unreferenced_parents_removed": unreferenced,
+        "bytes_before": size_before,
+        "bytes_after": directory_size(persist_directory),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("compact", help="Rebuild the vector index and reclaim disk space.")
+    args = parser.parse_args()
+
+    if args.command == "compact":
+        if not os.path.exists(PERSIST_DIRECTORY):
+            print(f"Nothing to compact: {PERSIST_DIRECTORY} does not exist.")
+            return
+        stats = compact()
+        print(
+            f"Compacted {stats['records']} chunks; "
+            f"{stats['bytes_before'] / 1e6:.1f} MB -> {stats['bytes_after'] / 1e6:.1f} MB. "
+            f"Rolled back {stats['parents_rolled_back']} staged parents, removed "
+            f"{stats['children_removed']} stale chunks and {stats['unreferenced_parents_removed']} unreferenced parents."
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Page-level PDF text extraction, parallel across processes and cached on disk.
+
+Text extraction is pure-Python and CPU-bound, so threads don't help: the
+page range is cut into contiguous runs that are extracted in a process
+pool, and the results are put back in page order. Every page's text is
+stored in a `DiskCache` keyed by the file's SHA-256, the page number and
+the extractor version, so re-opening a known file reads no page at all.
+"""
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import pypdf as _pdf
+except ImportError:  # Older installs only have the package's previous name
+    import PyPDF2 as _pdf
+
+from .disk_cache import DiskCache
+
+# Part of every cached page's key: bump it when extraction changes
+EXTRACTOR_VERSION = f"{_pdf.__name__}-{_pdf.__version__}:1"
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _extract_range(path: str, start: int, end: int) -> List[str]:
+    """Text of pages [start, end); runs in a worker process."""
+    with open(path, "rb") as f:
+        reader = _pdf.PdfReader(f)
+        return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def _runs(pages: List[int], size: int) -> List[Tuple[int, int]]:
+    """Groups sorted page numbers into [start, end) runs of consecutive pages, at most `size` long."""
+    runs: List[Tuple[int, int]] = []
+    for page in pages:
+        if runs and runs[-1][1] == page and page - runs[-1][0] < size:
+            runs[-1] = (runs[-1][0], page + 1)
+        else:
+            runs.append((page, page + 1))
+    return runs
+
+
+class PDFExtractor:
+    """
+    Extracts the text of every page of a PDF, in order.
+
+    - Pages missing from `cache` are extracted in runs of `pages_per_task`
+      by a pool of `max_workers` processes (default: one per CPU).
+    - Files with fewer than `min_pages_for_pool` uncached pages are
+      extracted in-process, where starting a pool would cost more than it saves.
+    """
+    def __init__(
+        self,
+        cache: Optional[DiskCache] = None,
+        max_workers: Optional[int] = None,
+        pages_per_task: int = 16,
+        min_pages_for_pool: int = 32,
+    ):
+        self.cache = cache
+        self.max_workers = max_workers or multiprocessing.cpu_count()
+        self.pages_per_task = pages_per_task
+        self.min_pages_for_pool = min_pages_for_pool
+
+    def page_count(self, path: str) -> int:
+        with open(path, "rb") as f:
+            return len(_pdf.PdfReader(f).pages)
+
+    def extract_pages(self, path: str) -> List[str]:
+        path = str(path)
+        digest = file_sha256(path)
+        count = self.page_count(path)
+        keys = [f"{EXTRACTOR_VERSION}:{digest}:{page}" for page in range(count)]
+        cached: Dict[str, bytes] = self.cache.get_many(keys) if self.cache is not None else {}
+
+        missing = [page for page, key in enumerate(keys) if key not in cached]
+        if missing:
+            runs = _runs(missing, self.pages_per_task)
+            if len(missing) < self.min_pages_for_pool or self.max_workers == 1:
+                results = [_extract_range(path, start, end) for start, end in runs]
+            else:
+                # spawn, not fork: the caller (e.g. Streamlit) is multi-threaded
+                context = multiprocessing.get_context("spawn")
+                with ProcessPoolExecutor(max_workers=min(self.max_workers, len(runs)), mp_context=context) as pool:
+                    results = list(pool.map(_extract_range, *zip(*[(path, start, end) for start, end in runs])))
+
+            extracted = [
+                (keys[start + offset], text.encode("utf-8"))
+                for (start, _), texts in zip(runs, results)
+                for offset, text in enumerate(texts)
+            ]
+            if self.cache is not None:
+                self.cache.set_many(extracted)
+            cached.update(extracted)
+
+        return [cached[key].decode("utf-8") for key in keys]
+
+    def extract_text(self, path: str) -> str:
+        return "".join(self.extract_pages(path))
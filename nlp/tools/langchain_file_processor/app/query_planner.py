@@ -0,0 +1,191 @@
+"""
+Plans how a chat message is answered: its intent, the self-contained
+sub-queries to retrieve for, and an optional chapter filter per sub-query.
+
+Planning used to take one LLM call to classify the intent, one to rewrite
+the question and one more per sub-query to find a chapter number. It is
+now a single LLM call returning JSON, and messages that match a
+deterministic rule (greetings, asking for the file list, summarizing a
+numbered chapter) take none.
+Chapter numbers that are spelled out ("chapter 4") are found with a
+regex, so the LLM's answer is only needed for implicit references.
+"""
+import hashlib
+import logging
+import re
+from dataclasses import asdict, dataclass, field
+from typing import List, Optional, Sequence
+
+from langchain_core.exceptions import OutputParserException
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+logger = logging.getLogger(__name__)
+
+CONVERSATIONAL = "conversational"
+LIST_FILES = "list_files"
+QUESTION = "question_about_document"
+INTENTS = (CONVERSATIONAL, LIST_FILES, QUESTION)
+
+_GREETING = re.compile(
+    r"^(hi|hello|hey|hiya|yo|greetings|good (morning|afternoon|evening)|"
+    r"thanks|thank you|thx|cheers|bye|goodbye|see you|ok|okay)"
+    r"( there| all| everyone| so much| a lot| very much)?[\s!.,?:)]*$",
+    re.IGNORECASE,
+)
+_LIST_FILES = re.compile(
+    r"^(please |can you |could you )?(list|show( me)?|display|what are|which are|what|which)"
+    r"( all)?( of)?( the| my| your)?( loaded| indexed| uploaded| available)? (files|documents|docs|pdfs)"
+    r"( (are )?(loaded|indexed|uploaded|available|do you have|you have|are there))?( please)?[\s?.!]*$",
+    re.IGNORECASE,
+)
+_CHAPTER = re.compile(r"\bchapter\s+(\d+)\b", re.IGNORECASE)
+_SUMMARY = re.compile(r"\b(summar(y|ize|ise|ising|izing)|overview|recap|outline|gist|tl;?dr)\b", re.IGNORECASE)
+
+PLANNER_SYSTEM_MESSAGE = """
+You plan how to answer the user's latest message in a chat about their uploaded documents.
+
+1. Classify the intent as one of:
+   - "conversational": greetings, farewells, thank yous, or other general chat.
+   - "list_files": the user explicitly asks to see the list of loaded files.
+   - "question_about_document": any question that should be answered from the loaded documents.
+2. For "question_about_document", rewrite the message into simple, self-contained sub-queries that a
+   semantic search system can answer. Use the conversation history to resolve pronouns ("it", "that",
+   "they") and ambiguous references. For broad requests ("list all...", "summarize..."), first add a query
+   for the general context, then queries for the specific details.
+3. For each sub-query, give the chapter number it refers to, or null if it doesn't refer to a chapter.
+
+Respond with ONLY a JSON object, for example:
+{{"intent": "question_about_document", "sub_queries": [{{"query": "What is X in chapter 4?", "chapter": 4}}]}}
+Use an empty "sub_queries" list for the other intents.
+
+Conversation History:
+{history}
+"""
+
+# Part of every cached plan's key, so editing the prompt invalidates old plans
+PLANNER_PROMPT_VERSION = hashlib.sha256(PLANNER_SYSTEM_MESSAGE.encode("utf-8")).hexdigest()[:12]
+
+PLANNER_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        ("system", PLANNER_SYSTEM_MESSAGE),
+        ("human", "{question}"),
+    ]
+)
+
+
+@dataclass
+class QueryPlan:
+    """
+    `chapters[i]` is the chapter filter for `sub_queries[i]`, if any.
+    `fallback` is set if the planner's output could not be parsed.
+    """
+    intent: str
+    sub_queries: List[str] = field(default_factory=list)
+    chapters: List[Optional[int]] = field(default_factory=list)
+    llm_calls: int = 0
+    fallback: bool = False
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "QueryPlan":
+        """A plan restored from a cache: it took no LLM call this time."""
+        return cls(**{**data, "llm_calls": 0})
+
+
+def find_chapter(text: str) -> Optional[int]:
+    """The chapter number spelled out in `text` ("chapter 12"), if any."""
+    match = _CHAPTER.search(text)
+    return int(match.group(1)) if match else None
+
+
+def is_summary_request(text: str) -> bool:
+    """True for requests to summarize, e.g. "give me an overview of chapter 3"."""
+    return _SUMMARY.search(text) is not None
+
+
+def format_chat_history(chat_history: Sequence) -> str:
+    """Renders the chat history for the planner, leaving out file list messages."""
+    history_str = ""
+    for message in chat_history:
+        if isinstance(message, HumanMessage):
+            history_str += f"Human: {message.content}\n"
+        elif isinstance(message, AIMessage):
+            if not (isinstance(message.additional_kwargs, dict) and message.additional_kwargs.get("type") == "file_list"):
+                history_str += f"AI: {message.content}\n"
+        elif isinstance(message, dict): # For backward compatibility
+            role = message.get("role")
+            if role == "user":
+                history_str += f"Human: {message.get('content')}\n"
+            elif role == "assistant":
+                history_str += f"AI: {message.get('content')}\n"
+    return history_str
+
+
+def rule_based_plan(query: str) -> Optional[QueryPlan]:
+    """
+    A plan for messages that need no LLM to understand, otherwise None:
+    greetings, file list requests, and requests to summarize one chapter
+    named by number ("summarize chapter 3"), which are answered from the
+    whole chapter rather than from rewritten sub-queries.
+    """
+    text = query.strip()
+    if not text or _GREETING.match(text):
+        return QueryPlan(CONVERSATIONAL)
+    if _LIST_FILES.match(text):
+        return QueryPlan(LIST_FILES)
+    chapters = {int(number) for number in _CHAPTER.findall(text)}
+    if len(chapters) == 1 and is_summary_request(text):
+        return QueryPlan(QUESTION, [text], [chapters.pop()])
+    return None
+
+
+def _parse_chapter(value) -> Optional[int]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    match = re.search(r"\d+", str(value or ""))
+    return int(match.group(0)) if match else None
+
+
+def parse_plan(result, query: str) -> QueryPlan:
+    """
+    Builds a plan from the planner's parsed JSON. Anything malformed falls
+    back to answering the original message from the documents.
+    """
+    if not isinstance(result, dict):
+        result = {}
+    intent = result.get("intent")
+    if intent not in INTENTS:
+        intent = QUESTION
+
+    sub_queries, chapters = [], []
+    for item in result.get("sub_queries") or []:
+        if isinstance(item, str):
+            item = {"query": item}
+        text = str(item.get("query") or "").strip() if isinstance(item, dict) else ""
+        if text:
+            sub_queries.append(text)
+            # A chapter named in the text wins over the model's reading of it
+            chapters.append(find_chapter(text) or _parse_chapter(item.get("chapter")))
+    if intent == QUESTION and not sub_queries:
+        sub_queries, chapters = [query], [find_chapter(query)]
+    return QueryPlan(intent, sub_queries, chapters, llm_calls=1)
+
+
+def plan_with_llm(llm, query: str, history: str) -> QueryPlan:
+    """Plans `query` with one LLM call; `history` is from `format_chat_history`."""
+    chain = PLANNER_PROMPT | llm | JsonOutputParser()
+    try:
+        result = chain.invoke({"question": query, "history": history})
+    except OutputParserException as e:
+        # Answer from the documents rather than fail the turn
+        logger.warning("Query planner output could not be parsed (%s); using the message as-is.", e)
+        plan = parse_plan(None, query)
+        plan.fallback = True
+        return plan
+    return parse_plan(result, query)
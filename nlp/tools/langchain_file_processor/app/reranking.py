@@ -0,0 +1,132 @@
+"""
+Local rerankers for retrieved parent documents.
+
+Query/document pairs are scored in batches on the CPU instead of in one
+large LLM prompt, and every score is stored in a `DiskCache` keyed by the
+scorer, the query and a hash of the document, so repeated questions over
+the same documents are not scored again.
+
+Two backends are available:
+- `CrossEncoderReranker`: a sentence-transformers cross-encoder, the most
+  accurate option; used when `sentence-transformers` is installed and the
+  model can be loaded (it is downloaded on first use).
+- `EmbeddingReranker`: cosine similarity between the query and document
+  embeddings, computed with NumPy. It needs no extra dependency, and with
+  `CachedEmbeddings` documents that were seen before cost no model call.
+"""
+import hashlib
+import logging
+import struct
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from .disk_cache import DiskCache
+
+logger = logging.getLogger(__name__)
+
+
+class Reranker:
+    """
+    Base class: subclasses implement `_score(query, texts)` for a batch of
+    texts and set `name`, which namespaces their cached scores.
+    """
+    name = "reranker"
+
+    def __init__(self, cache: Optional[DiskCache] = None, batch_size: int = 32, max_chars: int = 2000):
+        self.cache = cache
+        self.batch_size = batch_size
+        self.max_chars = max_chars
+
+    def _score(self, query: str, texts: List[str]) -> List[float]:
+        raise NotImplementedError
+
+    def _key(self, query: str, text: str) -> str:
+        query_digest = hashlib.sha256(query.encode("utf-8")).hexdigest()
+        doc_digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self.name}:{query_digest}:{doc_digest}"
+
+    def score(self, query: str, documents: Sequence[Document]) -> List[float]:
+        """Relevance of each document to `query`; only uncached pairs are scored."""
+        texts = [doc.page_content[:self.max_chars] for doc in documents]
+        keys = [self._key(query, text) for text in texts]
+        cached: Dict[str, bytes] = self.cache.get_many(keys) if self.cache is not None else {}
+
+        missing = list({key: text for key, text in zip(keys, texts) if key not in cached}.items())
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            scores = self._score(query, [text for _, text in batch])
+            encoded = [(key, struct.pack("f", score)) for (key, _), score in zip(batch, scores)]
+            if self.cache is not None:
+                self.cache.set_many(encoded)
+            cached.update(encoded)
+
+        return [struct.unpack("f", cached[key])[0] for key in keys]
+
+    def rerank(self, query: str, documents: Sequence[Document], top_k: Optional[int] = None) -> List[Document]:
+        """
+        The `top_k` most relevant documents, best first. Only the selected
+        documents are sorted; the rest are cut off by a partial partition.
+        """
+        if not documents:
+            return []
+        scores = np.asarray(self.score(query, documents), dtype=np.float32)
+        top_k = len(documents) if top_k is None else min(top_k, len(documents))
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [documents[i] for i in top]
+
+
+class EmbeddingReranker(Reranker):
+    """Scores documents by the cosine similarity of their embedding to the query's."""
+    def __init__(self, embeddings: Embeddings, model_name: str, **kwargs):
+        super().__init__(**kwargs)
+        self.embeddings = embeddings
+        self.name = f"embedding:{model_name}"
+
+    def _score(self, query: str, texts: List[str]) -> List[float]:
+        query_vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        doc_vectors = np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+        norms = np.linalg.norm(doc_vectors, axis=1) * np.linalg.norm(query_vector)
+        norms[norms == 0] = 1.0
+        return (doc_vectors @ query_vector / norms).tolist()
+
+
+class CrossEncoderReranker(Reranker):
+    """Scores (query, document) pairs jointly with a local cross-encoder model."""
+    def __init__(self, model_name: str, **kwargs):
+        super().__init__(**kwargs)
+        from sentence_transformers import CrossEncoder
+        self.model = CrossEncoder(model_name, device="cpu")
+        self.name = f"cross_encoder:{model_name}"
+
+    def _score(self, query: str, texts: List[str]) -> List[float]:
+        scores = self.model.predict([(query, text) for text in texts], batch_size=self.batch_size)
+        return [float(score) for score in scores]
+
+
+def create_reranker(
+    backend: str,
+    embeddings: Embeddings,
+    embeddings_model: str,
+    cross_encoder_model: str,
+    cache: Optional[DiskCache] = None,
+) -> Reranker:
+    """
+    Builds the reranker for `backend`: "cross_encoder", "embedding", or
+    "auto" (a cross-encoder if sentence-transformers is installed and the
+    model loads, otherwise embedding similarity).
+    """
+    if backend in ("auto", "cross_encoder"):
+        try:
+            return CrossEncoderReranker(cross_encoder_model, cache=cache)
+        except (ImportError, OSError) as e:
+            # OSError covers a model that can't be downloaded or read from disk
+            if backend == "cross_encoder":
+                raise
+            logger.warning("Cross-encoder %s unavailable (%s); reranking by embedding similarity.", cross_encoder_model, e)
+    elif backend != "embedding":
+        raise ValueError(f"Unknown reranker backend '{backend}'.")
+    return EmbeddingReranker(embeddings, embeddings_model, cache=cache)
@@ -1,12 +1,16 @@
+import bisect
+import itertools
 import os
 import re
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
-import PyPDF2
-from langchain_community.document_loaders import PyPDFLoader
 from langchain_core.documents import Document
 import streamlit as st
 
+from .config import PDF_EXTRACT_WORKERS, PDF_PAGE_CACHE_MAX_ENTRIES, PDF_PAGE_CACHE_PATH
+from .disk_cache import DiskCache
+from .pdf_extraction import PDFExtractor
+
 def get_google_api_key() -> Optional[str]:
     """
     Fetches the Google API key from environment variables.
@@ -14,50 +18,105 @@ def get_google_api_key() -> Optional[str]:
     """
     return os.getenv("GOOGLE_API_KEY") or os.getenv("OPENROUTER_API_KEY")
 
+@st.cache_resource
+def get_pdf_extractor() -> PDFExtractor:
+    """
+    Initializes and caches the PDF extractor. Page texts are persisted in a
+    disk cache keyed by file hash, so a known file is not extracted again.
+    """
+    return PDFExtractor(
+        DiskCache(PDF_PAGE_CACHE_PATH, max_entries=PDF_PAGE_CACHE_MAX_ENTRIES),
+        max_workers=PDF_EXTRACT_WORKERS,
+    )
+
 @st.cache_data
 def load_and_split_docs(file_path: str) -> List[Document]:
     """
-    Loads a PDF and splits it into documents.
+    Loads a PDF and splits it into documents, one per page.
     Caches the result based on the file path.
     """
-    loader = PyPDFLoader(file_path)
-    return loader.load()
+    return [
+        Document(page_content=text, metadata={"source": file_path, "page": page})
+        for page, text in enumerate(get_pdf_extractor().extract_pages(file_path))
+    ]
 
-@st.cache_data
-def load_and_split_by_chapter(file_path: str) -> List[Document]:
+_CHAPTER_HEADING = re.compile(r"Chapter \d+|CHAPTER \d+")
+
+
+def split_pages_by_chapter(pages: List[str], source: str) -> List[Document]:
     """
-    Loads a PDF, splits it by chapters, and creates Document objects with chapter metadata.
+    Splits the text of consecutive pages into one Document per chapter, at
+    every "Chapter N" heading. Each chapter records its number, its title
+    (the first short line after the heading, if any) and the 0-based range
+    of pages it spans. Text before the first chapter is kept without a
+    chapter number. `page_offsets[i]` is where page `page_start + i` starts
+    in the Document's text, so chunks can find their own pages (`page_span`).
     """
-    with open(file_path, "rb") as f:
-        pdf_reader = PyPDF2.PdfReader(f)
-        full_text = "".join(page.extract_text() for page in pdf_reader.pages)
+    full_text = "".join(pages)
+    page_starts = list(itertools.accumulate((len(page) for page in pages[:-1]), initial=0))
 
-    # Split the text by chapters. This regex looks for "Chapter X" or "CHAPTER X"
-    # and keeps the delimiter.
-    chapters = re.split(r"(Chapter \d+|CHAPTER \d+)", full_text)
-    
-    # The first element is the text before Chapter 1, which we can often discard.
-    # Then, we group the chapter title with its content.
-    if chapters[0].strip() == "":
-        chapters.pop(0)
+    def page_at(offset: int) -> int:
+        return max(bisect.bisect_right(page_starts, offset) - 1, 0)
 
+    headings = list(_CHAPTER_HEADING.finditer(full_text))
     documents = []
-    for i in range(0, len(chapters), 2):
-        chapter_title = chapters[i]
-        chapter_content = chapters[i+1] if (i+1) < len(chapters) else ""
-        
-        # Extract chapter number for metadata
-        chapter_num_match = re.search(r"\d+", chapter_title)
-        chapter_num = int(chapter_num_match.group(0)) if chapter_num_match else i // 2 + 1
-
+    preamble_end = headings[0].start() if headings else len(full_text)
+    if full_text[:preamble_end].strip():
         documents.append(
             Document(
-                page_content=f"{chapter_title}\n\n{chapter_content}",
+                page_content=full_text[:preamble_end],
                 metadata={
-                    "source": os.path.basename(file_path),
-                    "chapter": chapter_num,
+                    "source": source,
+                    "page_start": 0,
+                    "page_end": page_at(max(preamble_end - 1, 0)),
+                    "page_offsets": page_starts[:page_at(max(preamble_end - 1, 0)) + 1],
                 },
             )
         )
-    
+
+    for i, heading in enumerate(headings):
+        end = headings[i + 1].start() if i + 1 < len(headings) else len(full_text)
+        chapter_title = heading.group(0)
+        chapter_content = full_text[heading.end():end]
+        page_start, page_end = page_at(heading.start()), page_at(max(end - 1, heading.start()))
+        # The text is the heading, a blank line, then full_text[heading.end():end]
+        body_offset = len(chapter_title) + 2
+        metadata = {
+            "source": source,
+            "chapter": int(re.search(r"\d+", chapter_title).group(0)),
+            "page_start": page_start,
+            "page_end": page_end,
+            "page_offsets": [0] + [
+                body_offset + max(page_starts[page] - heading.end(), 0) for page in range(page_start + 1, page_end + 1)
+            ],
+        }
+        title = next((line.strip() for line in chapter_content.splitlines() if line.strip()), "")
+        if 0 < len(title) <= 80:
+            metadata["chapter_title"] = title
+        documents.append(Document(page_content=f"{chapter_title}\n\n{chapter_content}", metadata=metadata))
+
     return documents
+
+def page_span(metadata: Dict, start: int, end: int) -> Tuple[Optional[int], Optional[int]]:
+    """
+    The first and last page of the text [start, end) of a Document from
+    `split_pages_by_chapter`. Documents without page offsets report their
+    own page range.
+    """
+    offsets = metadata.get("page_offsets")
+    first = metadata.get("page_start", metadata.get("page"))
+    if not offsets or first is None:
+        return first, metadata.get("page_end", metadata.get("page"))
+    return (
+        first + bisect.bisect_right(offsets, start) - 1,
+        first + bisect.bisect_right(offsets, max(end - 1, start)) - 1,
+    )
+
+@st.cache_data
+def load_and_split_by_chapter(file_path: str) -> List[Document]:
+    """
+    Loads a PDF, splits it by chapters, and creates Document objects with
+    chapter and page range metadata.
+    """
+    pages = get_pdf_extractor().extract_pages(file_path)
+    return split_pages_by_chapter(pages, os.path.basename(file_path))
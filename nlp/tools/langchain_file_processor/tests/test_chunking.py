@@ -0,0 +1,53 @@
+import os
+import random
+import sys
+
+# Add the project root to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+import pytest
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from app.chunking import ChunkSpan, SpanChunker, SpanTextSplitter
+
+PIECES = ["lorem", "ipsum", " ", "\n", "\n\n", "\n\n\n", "  \n ", "x" * 60]
+
+
+def random_text(seed: int, length: int = 2000) -> str:
+    rng = random.Random(seed)
+    return "".join(rng.choice(PIECES) for _ in range(length // 4))
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("chunk_size,chunk_overlap", [(50, 10), (200, 40), (1000, 200)])
+def test_matches_recursive_character_splitter(seed, chunk_size, chunk_overlap):
+    text = random_text(seed)
+    expected = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap).split_text(text)
+
+    chunker = SpanChunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap, max_workers=1)
+
+    assert chunker.split_text(text) == expected
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_parallel_split_is_identical(seed):
+    text = random_text(seed, length=20000)
+    expected = RecursiveCharacterTextSplitter(chunk_size=100, chunk_overlap=20).split_text(text)
+
+    chunker = SpanChunker(
+        chunk_size=100, chunk_overlap=20, max_workers=3, parallel_threshold=0, lookahead=400
+    )
+
+    assert chunker.split_text(text) == expected
+
+
+def test_iter_spans_yields_offsets_into_each_document():
+    documents = [{"id": "a", "text": "one two three"}, {"id": "b", "text": "four five"}]
+    chunker = SpanChunker(chunk_size=8, chunk_overlap=0)
+
+    spans = list(chunker.iter_spans(documents))
+
+    assert spans[0] == ChunkSpan("a", 0, 7)
+    assert [documents[0]["text"][s.start:s.end] for s in spans if s.doc_id == "a"] == ["one two", "three"]
+    assert SpanTextSplitter(chunk_size=8, chunk_overlap=0).split_text("four five") == ["four", "five"]
@@ -0,0 +1,299 @@
+import os
+import sys
+import time
+
+# Add the project root to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+import chromadb
+import pytest
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from tests.mocks import mock_streamlit
+mock_streamlit()
+
+from app.docstore import SQLiteDocStore
+from app.langchain_logic import build_retriever, delete_file, get_indexed_files
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    calls: list = []
+
+    def embed_documents(self, texts):
+        self.calls.append(len(texts))
+        return super().embed_documents(texts)
+
+
+def make_vectorstore(path, embeddings):
+    client = chromadb.PersistentClient(path=str(path))
+    return Chroma(collection_name="split_parents", embedding_function=embeddings, client=client)
+
+
+def pages(n=3):
+    return [
+        Document(page_content=" ".join(f"page{i}-word{j}" for j in range(400)), metadata={"source": "a.pdf", "page": i})
+        for i in range(n)
+    ]
+
+
+def test_parents_survive_restart_without_reembedding(tmp_path):
+    embeddings = CountingEmbeddings(size=8, calls=[])
+    vectorstore = make_vectorstore(tmp_path / "chroma", embeddings)
+    build_retriever(vectorstore, pages(), SQLiteDocStore(tmp_path / "parents.sqlite"))
+    embedded = sum(embeddings.calls)
+
+    # "Restart": fresh store objects over the same files, and no documents
+    restarted = make_vectorstore(tmp_path / "chroma", embeddings)
+    retriever = build_retriever(restarted, docstore=SQLiteDocStore(tmp_path / "parents.sqlite"))
+    results = retriever.invoke("page1-word3")
+
+    assert sum(embeddings.calls) == embedded
+    assert results and all(len(doc.page_content) > 400 for doc in results)
+    assert {doc.metadata["source"] for doc in results} == {"a.pdf"}
+
+
+def test_failed_ingestion_is_rolled_back(tmp_path):
+    embeddings = CountingEmbeddings(size=8, calls=[])
+    vectorstore = make_vectorstore(tmp_path / "chroma", embeddings)
+    docstore = SQLiteDocStore(tmp_path / "parents.sqlite")
+
+    def failing():
+        yield from pages(2)
+        raise RuntimeError("loader crashed")
+
+    with pytest.raises(RuntimeError):
+        build_retriever(vectorstore, failing(), docstore)
+
+    assert list(docstore.yield_keys()) == []
+    assert vectorstore.get()["ids"] == []
+
+
+def test_reconcile_drops_uncommitted_parents_and_their_children(tmp_path):
+    embeddings = CountingEmbeddings(size=8, calls=[])
+    vectorstore = make_vectorstore(tmp_path / "chroma", embeddings)
+    build_retriever(vectorstore, pages(1), SQLiteDocStore(tmp_path / "parents.sqlite"))
+    committed = len(vectorstore.get()["ids"])
+
+    # Simulate a process that died between staging parents and committing them
+    dead = SQLiteDocStore(tmp_path / "parents.sqlite", lease_seconds=0.05)
+    dead.mset([("orphan", Document(page_content="p"))], pending=True)
+    dead.close()
+    time.sleep(0.1)
+    vectorstore.add_documents([Document(page_content="c", metadata={"doc_id": "orphan"})])
+
+    docstore = SQLiteDocStore(tmp_path / "parents.sqlite")
+    stats = docstore.reconcile(vectorstore)
+
+    assert stats == {"parents_rolled_back": 1, "children_removed": 1}
+    assert len(vectorstore.get()["ids"]) == committed
+    assert docstore.mget(["orphan"]) == [None]
+
+
+def test_reconcile_keeps_runs_still_in_flight_in_this_process(tmp_path):
+    vectorstore = make_vectorstore(tmp_path / "chroma", CountingEmbeddings(size=8, calls=[]))
+    docstore = SQLiteDocStore(tmp_path / "parents.sqlite")
+    docstore.mset([("running", Document(page_content="p"))], pending=True)
+
+    assert docstore.reconcile(vectorstore)["parents_rolled_back"] == 0
+    assert docstore.mget(["running"])[0] is not None
+
+
+def test_reconcile_keeps_runs_still_in_flight_in_other_processes(tmp_path):
+    vectorstore = make_vectorstore(tmp_path / "chroma", CountingEmbeddings(size=8, calls=[]))
+    # Another process' store, whose heartbeat keeps renewing a short lease
+    running = SQLiteDocStore(tmp_path / "parents.sqlite", lease_seconds=0.3)
+    running.mset([("running", Document(page_content="p"))], pending=True)
+    time.sleep(0.5)
+
+    docstore = SQLiteDocStore(tmp_path / "parents.sqlite")
+    assert docstore.reconcile(vectorstore)["parents_rolled_back"] == 0
+    running.commit(["running"])
+    assert docstore.reconcile(vectorstore)["parents_rolled_back"] == 0
+    assert docstore.mget(["running"])[0] is not None
+
+
+def test_source_manifest_tracks_ingest_and_delete(tmp_path):
+    embeddings = CountingEmbeddings(size=8, calls=[])
+    vectorstore = make_vectorstore(tmp_path / "chroma", embeddings)
+    docstore = SQLiteDocStore(tmp_path / "parents.sqlite")
+    other = [Document(page_content="short", metadata={"source": str(tmp_path / "b.pdf")})]
+    build_retriever(vectorstore, pages() + other, docstore)
+
+    b, a = docstore.list_sources()  # ordered by source name
+    assert (a["source"], b["source"]) == ("a.pdf", str(tmp_path / "b.pdf"))
+    assert a["chunks"] == len(vectorstore.get(where={"source": "a.pdf"})["ids"])
+    assert a["parents"] >= 3 and a["sha256"] and a["ingested_at"]
+
+    # Listing reads the manifest, not every chunk in the collection
+    vectorstore.get = lambda *args, **kwargs: pytest.fail("listing scanned the collection")
+    assert get_indexed_files(vectorstore, docstore) == [str(tmp_path / "b.pdf"), "a.pdf"]
+    del vectorstore.get
+
+    (tmp_path / "b.pdf").write_bytes(b"%PDF")
+    assert delete_file(vectorstore, str(tmp_path / "b.pdf"), docstore)
+    assert get_indexed_files(vectorstore, docstore) == ["a.pdf"]
+
+
+def test_reingesting_a_source_replaces_it_instead_of_adding_to_it(tmp_path):
+    vectorstore = make_vectorstore(tmp_path / "chroma", CountingEmbeddings(size=8, calls=[]))
+    docstore = SQLiteDocStore(tmp_path / "parents.sqlite")
+    build_retriever(vectorstore, pages(), docstore)
+    [first] = docstore.list_sources()
+
+    build_retriever(vectorstore, pages(), docstore)
+
+    [record] = docstore.list_sources()
+    assert (record["chunks"], record["parents"]) == (first["chunks"], first["parents"])
+    assert record["chunks"] == len(vectorstore.get(where={"source": "a.pdf"})["ids"])
+    assert len(list(docstore.yield_keys())) == record["parents"]
+
+
+def test_source_manifest_is_backfilled_for_existing_stores(tmp_path):
+    embeddings = CountingEmbeddings(size=8, calls=[])
+    vectorstore = make_vectorstore(tmp_path / "chroma", embeddings)
+    build_retriever(vectorstore, pages(), SQLiteDocStore(tmp_path / "parents.sqlite"))
+    expected = SQLiteDocStore(tmp_path / "parents.sqlite").list_sources()[0]
+
+    # Simulate a store written before the manifest existed
+    import sqlite3
+    with sqlite3.connect(tmp_path / "parents.sqlite") as conn:
+        conn.execute("DROP TABLE sources")
+    docstore = SQLiteDocStore(tmp_path / "parents.sqlite")
+
+    assert get_indexed_files(vectorstore, docstore) == ["a.pdf"]
+    [record] = docstore.list_sources()
+    assert (record["chunks"], record["parents"]) == (expected["chunks"], expected["parents"])
+
+
+def test_delete_source_removes_children_in_batches_with_their_parents(tmp_path):
+    vectorstore = make_vectorstore(tmp_path / "chroma", CountingEmbeddings(size=8, calls=[]))
+    docstore = SQLiteDocStore(tmp_path / "parents.sqlite")
+    build_retriever(vectorstore, pages() + [Document(page_content="kept", metadata={"source": "b.pdf"})], docstore)
+    chunks = len(vectorstore.get(where={"source": "a.pdf"})["ids"])
+    deletes = []
+    delete = vectorstore.delete
+    vectorstore.delete = lambda ids: deletes.append(len(ids)) or delete(ids=ids)
+
+    assert docstore.delete_source(vectorstore, "a.pdf", batch_size=2) == chunks
+
+    assert max(deletes) <= 2
+    assert vectorstore.get(where={"source": "a.pdf"})["ids"] == []
+    remaining = docstore.mget(list(docstore.yield_keys()))
+    assert remaining and {doc.metadata["source"] for doc in remaining} == {"b.pdf"}
+    assert [record["source"] for record in docstore.list_sources()] == ["b.pdf"]
+
+
+def test_interrupted_delete_is_hidden_and_resumed_by_reconcile(tmp_path):
+    vectorstore = make_vectorstore(tmp_path / "chroma", CountingEmbeddings(size=8, calls=[]))
+    build_retriever(vectorstore, pages(), SQLiteDocStore(tmp_path / "parents.sqlite"))
+
+    def crash(ids):
+        raise RuntimeError("killed mid-delete")
+    vectorstore.delete = crash
+    with pytest.raises(RuntimeError):
+        SQLiteDocStore(tmp_path / "parents.sqlite").delete_source(vectorstore, "a.pdf")
+    del vectorstore.delete
+
+    docstore = SQLiteDocStore(tmp_path / "parents.sqlite")
+    assert docstore.list_sources() == []
+    assert docstore.reconcile(vectorstore)["children_removed"] > 0
+    assert vectorstore.get()["ids"] == [] and list(docstore.yield_keys()) == []
+    assert docstore.deleting_sources() == []
+
+
+def test_compact_rebuilds_the_collection_and_drops_unreferenced_parents(tmp_path):
+    from app.maintenance import compact
+
+    embeddings = CountingEmbeddings(size=8, calls=[])
+    vectorstore = make_vectorstore(tmp_path / "chroma", embeddings)
+    build_retriever(vectorstore, pages(), SQLiteDocStore(tmp_path / "parents.sqlite"))
+    ids = sorted(vectorstore.get()["ids"])
+    SQLiteDocStore(tmp_path / "parents.sqlite").mset([("stray", Document(page_content="p"))])
+
+    stats = compact(tmp_path / "chroma", tmp_path / "parents.sqlite")
+
+    assert stats["records"] == len(ids)
+    assert stats["unreferenced_parents_removed"] == 1
+    reopened = make_vectorstore(tmp_path / "chroma", embeddings)
+    assert sorted(reopened.get()["ids"]) == ids
+    retriever = build_retriever(reopened, docstore=SQLiteDocStore(tmp_path / "parents.sqlite"))
+    assert retriever.invoke("page1-word3")
+
+
+def chaptered_book():
+    from app.utils import split_pages_by_chapter
+    body = lambda chapter: " ".join(f"ch{chapter}-word{j}" for j in range(300))
+    pages = [
+        "Preface text\n",
+        f"Chapter 1\nBeginnings\n{body(1)}\n",
+        f"2.1 Early Years\n{body(1)}\nChapter 2\nEndings\n",
+        f"{body(2)}\nAFTERMATH\n{body(2)}\n",
+    ]
+    return split_pages_by_chapter(pages, "book.pdf")
+
+
+def test_structural_index_maps_chapters_to_pages_and_chunks(tmp_path):
+    vectorstore = make_vectorstore(tmp_path / "chroma", CountingEmbeddings(size=8, calls=[]))
+    docstore = SQLiteDocStore(tmp_path / "parents.sqlite")
+    build_retriever(vectorstore, chaptered_book(), docstore)
+
+    one, two = docstore.chapters("book.pdf")
+    assert (one["chapter"], one["page_start"], one["page_end"]) == (1, 1, 2)
+    assert (two["chapter"], two["page_start"], two["page_end"]) == (2, 2, 3)
+    assert one["headings"][0] == "Beginnings" and "2.1 Early Years" in one["headings"]
+    assert "AFTERMATH" in two["headings"]
+
+    chunk_ids = docstore.chapter_chunk_ids(2)
+    assert len(chunk_ids) == two["chunks"] == len(vectorstore.get(where={"chapter": 2})["ids"])
+    assert {m["chapter"] for m in vectorstore.get(ids=chunk_ids)["metadatas"]} == {2}
+    parents = docstore.chapter_parents(2)
+    assert len(parents) == two["parents"] and parents[0].page_content.startswith("Chapter 2")
+
+
+def test_structural_index_follows_rollbacks_and_deletes(tmp_path):
+    vectorstore = make_vectorstore(tmp_path / "chroma", CountingEmbeddings(size=8, calls=[]))
+    docstore = SQLiteDocStore(tmp_path / "parents.sqlite")
+
+    def failing():
+        yield from chaptered_book()
+        raise RuntimeError("loader crashed")
+
+    with pytest.raises(RuntimeError):
+        build_retriever(vectorstore, failing(), docstore)
+    assert docstore.chapters() == []
+
+    build_retriever(vectorstore, chaptered_book(), docstore)
+    assert docstore.chapter_chunk_ids(1)
+    docstore.delete_source(vectorstore, "book.pdf")
+    assert docstore.chapters() == [] and docstore.chapter_chunk_ids(1) == []
+
+
+def test_each_parent_records_its_own_pages(tmp_path):
+    vectorstore = make_vectorstore(tmp_path / "chroma", CountingEmbeddings(size=8, calls=[]))
+    docstore = SQLiteDocStore(tmp_path / "parents.sqlite")
+    build_retriever(vectorstore, chaptered_book(), docstore)
+
+    spans = [(p.metadata["page_start"], p.metadata["page_end"]) for p in docstore.chapter_parents(1)]
+    assert spans[0] == (1, 1) and spans[-1] == (2, 2)
+    assert spans == sorted(spans)
+    assert "page_offsets" not in docstore.chapter_parents(1)[0].metadata
+    for metadata in vectorstore.get(where={"chapter": 1})["metadatas"]:
+        assert metadata["page_start"] == metadata["page_end"] or (metadata["page_start"], metadata["page_end"]) == (1, 2)
+        assert "page_offsets" not in metadata
+
+
+def test_chapters_are_scoped_to_their_source(tmp_path):
+    from app.utils import split_pages_by_chapter
+    vectorstore = make_vectorstore(tmp_path / "chroma", CountingEmbeddings(size=8, calls=[]))
+    docstore = SQLiteDocStore(tmp_path / "parents.sqlite")
+    other = split_pages_by_chapter(["Chapter 1\nElsewhere\nanother book entirely\n"], "other.pdf")
+    build_retriever(vectorstore, chaptered_book() + other, docstore)
+
+    assert docstore.chapter_sources(1) == ["book.pdf", "other.pdf"]
+    assert docstore.chapter_sources(2) == ["book.pdf"]
+    [parent] = docstore.chapter_parents(1, source="other.pdf")
+    assert "Elsewhere" in parent.page_content
+    assert all(p.metadata["source"] == "book.pdf" for p in docstore.chapter_parents(1, source="book.pdf"))
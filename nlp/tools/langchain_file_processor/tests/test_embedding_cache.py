@@ -0,0 +1,76 @@
+import os
+import sys
+
+# Add the project root to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from app.disk_cache import DiskCache
+from app.embedding_cache import CachedEmbeddings, embed_queries
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    """Fake embeddings that record which texts actually reached the model."""
+    calls: list = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return super().embed_documents(texts)
+
+
+def test_only_cache_misses_are_embedded(tmp_path):
+    underlying = CountingEmbeddings(size=8, calls=[])
+    embeddings = CachedEmbeddings(underlying, DiskCache(tmp_path / "emb.sqlite"), "fake-model")
+
+    first = embeddings.embed_documents(["a", "b"])
+    second = embeddings.embed_documents(["b", "c", "a"])
+
+    assert underlying.calls == [["a", "b"], ["c"]]
+    assert second[0] == first[1]
+    assert second[2] == first[0]
+    assert embeddings.stats()["hits"] == 2
+    assert embeddings.stats()["misses"] == 3
+
+
+def test_cache_survives_reopen(tmp_path):
+    path = tmp_path / "emb.sqlite"
+    CachedEmbeddings(CountingEmbeddings(size=8, calls=[]), DiskCache(path), "fake-model").embed_query("q")
+
+    underlying = CountingEmbeddings(size=8, calls=[])
+    reopened = CachedEmbeddings(underlying, DiskCache(path), "fake-model")
+    reopened.embed_query("q")
+
+    assert reopened.stats()["hits"] == 1
+
+
+def test_lru_eviction_keeps_recently_used(tmp_path):
+    cache = DiskCache(tmp_path / "kv.sqlite", max_entries=2)
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+    cache.get("a")
+    cache.set("c", b"3")
+
+    assert cache.get("a") == b"1"
+    assert cache.get("b") is None
+    assert len(cache) == 2
+
+
+class TaskTypeEmbeddings(CountingEmbeddings):
+    """Fake batch endpoint that, like Google's, accepts a task type."""
+    def embed_documents(self, texts, task_type=None):
+        self.calls.append((task_type, list(texts)))
+        return [self.embed_query(text) for text in texts]
+
+
+def test_queries_are_embedded_in_one_batched_request(tmp_path):
+    underlying = TaskTypeEmbeddings(size=8, calls=[])
+    embeddings = CachedEmbeddings(underlying, DiskCache(tmp_path / "emb.sqlite"), "fake-model")
+
+    first = embed_queries(embeddings, ["q1", "q2"])
+    second = embed_queries(embeddings, ["q2", "q3"])
+
+    assert underlying.calls == [("RETRIEVAL_QUERY", ["q1", "q2"]), ("RETRIEVAL_QUERY", ["q3"])]
+    assert second[0] == first[1]
+    assert first[0] == embeddings.embed_query("q1")
@@ -0,0 +1,78 @@
+import os
+import sys
+
+# Add the project root to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from app.ingestion import IngestionPipeline
+
+
+class RecordingEmbeddings(DeterministicFakeEmbedding):
+    batch_sizes: list = []
+
+    def embed_documents(self, texts):
+        self.batch_sizes.append(len(texts))
+        return super().embed_documents(texts)
+
+
+def split_words(doc: Document):
+    return [Document(page_content=word, metadata=doc.metadata) for word in doc.page_content.split()]
+
+
+def test_every_chunk_is_embedded_in_bounded_batches_and_indexed():
+    embeddings = RecordingEmbeddings(size=8, batch_sizes=[])
+    indexed = []
+    docs = [Document(page_content=" ".join(f"w{i}-{j}" for j in range(7)), metadata={"source": str(i)})
+            for i in range(30)]
+
+    stats = IngestionPipeline(
+        split_words, embeddings, lambda chunks, vectors: indexed.extend(zip(chunks, vectors)),
+        batch_size=16, queue_size=2,
+    ).run(docs)
+
+    assert sorted(chunk.page_content for chunk, _ in indexed) == sorted(
+        word for doc in docs for word in doc.page_content.split()
+    )
+    assert max(embeddings.batch_sizes) == 16
+    assert sum(embeddings.batch_sizes) == 210
+    assert stats["load"].items == 30
+    assert stats["embed"].items == stats["index"].items == 210
+
+
+def test_indexing_starts_before_sources_are_exhausted():
+    loaded, indexed = [], []
+    loaded_when_first_indexed = []
+
+    def load(doc):
+        loaded.append(doc)
+        return [doc]
+
+    def index(chunks, vectors):
+        if not indexed:
+            loaded_when_first_indexed.append(len(loaded))
+        indexed.extend(chunks)
+
+    IngestionPipeline(
+        lambda doc: [doc], DeterministicFakeEmbedding(size=4), index,
+        load=load, batch_size=2, queue_size=1, load_workers=1, split_workers=1,
+    ).run(Document(page_content=f"doc {i}") for i in range(50))
+
+    assert len(indexed) == 50
+    assert loaded_when_first_indexed[0] < 50
+
+
+def test_stage_error_stops_the_pipeline_and_is_raised():
+    def index(chunks, vectors):
+        raise RuntimeError("index unavailable")
+
+    pipeline = IngestionPipeline(
+        lambda doc: [doc], DeterministicFakeEmbedding(size=4), index, batch_size=1, queue_size=1
+    )
+
+    with pytest.raises(RuntimeError, match="index unavailable"):
+        pipeline.run(Document(page_content=str(i)) for i in range(1000))
@@ -1,5 +1,6 @@
 import os
 import sys
+import tempfile
 import unittest
 from unittest.mock import MagicMock, patch
 
@@ -7,6 +8,7 @@ from unittest.mock import MagicMock, patch
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.insert(0, project_root)
 
+import chromadb
 import pytest
 from langchain_chroma import Chroma
 
@@ -14,7 +16,15 @@ from langchain_chroma import Chroma
 from tests.mocks import mock_streamlit
 mock_streamlit()
 
-from app.langchain_logic import delete_file
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.runnables import RunnableLambda
+
+from app.docstore import SQLiteDocStore
+from app.query_planner import QueryPlan
+from app.langchain_logic import (build_retriever, delete_file, format_citation_context,
+                                 handle_rag_query, retrieve_for_sub_queries)
 
 
 class TestDeleteFile(unittest.TestCase):
@@ -34,11 +44,14 @@ class TestDeleteFile(unittest.TestCase):
         mock_os_exists.return_value = True
 
         # Act
-        result = delete_file(mock_vectorstore_instance, file_path)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            docstore = SQLiteDocStore(os.path.join(tmp_dir, "parents.sqlite"))
+            result = delete_file(mock_vectorstore_instance, file_path, docstore)
 
         # Assert
         mock_os_exists.assert_called_once_with(file_path)
-        mock_vectorstore_instance.get.assert_called_once_with(where={"source": file_path})
+        # Fewer ids than the batch size means no second batch is requested
+        mock_vectorstore_instance.get.assert_called_once_with(where={"source": file_path}, limit=500, include=[])
         mock_vectorstore_instance.delete.assert_called_once_with(ids=["id1", "id2"])
         mock_os_remove.assert_called_once_with(file_path)
         self.assertTrue(result)
@@ -61,5 +74,173 @@ class TestDeleteFile(unittest.TestCase):
         self.assertFalse(result)
 
 
+class TestFormatCitationContext(unittest.TestCase):
+
+    def test_numbers_documents_in_order(self):
+        """
+        Tests that each document is labelled with its 1-based source number.
+        """
+        docs = [Document(page_content="First."), Document(page_content="Second.")]
+
+        context = format_citation_context(docs)
+
+        self.assertEqual(context, "[source_1]\nFirst.\n\n[source_2]\nSecond.")
+
+
+class TestRetrieveForSubQueries(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        embeddings = DeterministicFakeEmbedding(size=16)
+        vectorstore = Chroma(
+            collection_name="split_parents", embedding_function=embeddings,
+            client=chromadb.PersistentClient(path=os.path.join(self.tmp, "chroma")),
+        )
+        docs = [
+            Document(page_content=f"chapter {i} text " * 20, metadata={"source": "book.pdf", "chapter": i})
+            for i in range(1, 4)
+        ]
+        self.retriever = build_retriever(vectorstore, docs, SQLiteDocStore(os.path.join(self.tmp, "p.sqlite")))
+
+    def test_chapter_filter_and_deterministic_merge(self):
+        """
+        Tests that a chapter filter restricts the search and that results
+        are merged in sub-query order without duplicates.
+        """
+        docs = retrieve_for_sub_queries(self.retriever, ["what happens in chapter 2", "overview"], [2, None])
+
+        self.assertEqual(docs[0].metadata["chapter"], 2)
+        self.assertEqual(len(docs), len({doc.page_content for doc in docs}))
+        again = retrieve_for_sub_queries(self.retriever, ["what happens in chapter 2", "overview"], [2, None])
+        self.assertEqual([d.page_content for d in again], [d.page_content for d in docs])
+
+    def test_chapter_search_filters_on_indexed_metadata(self):
+        """
+        Tests that a chapter search goes through the public filtered search,
+        scoped to that chapter (and source, if given).
+        """
+        search = self.retriever.vectorstore.similarity_search_by_vector
+        with patch.object(self.retriever.vectorstore, "similarity_search_by_vector", wraps=search) as filtered_search:
+            docs = retrieve_for_sub_queries(self.retriever, ["what happens"], [3], source="book.pdf")
+
+        self.assertEqual({doc.metadata["chapter"] for doc in docs}, {3})
+        self.assertEqual(
+            filtered_search.call_args.kwargs["filter"], {"$and": [{"chapter": 3}, {"source": "book.pdf"}]}
+        )
+
+    def test_unmatched_chapter_falls_back_to_unfiltered_search(self):
+        """
+        Tests that a chapter missing from the index doesn't empty the results.
+        """
+        docs = retrieve_for_sub_queries(self.retriever, ["chapter 9 please"], [9])
+
+        self.assertTrue(docs)
+
+
+@patch("app.langchain_logic.st.write_stream", side_effect=lambda chunks: "".join(chunks))
+class TestHandleRagQuery(unittest.TestCase):
+
+    @patch("app.langchain_logic.Chroma.from_documents")
+    @patch("app.langchain_logic.get_reranker")
+    @patch("app.langchain_logic.retrieve_for_sub_queries")
+    def test_synthesizes_from_reranked_documents_without_reindexing(
+        self, mock_retrieve, mock_get_reranker, mock_from_documents, _write_stream
+    ):
+        """
+        Tests that the reranked documents go straight into the citation
+        prompt, numbered in reranked order, with no throwaway vector store.
+        """
+        mock_retrieve.return_value = [Document(page_content="First."), Document(page_content="Second.")]
+        mock_get_reranker.return_value.rerank.side_effect = lambda query, docs, top_k: docs[::-1][:top_k]
+        prompts = []
+
+        def llm(prompt_value):
+            prompts.append(prompt_value.to_string())
+            return "Answer [source_1]."
+
+        plan = QueryPlan("question_about_document", ["q"], [None])
+        answer = handle_rag_query("question?", RunnableLambda(llm), None, MagicMock(), None, [], plan)
+
+        self.assertEqual(answer, "Answer [source_1].")
+        self.assertIn("[source_1]\nSecond.\n\n[source_2]\nFirst.", prompts[0])
+        mock_from_documents.assert_not_called()
+
+    @patch("app.langchain_logic.get_reranker")
+    @patch("app.langchain_logic.retrieve_for_sub_queries")
+    def test_chapter_summary_reads_the_chapter_in_order(self, mock_retrieve, mock_get_reranker, _write_stream):
+        """
+        Tests that "summarize chapter N" answers from the chapter's parents,
+        in document order, without a vector search or reranking.
+        """
+        retriever = MagicMock()
+        retriever.docstore = MagicMock(spec=SQLiteDocStore)
+        retriever.docstore.chapter_sources.return_value = ["book.pdf"]
+        retriever.docstore.chapter_parents.return_value = [Document(page_content="Start."), Document(page_content="End.")]
+        prompts = []
+
+        def llm(prompt_value):
+            prompts.append(prompt_value.to_string())
+            return "Summary."
+
+        plan = QueryPlan("question_about_document", ["Summary of chapter 2"], [2])
+        handle_rag_query("Summarize chapter 2", RunnableLambda(llm), None, retriever, None, [], plan)
+
+        retriever.docstore.chapter_parents.assert_called_once_with(2, source="book.pdf", limit=12)
+        self.assertIn("[source_1]\nStart.\n\n[source_2]\nEnd.", prompts[0])
+        mock_retrieve.assert_not_called()
+        mock_get_reranker.assert_not_called()
+
+    @patch("app.langchain_logic.get_reranker")
+    @patch("app.langchain_logic.retrieve_for_sub_queries")
+    def test_asks_which_file_when_several_have_the_chapter(self, mock_retrieve, mock_get_reranker, _write_stream):
+        """
+        Tests that a chapter present in several files is not merged across
+        them: the user is asked to pick one, unless the message names it.
+        """
+        retriever = MagicMock()
+        retriever.docstore = MagicMock(spec=SQLiteDocStore)
+        retriever.docstore.chapter_sources.return_value = ["uploads/alpha.pdf", "uploads/beta.pdf"]
+        retriever.docstore.chapter_parents.return_value = [Document(page_content="Start.")]
+        llm = RunnableLambda(lambda prompt_value: "Summary.")
+
+        plan = QueryPlan("question_about_document", ["Summary of chapter 1"], [1])
+        answer = handle_rag_query("Summarize chapter 1", llm, None, retriever, None, [], plan)
+        self.assertIn("alpha.pdf, beta.pdf", answer)
+        retriever.docstore.chapter_parents.assert_not_called()
+
+        plan = QueryPlan("question_about_document", ["Summary of chapter 1 of beta.pdf"], [1])
+        handle_rag_query("Summarize chapter 1 of that one", llm, None, retriever, None, [], plan)
+        retriever.docstore.chapter_parents.assert_called_once_with(1, source="uploads/beta.pdf", limit=12)
+
+        mock_retrieve.return_value = [Document(page_content="First.")]
+        mock_get_reranker.return_value.rerank.side_effect = lambda query, docs, top_k: docs
+        plan = QueryPlan("question_about_document", ["Who is in chapter 1?"], [1])
+        handle_rag_query("Who is in chapter 1?", llm, None, retriever, None, [], plan, source="uploads/alpha.pdf")
+        mock_retrieve.assert_called_once_with(retriever, ["Who is in chapter 1?"], [1], "uploads/alpha.pdf")
+
+    @patch("app.langchain_logic.get_reranker")
+    @patch("app.langchain_logic.retrieve_for_sub_queries")
+    def test_streams_the_answer_and_records_latency(self, mock_retrieve, mock_get_reranker, mock_write_stream):
+        """
+        Tests that the answer reaches the chat message as a token stream,
+        and that time to first token and total latency are recorded.
+        """
+        mock_retrieve.return_value = [Document(page_content="First.")]
+        mock_get_reranker.return_value.rerank.side_effect = lambda query, docs, top_k: docs
+        streamed = []
+        mock_write_stream.side_effect = lambda chunks: streamed.extend(chunks)
+        session_state = {}
+        llm = FakeListChatModel(responses=["Streamed answer [source_1]."])
+
+        with patch("app.langchain_logic.st.session_state", session_state):
+            plan = QueryPlan("question_about_document", ["q"], [None])
+            answer = handle_rag_query("question?", llm, None, MagicMock(), None, [], plan)
+
+        self.assertEqual(answer, "Streamed answer [source_1].")
+        self.assertGreater(len(streamed), 1)
+        [latency] = session_state["answer_latencies"]
+        self.assertLessEqual(latency["ttft_ms"], latency["total_ms"])
+
+
 if __name__ == "__main__":
     unittest.main()
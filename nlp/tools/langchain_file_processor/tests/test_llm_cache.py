@@ -0,0 +1,80 @@
+import os
+import sys
+
+# Add the project root to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+import time
+
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+
+from tests.mocks import mock_streamlit
+mock_streamlit()
+
+from app.disk_cache import DiskCache
+from app.langchain_logic import plan_query
+from app.llm_cache import LLMCache, model_name
+
+PLAN = '{"intent": "question_about_document", "sub_queries": [{"query": "Who is Nick?", "chapter": null}]}'
+
+
+class CountingChatModel(FakeListChatModel):
+    calls: list = []
+
+    def _call(self, messages, *args, **kwargs):
+        self.calls.append(messages)
+        return super()._call(messages, *args, **kwargs)
+
+
+def test_plans_are_shared_across_processes(tmp_path):
+    llm = CountingChatModel(responses=[PLAN], calls=[])
+    first = plan_query(llm, "who is he?", [], LLMCache(DiskCache(tmp_path / "llm.sqlite")))
+
+    # A second worker: a separate cache object over the same file
+    other = LLMCache(DiskCache(tmp_path / "llm.sqlite"))
+    second = plan_query(llm, "who is he?", [], other)
+
+    assert len(llm.calls) == 1
+    assert second.sub_queries == first.sub_queries == ["Who is Nick?"]
+    assert (first.llm_calls, second.llm_calls) == (1, 0)
+    assert other.stats()["helpers"] == {"plan_query": {"hits": 1, "misses": 0}}
+
+
+def test_key_covers_history_and_model(tmp_path):
+    cache = LLMCache(DiskCache(tmp_path / "llm.sqlite"))
+    llm = CountingChatModel(responses=[PLAN] * 3, calls=[])
+    history = [HumanMessage(content="Tell me about Gatsby"), AIMessage(content="Gatsby is rich.")]
+
+    plan_query(llm, "who is he?", [], cache)
+    plan_query(llm, "who is he?", history, cache)
+    plan_query(llm, "who is he?", history, cache)
+
+    assert len(llm.calls) == 2
+    key = LLMCache.key("plan_query", "v1", model_name(llm), {"query": "q"})
+    assert key != LLMCache.key("plan_query", "v2", model_name(llm), {"query": "q"})
+    assert key != LLMCache.key("plan_query", "v1", "other-model", {"query": "q"})
+
+
+def test_expired_and_unparsed_plans_are_recomputed(tmp_path):
+    cache = LLMCache(DiskCache(tmp_path / "llm.sqlite", ttl_seconds=0.05))
+    llm = CountingChatModel(responses=["not json", PLAN, PLAN], calls=[])
+
+    assert plan_query(llm, "who is he?", [], cache).fallback
+    plan_query(llm, "who is he?", [], cache)
+    time.sleep(0.1)
+    plan_query(llm, "who is he?", [], cache)
+
+    assert len(llm.calls) == 3
+    assert cache.stats()["helpers"]["plan_query"] == {"hits": 0, "misses": 3}
+
+
+def test_size_is_bounded(tmp_path):
+    cache = LLMCache(DiskCache(tmp_path / "llm.sqlite", max_entries=2))
+
+    for i in range(5):
+        cache.memoize("helper", "v1", "model", {"i": i}, lambda: {"value": i})
+
+    assert len(cache.cache) == 2
+    assert cache.memoize("helper", "v1", "model", {"i": 4}, lambda: None) == {"value": 4}
@@ -0,0 +1,75 @@
+import os
+import sys
+
+# Add the project root to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+import pytest
+
+from app import pdf_extraction
+from app.disk_cache import DiskCache
+from app.pdf_extraction import PDFExtractor, _runs
+
+
+def write_pdf(path, texts):
+    """Writes a minimal PDF with one line of Helvetica text per page."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for text in texts:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        page_ids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {len(page_ids)} >>"
+
+    out, offsets = b"%PDF-1.4\n", []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    path.write_bytes(out)
+    return str(path)
+
+
+def test_runs_group_consecutive_pages():
+    assert _runs([0, 1, 2, 3, 4, 7, 8, 10], 3) == [(0, 3), (3, 5), (7, 9), (10, 11)]
+
+
+def test_pool_extraction_keeps_page_order(tmp_path):
+    pdf = write_pdf(tmp_path / "book.pdf", [f"Page number {i}" for i in range(7)])
+
+    sequential = PDFExtractor(max_workers=1).extract_pages(pdf)
+    pooled = PDFExtractor(max_workers=2, pages_per_task=2, min_pages_for_pool=1).extract_pages(pdf)
+
+    assert [text.strip() for text in sequential] == [f"Page number {i}" for i in range(7)]
+    assert pooled == sequential
+
+
+def test_known_files_are_read_from_the_page_cache(tmp_path, monkeypatch):
+    pdf = write_pdf(tmp_path / "book.pdf", ["First page", "Second page"])
+    PDFExtractor(DiskCache(tmp_path / "pages.sqlite"), max_workers=1).extract_pages(pdf)
+
+    extracted = []
+    original = pdf_extraction._extract_range
+    monkeypatch.setattr(pdf_extraction, "_extract_range", lambda *args: extracted.append(args) or original(*args))
+    reopened = PDFExtractor(DiskCache(tmp_path / "pages.sqlite"), max_workers=1)
+
+    assert reopened.extract_text(pdf) == "First pageSecond page"
+    assert extracted == []
+
+    # Same path, new content: the file hash changes, so the pages are extracted again
+    write_pdf(tmp_path / "book.pdf", ["First page", "Edited page"])
+    assert reopened.extract_pages(pdf)[1] == "Edited page"
+    assert extracted == [(pdf, 0, 2)]
+
+
+def test_missing_files_raise_file_not_found(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        PDFExtractor(max_workers=1).extract_pages(str(tmp_path / "missing.pdf"))
@@ -0,0 +1,94 @@
+import os
+import sys
+
+# Add the project root to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+import pytest
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+
+from tests.mocks import mock_streamlit
+mock_streamlit()
+
+from app.disk_cache import DiskCache
+from app.langchain_logic import plan_query
+from app.llm_cache import LLMCache
+from app.query_planner import (CONVERSATIONAL, LIST_FILES, QUESTION, find_chapter,
+                               format_chat_history, parse_plan, rule_based_plan)
+
+
+class RecordingChatModel(FakeListChatModel):
+    prompts: list = []
+
+    def _call(self, messages, *args, **kwargs):
+        self.prompts.append("\n".join(m.content for m in messages))
+        return super()._call(messages, *args, **kwargs)
+
+
+@pytest.mark.parametrize("message", ["hi", "Hello there!", "thanks a lot", "Good morning.", "bye"])
+def test_greetings_are_conversational(message):
+    assert rule_based_plan(message).intent == CONVERSATIONAL
+
+
+@pytest.mark.parametrize("message", ["list files", "Show me the loaded documents", "what files do you have?"])
+def test_file_list_requests_are_recognised(message):
+    assert rule_based_plan(message).intent == LIST_FILES
+
+
+@pytest.mark.parametrize("message", ["Summarize chapter 3", "give me an overview of Chapter 3, please"])
+def test_chapter_summaries_are_planned_without_the_llm(message):
+    plan = rule_based_plan(message)
+    assert (plan.intent, plan.sub_queries, plan.chapters, plan.llm_calls) == (QUESTION, [message], [3], 0)
+
+
+@pytest.mark.parametrize("message", [
+    "hi, what is chapter 3 about?", "list all the characters in the book",
+    "summarize chapters 2 and 3", "compare the summary of chapter 2 with chapter 3", "summarize that chapter",
+])
+def test_other_messages_need_the_llm(message):
+    assert rule_based_plan(message) is None
+
+
+def test_rule_based_plans_make_no_llm_call():
+    llm = RecordingChatModel(responses=[], prompts=[])
+
+    assert plan_query(llm, "hey", []).intent == CONVERSATIONAL
+    assert plan_query(llm, "list files", []).intent == LIST_FILES
+    assert plan_query(llm, "summarize chapter 5", []).chapters == [5]
+    assert llm.prompts == []
+
+
+def test_questions_are_planned_in_one_call(tmp_path):
+    llm = RecordingChatModel(prompts=[], responses=[
+        '```json\n{"intent": "question_about_document", "sub_queries": ['
+        '{"query": "Who is the narrator in chapter 4?", "chapter": 4}, '
+        '{"query": "How does the narrator change?", "chapter": "2"}, '
+        '{"query": "Summary of the book", "chapter": null}]}\n```'
+    ])
+    history = [HumanMessage(content="Tell me about the narrator"), AIMessage(content="The narrator is Nick.")]
+
+    plan = plan_query(llm, "how does he change in chapter 4 and the second one?", history, LLMCache(DiskCache(tmp_path / "llm.sqlite")))
+
+    assert len(llm.prompts) == 1 and "AI: The narrator is Nick." in llm.prompts[0]
+    assert plan.intent == QUESTION and len(plan.sub_queries) == 3
+    assert plan.chapters == [4, 2, None]
+
+
+def test_malformed_plans_fall_back_to_the_message(tmp_path, caplog):
+    llm = RecordingChatModel(prompts=[], responses=["I think this is about chapter 7"])
+
+    plan = plan_query(llm, "what happens in chapter 7?", [], LLMCache(DiskCache(tmp_path / "llm.sqlite")))
+
+    assert (plan.intent, plan.sub_queries, plan.chapters) == (QUESTION, ["what happens in chapter 7?"], [7])
+    assert plan.fallback
+    assert "could not be parsed" in caplog.text
+    assert parse_plan({"intent": "bogus", "sub_queries": ["", "  x  "]}, "q").sub_queries == ["x"]
+
+
+def test_chapter_regex_and_history_formatting():
+    assert find_chapter("Summarize Chapter 12, please") == 12
+    assert find_chapter("chapters of the book") is None
+    file_list = AIMessage(content="Files:", additional_kwargs={"type": "file_list"})
+    assert format_chat_history([{"role": "user", "content": "hi"}, file_list]) == "Human: hi\n"
@@ -0,0 +1,80 @@
+import os
+import sys
+
+# Add the project root to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from app.disk_cache import DiskCache
+from app import reranking
+from app.reranking import EmbeddingReranker, create_reranker
+
+
+class BagOfWordsEmbeddings(Embeddings):
+    """Counts a few vocabulary words, so similarity tracks word overlap."""
+    vocabulary = ["solar", "wind", "coal", "cost", "energy"]
+
+    def __init__(self):
+        self.embedded = []
+
+    def _embed(self, text):
+        words = text.lower().split()
+        return [float(words.count(term)) for term in self.vocabulary]
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+DOCS = [
+    Document(page_content="coal coal energy"),
+    Document(page_content="solar energy cost"),
+    Document(page_content="wind energy"),
+    Document(page_content="solar solar cost"),
+]
+
+
+def test_rerank_orders_by_similarity_and_cuts_off_at_top_k(tmp_path):
+    reranker = EmbeddingReranker(BagOfWordsEmbeddings(), "bow", cache=DiskCache(tmp_path / "scores.sqlite"))
+
+    top = reranker.rerank("solar cost", DOCS, top_k=2)
+
+    assert [doc.page_content for doc in top] == ["solar solar cost", "solar energy cost"]
+
+
+def test_scores_are_cached_per_query_and_document(tmp_path):
+    embeddings = BagOfWordsEmbeddings()
+    reranker = EmbeddingReranker(embeddings, "bow", cache=DiskCache(tmp_path / "scores.sqlite"), batch_size=3)
+
+    first = reranker.score("solar", DOCS)
+    assert len(embeddings.embedded) == 4
+    second = reranker.score("solar", DOCS + [Document(page_content="wind wind")])
+
+    assert second[:4] == first
+    assert embeddings.embedded[4:] == ["wind wind"]
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        create_reranker("llm", BagOfWordsEmbeddings(), "bow", "unused")
+
+
+def test_auto_backend_falls_back_when_the_model_cannot_load(monkeypatch, caplog):
+    def unavailable(model_name, **kwargs):
+        raise OSError(f"Can't load {model_name}")
+
+    monkeypatch.setattr(reranking, "CrossEncoderReranker", unavailable)
+
+    reranker = create_reranker("auto", BagOfWordsEmbeddings(), "bow", "missing/model")
+
+    assert isinstance(reranker, EmbeddingReranker)
+    assert "missing/model unavailable" in caplog.text
+    with pytest.raises(OSError):
+        create_reranker("cross_encoder", BagOfWordsEmbeddings(), "bow", "missing/model")